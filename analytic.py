@@ -0,0 +1,179 @@
+from math import comb
+import numpy as np
+from payoff import PiecewiseLinearPayoff
+from utils import as_book
+
+# Equal-width bins of the exact PnL histogram, between the 0.1% and 99.9% quantiles
+DEFAULT_EXACT_BINS = 100
+
+# Points at which the exact density is tabulated for plotting
+DEFAULT_DENSITY_POINTS = 400
+
+# Bisection steps for quantiles; halves the PnL range each time
+_QUANTILE_ITERATIONS = 60
+
+
+class LognormalPayoffDistribution:
+    """
+    Exact distribution of f(S_T) - level for lognormal S_T and piecewise-linear f.
+
+    On each payoff segment f is linear in S_T, so moments and the CDF are
+    sums of truncated lognormal moments; flat segments are point masses.
+    """
+    def __init__(self, profile: PiecewiseLinearPayoff, spot: float, drift: float,
+                 volatility: float, maturity: float, level: float = 0.0):
+        from scipy.special import ndtr
+        self._ndtr = ndtr
+        vertices, values = profile.vertices, profile.values
+        self.lo = vertices
+        self.hi = np.append(vertices[1:], np.inf)
+        self.beta = np.append(np.diff(values) / np.diff(vertices), profile.right_slope)
+        self.alpha = values - self.beta * vertices - level
+
+        self.spot = spot
+        self.mu = np.log(spot) + (drift - 0.5 * volatility**2) * maturity
+        self.sigma = volatility * np.sqrt(maturity)
+        if self.sigma <= 0:
+            raise ValueError("volatility and maturity must be positive")
+        self.probability = self._partial_moment(0)
+
+    def _d(self, x):
+        with np.errstate(divide='ignore'):
+            return (np.log(x) - self.mu) / self.sigma
+
+    def _partial_moment(self, power: int, lo=None, hi=None):
+        """E[S^power 1{lo <= S < hi}] per segment (default: the payoff segments)"""
+        lo = self.lo if lo is None else lo
+        hi = self.hi if hi is None else hi
+        shift = power * self.sigma
+        scale = np.exp(power * self.mu + 0.5 * shift**2)
+        return scale * (self._ndtr(self._d(hi) - shift) - self._ndtr(self._d(lo) - shift))
+
+    def central_moments(self):
+        """Mean and the 2nd-4th central moments of the PnL"""
+        moments = [self._partial_moment(power) for power in range(5)]
+        mean = (self.alpha * moments[0] + self.beta * moments[1]).sum()
+        # Expand E[(a + b S)^p] per segment with a shifted by the mean
+        a, b = self.alpha - mean, self.beta
+        central = []
+        for p in (2, 3, 4):
+            total = sum(comb(p, j) * a**(p - j) * b**j * moments[j] for j in range(p + 1))
+            central.append(total.sum())
+        return mean, central
+
+    def cdf(self, pnl, inclusive: bool = True):
+        """P(PnL <= pnl) (P(PnL < pnl) when inclusive is False) for an array of levels"""
+        pnl = np.asarray(pnl, dtype=np.float64)[..., None]
+        alpha, beta = self.alpha, self.beta
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing = (pnl - alpha) / beta
+        # Increasing segments contribute [lo, crossing), decreasing ones [crossing, hi)
+        rising = beta > 0
+        lo = np.where(rising, self.lo, np.clip(crossing, self.lo, self.hi))
+        hi = np.where(rising, np.clip(crossing, self.lo, self.hi), self.hi)
+        probability = np.where(beta != 0, self._ndtr(self._d(hi)) - self._ndtr(self._d(lo)), 0.0)
+        flat = (beta == 0) & ((alpha <= pnl) if inclusive else (alpha < pnl))
+        probability = np.where(flat, self.probability, probability)
+        return np.clip(probability.sum(axis=-1), 0.0, 1.0)
+
+    def quantile(self, q, lower: float, upper: float):
+        """PnL quantiles by vectorized bisection of the CDF between finite bounds"""
+        q = np.asarray(q, dtype=np.float64)
+        lo = np.full(q.shape, lower)
+        hi = np.full(q.shape, upper)
+        for _ in range(_QUANTILE_ITERATIONS):
+            mid = 0.5 * (lo + hi)
+            below = self.cdf(mid) < q
+            lo = np.where(below, mid, lo)
+            hi = np.where(below, hi, mid)
+        # A quantile falling on an atom is the atom itself, not a point just above it
+        atom_pnl = self.atoms()[0]
+        on_atom = (atom_pnl >= lo[..., None]) & (atom_pnl <= hi[..., None])
+        if on_atom.any():
+            hi = np.where(on_atom.any(axis=-1), atom_pnl[on_atom.argmax(axis=-1)], hi)
+        return hi
+
+    def density(self, pnl):
+        """Density of the continuous part of the PnL at each level"""
+        pnl = np.asarray(pnl, dtype=np.float64)[..., None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price = (pnl - self.alpha) / self.beta
+            inside = (self.beta != 0) & (price >= self.lo) & (price < self.hi) & (price > 0)
+            d = self._d(np.where(inside, price, 1.0))
+            pdf = np.exp(-0.5 * d**2) / (np.sqrt(2 * np.pi) * self.sigma * np.where(inside, price, 1.0))
+            pdf = pdf / np.abs(self.beta)
+        return np.where(inside, pdf, 0.0).sum(axis=-1)
+
+    def atoms(self):
+        """(pnl, probability) of every flat payoff segment carrying probability"""
+        flat = (self.beta == 0) & (self.probability > 0)
+        return self.alpha[flat], self.probability[flat]
+
+
+def exact_portfolio_pnl(
+    portfolio,
+    spot: float,
+    expected_drift: float,
+    volatility: float,
+    maturity: float,
+    rfr: float,
+    bins: int = DEFAULT_EXACT_BINS,
+    density_points: int = DEFAULT_DENSITY_POINTS
+) -> dict:
+    """
+    Closed-form counterpart of simulate_portfolio_pnl for one GBM underlying.
+
+    Returns the keys of simulate_portfolio_pnl_streaming with no sampling
+    noise ('std_error' and 'num_simulations' 0, 'seed' None), histogram
+    counts as bin probabilities and the exact 'density' with its atoms.
+    """
+    book = as_book(portfolio)
+    book.require_single_underlying()
+    initial_cost = book.initial_cost(spot=spot, rfr=rfr, maturity=maturity)
+    future_cost = initial_cost * np.exp(rfr * maturity)
+    profile = PiecewiseLinearPayoff.from_book(book)
+    distribution = LognormalPayoffDistribution(profile, spot, expected_drift, volatility,
+                                               maturity, level=future_cost)
+
+    mean, (m2, m3, m4) = distribution.central_moments()
+    std = np.sqrt(max(m2, 0.0))
+    minimum = profile.max_loss()[0] - future_cost
+    maximum = profile.max_gain()[0] - future_cost
+
+    # Quantiles are bracketed by the vertex values and the payoff 8 standard
+    # deviations out in the right tail of ln S_T
+    far = np.exp(distribution.mu + 8 * distribution.sigma)
+    reach = profile(np.array([far]))[0] - future_cost
+    candidates = np.concatenate([profile.values - future_cost, [reach]])
+    lower, upper = candidates.min(), candidates.max()
+    quantiles = distribution.quantile([0.001, 0.05, 0.95, 0.999], lower, upper)
+    percentile_5, percentile_95 = quantiles[1:3]
+
+    edges = np.linspace(quantiles[0], quantiles[3], bins + 1) if quantiles[3] > quantiles[0] \
+        else quantiles[0] + np.linspace(-0.5, 0.5, bins + 1)
+    # Bins are closed on the left like np.histogram, so an atom at edges[0] is counted
+    cumulative = distribution.cdf(edges)
+    cumulative[0] = distribution.cdf(edges[0], inclusive=False)
+    grid = np.linspace(edges[0], edges[-1], density_points)
+    atom_pnl, atom_probability = distribution.atoms()
+
+    return {
+        'initial_cost': initial_cost,
+        'seed': None,
+        'num_simulations': 0,
+        'mean': mean,
+        'std_error': 0.0,
+        'std': std,
+        'skew': m3 / std**3 if std > 0 else np.nan,
+        'kurtosis': m4 / std**4 - 3 if std > 0 else np.nan,
+        'min': minimum,
+        'max': maximum,
+        'percentile_5': percentile_5,
+        'percentile_95': percentile_95,
+        'prob_profit': 1 - distribution.cdf(0.0),
+        'prob_loss': distribution.cdf(0.0, inclusive=False),
+        'prob_total_loss': distribution.cdf(-initial_cost),
+        'histogram': {'edges': edges, 'counts': np.diff(cumulative)},
+        'density': {'pnl': grid, 'density': distribution.density(grid),
+                    'atom_pnl': atom_pnl, 'atom_probability': atom_probability}
+    }
@@ -1,7 +1,8 @@
 import streamlit as st
 from styling import apply_page_config
+from utils import PortfolioBook
 
-if 'portfolio' not in st.session_state: st.session_state.portfolio = []
+if 'portfolio' not in st.session_state: st.session_state.portfolio = PortfolioBook()
 apply_page_config("Home")
 
 st.title("Option Portfolio Analyzer")
@@ -0,0 +1,192 @@
+"""
+Headless batch risk runner: payoff and PnL analytics for many portfolio files.
+
+Usage (from the repository root):
+
+    python batch.py portfolios/ --output risk.parquet --simulations 100000 --seed 42
+    python batch.py a.csv b.parquet --output risk.csv --workers 8 --override-market
+
+Each position file (the layout read by portfolio_io.read_positions) becomes
+one row of the results table. Every portfolio is valued on the same
+simulated terminal prices, so differences between rows are not sampling
+noise, and each worker process draws them only once.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from payoff import PiecewiseLinearPayoff
+from portfolio_io import read_positions
+from simulation import DEFAULT_NUM_WORKERS
+from utils import simulate_portfolio_pnl, simulate_terminal_prices
+
+POSITION_SUFFIXES = ('.csv', '.parquet', '.pq')
+
+# Portfolios handed to a worker at a time; amortises inter-process overhead
+DEFAULT_BATCH_CHUNK_SIZE = 8
+
+# Summary statistics copied from simulate_portfolio_pnl into each result row
+PNL_COLUMNS = ['initial_cost', 'mean', 'std', 'skew', 'kurtosis', 'min', 'max', 'percentile_5',
+               'percentile_95', 'prob_profit', 'prob_loss', 'prob_total_loss']
+
+# Per-process state set by _init_worker: the shared draws and market parameters
+_worker_state = {}
+
+
+def find_portfolios(paths) -> list:
+    """Expand directories into the position files they contain, sorted by name"""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files += sorted(p for p in path.iterdir() if p.suffix.lower() in POSITION_SUFFIXES)
+        else:
+            files.append(path)
+    return files
+
+
+def _init_worker(market: dict, num_simulations: int, seed, override_market: bool):
+    terminal_prices, entropy = simulate_terminal_prices(
+        market['spot'], market['expected_drift'], market['volatility'], market['maturity'],
+        num_simulations, seed
+    )
+    _worker_state.update(market=market, terminal_prices=terminal_prices, seed=entropy,
+                         override_market=override_market)
+
+
+def evaluate_portfolio(path) -> dict:
+    """One result row for the position file at path, using this process's shared draws"""
+    market = _worker_state['market']
+    row = {'portfolio': str(path)}
+    try:
+        book, errors = read_positions(path)
+    except Exception as error:  # a broken file must not abort the whole run
+        row['error'] = f"{type(error).__name__}: {error}"
+        return row
+    row['legs'] = len(book)
+    row['rejected_rows'] = errors['row'].nunique()
+    if len(book) == 0:
+        row['error'] = "No valid positions"
+        return row
+    try:
+        book.require_single_underlying()
+    except ValueError as error:
+        row['error'] = str(error)
+        return row
+
+    if _worker_state['override_market']:
+        book.set_market(spot=market['spot'], maturity=market['maturity'],
+                        rfr=market['rfr'], volatility=market['volatility'])
+
+    results = simulate_portfolio_pnl(book, seed=_worker_state['seed'],
+                                     terminal_prices=_worker_state['terminal_prices'], **market)
+
+    # Break-even on PnL at the horizon, net of the initial cost as in the simulation
+    profile = PiecewiseLinearPayoff.from_book(book)
+    break_evens = profile.break_evens(results['initial_cost'], market['rfr'], market['maturity'])
+    row['max_payoff'] = profile.max_gain()[0]
+    row['min_payoff'] = profile.max_loss()[0]
+    row['break_even_low'] = break_evens[0] if len(break_evens) else np.nan
+    row['break_even_high'] = break_evens[-1] if len(break_evens) else np.nan
+    row.update((name, results[name]) for name in PNL_COLUMNS)
+    return row
+
+
+def run_batch(
+    portfolios,
+    spot: float,
+    expected_drift: float,
+    volatility: float,
+    maturity: float,
+    rfr: float,
+    num_simulations: int = 10000,
+    seed=None,
+    num_workers: int = DEFAULT_NUM_WORKERS,
+    override_market: bool = False,
+    chunk_size: int = DEFAULT_BATCH_CHUNK_SIZE
+):
+    """
+    Payoff and simulated PnL analytics for every portfolio file, across a process pool.
+
+    All portfolios share one set of terminal prices drawn from seed.
+    override_market applies the market parameters to every option leg.
+    Returns (results, summary): one DataFrame row per file, in input order,
+    and a dict with the seed entropy, timing and throughput.
+    """
+    files = find_portfolios(portfolios)
+    market = dict(spot=spot, expected_drift=expected_drift, volatility=volatility,
+                  maturity=maturity, rfr=rfr)
+    # Resolve the seed once so every worker draws the same terminal prices
+    seed = np.random.SeedSequence(seed).entropy
+    init_args = (market, num_simulations, seed, override_market)
+
+    start = time.perf_counter()
+    num_workers = max(min(num_workers, len(files)), 1)
+    if num_workers == 1:
+        _init_worker(*init_args)
+        rows = [evaluate_portfolio(path) for path in files]
+    else:
+        with ProcessPoolExecutor(num_workers, initializer=_init_worker, initargs=init_args) as pool:
+            rows = list(pool.map(evaluate_portfolio, files, chunksize=chunk_size))
+    seconds = time.perf_counter() - start
+
+    results = pd.DataFrame(rows, columns=['portfolio', 'legs', 'rejected_rows', 'max_payoff',
+                                          'min_payoff', 'break_even_low', 'break_even_high',
+                                          *PNL_COLUMNS, 'error'])
+    summary = {
+        'portfolios': len(files),
+        'failed': int(results['error'].notna().sum()),
+        'num_simulations': num_simulations,
+        'seed': seed,
+        'num_workers': num_workers,
+        'seconds': seconds,
+        'portfolios_per_second': len(files) / seconds if seconds > 0 else float('inf')
+    }
+    return results, summary
+
+
+def write_results(results: pd.DataFrame, destination):
+    """Write the results table as Parquet (.parquet / .pq) or CSV (anything else)"""
+    if Path(destination).suffix.lower() in ('.parquet', '.pq'):
+        results.to_parquet(destination, index=False)
+    else:
+        results.to_csv(destination, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('portfolios', nargs='+', type=Path,
+                        help="Position files (CSV or Parquet) or directories of them")
+    parser.add_argument('--output', type=Path, required=True,
+                        help="Results table; Parquet for .parquet/.pq, else CSV")
+    parser.add_argument('--spot', type=float, default=100.0)
+    parser.add_argument('--drift', type=float, default=0.05, help="Expected annual drift")
+    parser.add_argument('--volatility', type=float, default=0.20)
+    parser.add_argument('--maturity', type=float, default=1.0, help="Horizon in years")
+    parser.add_argument('--rfr', type=float, default=0.05, help="Risk-free rate")
+    parser.add_argument('--simulations', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=None, help="Random seed (default: fresh entropy)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_NUM_WORKERS)
+    parser.add_argument('--override-market', action='store_true',
+                        help="Apply the market parameters to every option leg")
+    args = parser.parse_args(argv)
+
+    results, summary = run_batch(
+        args.portfolios, spot=args.spot, expected_drift=args.drift, volatility=args.volatility,
+        maturity=args.maturity, rfr=args.rfr, num_simulations=args.simulations, seed=args.seed,
+        num_workers=args.workers, override_market=args.override_market
+    )
+    write_results(results, args.output)
+
+    print(f"{summary['portfolios']} portfolios in {summary['seconds']:.2f} s "
+          f"({summary['portfolios_per_second']:,.1f} portfolios/s, {summary['num_workers']} workers)")
+    print(f"Seed: {summary['seed']} · {summary['num_simulations']:,} shared paths")
+    if summary['failed']:
+        print(f"{summary['failed']} portfolio(s) failed; see the 'error' column in {args.output}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+Benchmarks for the pricing, payoff and simulation hot paths.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_hot_paths.py                     # full matrix
+    python benchmarks/bench_hot_paths.py --quick             # small matrix
+    python benchmarks/bench_hot_paths.py --output bench.json
+    python benchmarks/bench_hot_paths.py --update-baseline   # record a local baseline
+
+Every case records wall time (best of several repeats), throughput and
+peak traced memory. Timings only compare on the same machine, so the
+baseline is not checked in: record one locally on the base commit with
+--update-baseline (written to benchmarks/baseline.json, which git
+ignores), then run again on your change. A case slower than
+baseline * (1 + threshold) is a regression and the script exits with
+status 1; cases whose baseline is under --min-wall-time are reported but
+not gated, since their timings are dominated by noise.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from incremental import IncrementalPnL  # noqa: E402
+from payoff import PiecewiseLinearPayoff  # noqa: E402
+from pricing import LATTICE_METHODS, black_scholes, implied_volatility, lattice_price  # noqa: E402
+from simulation import simulate_portfolio_pnl_streaming  # noqa: E402
+from utils import LEG_DEBT, Option, PortfolioBook, simulate_portfolio_pnl  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baseline.json'
+DEFAULT_THRESHOLD = 0.25
+# Cases faster than this (seconds) vary too much between runs to gate on
+DEFAULT_MIN_WALL_TIME = 0.005
+
+BOOK_SIZES = [1, 10, 100, 1000, 10000]
+PATH_COUNTS = [10_000, 100_000, 1_000_000, 10_000_000]
+QUICK_BOOK_SIZES = [1, 100, 10000]
+QUICK_PATH_COUNTS = [10_000, 100_000]
+
+# Spot grid used for the payoff-diagram aggregation cases
+DIAGRAM_POINTS = 1000
+
+# (dates x spot points) grid of the value-surface cases
+SURFACE_DATES = 20
+SURFACE_POINTS = 500
+
+# Option chain for the lattice cases: calls and puts on every strike, one shared tree
+CHAIN_STRIKES = np.arange(60.0, 141.0, 2.0)
+LATTICE_STEPS = [500, 5000]
+QUICK_LATTICE_STEPS = [500]
+
+# Repeat a case until this much time has been spent (at most MAX_REPEATS runs),
+# so sub-millisecond cases take the best of hundreds of runs
+MIN_TOTAL_TIME = 1.0
+MAX_REPEATS = 1000
+
+
+def make_book(num_legs: int, seed: int = 0) -> PortfolioBook:
+    """Deterministic mixed book of calls, puts, forwards and debt around spot 100"""
+    rng = np.random.default_rng(seed)
+    kind = rng.choice([0, 0, 1, 1, 2, 3], num_legs)
+    # Always include an option so even the one-leg book has a non-trivial PnL
+    kind[0] = 0
+    book = PortfolioBook(capacity=num_legs)
+    book.add_legs(
+        kind,
+        strike=rng.uniform(60, 140, num_legs).round(),
+        quantity=rng.integers(-5, 6, num_legs).astype(float),
+        spot=100.0,
+        maturity=1.0,
+        rfr=0.05,
+        volatility=0.2,
+        face_value=np.where(kind == LEG_DEBT, rng.normal(0, 10, num_legs), np.nan)
+    )
+    return book
+
+
+def measure(function, work: float, unit: str, params: dict) -> dict:
+    """Best-of wall time, then one traced run for peak memory"""
+    times = []
+    while len(times) < MAX_REPEATS and (not times or sum(times) < MIN_TOTAL_TIME):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    wall_time = min(times)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_time': wall_time,
+        'throughput': work / wall_time if wall_time > 0 else float('inf'),
+        'unit': unit,
+        'peak_memory_bytes': peak,
+        'repeats': len(times),
+        'params': params
+    }
+
+
+# Case generators yield (name, (function, work, unit, params)); main() measures them
+
+
+def pricing_cases(book_sizes):
+    for num_legs in book_sizes:
+        book = make_book(num_legs)
+        options = [leg for leg in book if hasattr(leg, 'volatility')]
+        option_rows = book.kind <= 1
+        params = {'legs': num_legs, 'option_legs': len(options)}
+
+        yield f'option_price_loop[legs={num_legs}]', (
+            lambda: [option.price() for option in options],
+            max(len(options), 1), 'contracts/s', params)
+        yield f'black_scholes_batch[legs={num_legs}]', (
+            lambda: black_scholes(book.kind[option_rows], book.strike[option_rows], 100.0,
+                                  1.0, 0.05, 0.2),
+            max(len(options), 1), 'contracts/s', params)
+
+        premiums = black_scholes(book.kind[option_rows], book.strike[option_rows], 100.0,
+                                 1.0, 0.05, 0.2, greeks=False)['price']
+        yield f'implied_volatility_batch[legs={num_legs}]', (
+            lambda: implied_volatility(book.kind[option_rows], premiums, book.strike[option_rows],
+                                       100.0, 1.0, 0.05),
+            max(len(options), 1), 'quotes/s', params)
+
+
+def lattice_cases(step_counts):
+    option_type = np.repeat(['call', 'put'], len(CHAIN_STRIKES))
+    strike = np.tile(CHAIN_STRIKES, 2)
+    for method in LATTICE_METHODS:
+        for steps in step_counts:
+            params = {'method': method, 'steps': steps, 'contracts': len(strike)}
+            yield f'lattice_american_chain[method={method},steps={steps}]', (
+                lambda: lattice_price(option_type, strike, 100.0, 1.0, 0.05, 0.2, steps=steps,
+                                      method=method),
+                len(strike), 'contracts/s', params)
+
+
+def payoff_cases(book_sizes):
+    spot_grid = np.linspace(50, 150, DIAGRAM_POINTS)
+    for num_legs in book_sizes:
+        book = make_book(num_legs)
+        legs = list(book)
+        params = {'legs': num_legs, 'points': DIAGRAM_POINTS}
+        work = num_legs * DIAGRAM_POINTS
+
+        def aggregation_loop():
+            total = np.zeros_like(spot_grid)
+            for asset in legs:
+                total += asset.payoff(spot_grid)
+            return total
+
+        yield f'payoff_per_asset_loop[legs={num_legs}]', (
+            aggregation_loop, work, 'leg-points/s', params)
+        yield f'payoff_book[legs={num_legs}]', (
+            lambda: book.payoff(spot_grid), work, 'leg-points/s', params)
+        yield f'payoff_piecewise_diagram[legs={num_legs}]', (
+            lambda: PiecewiseLinearPayoff.from_book(book).curve((50, 150)),
+            num_legs, 'legs/s', {'legs': num_legs})
+
+
+def surface_cases(book_sizes):
+    spot_grid = np.linspace(50, 150, SURFACE_POINTS)
+    elapsed = np.linspace(0, 1, SURFACE_DATES + 1)[:-1]
+    for num_legs in book_sizes:
+        book = make_book(num_legs)
+        params = {'legs': num_legs, 'points': SURFACE_POINTS, 'dates': SURFACE_DATES}
+        yield f'value_surface[legs={num_legs}]', (
+            lambda: book.value_surface(spot_grid, elapsed, 0.05, 1.0),
+            num_legs * SURFACE_POINTS * SURFACE_DATES, 'leg-points/s', params)
+
+
+def simulation_cases(book_sizes, path_counts):
+    market = dict(spot=100.0, expected_drift=0.05, volatility=0.2, maturity=1.0, rfr=0.05)
+    for num_legs in book_sizes:
+        book = make_book(num_legs)
+        for num_paths in path_counts:
+            params = {'legs': num_legs, 'paths': num_paths}
+            yield f'simulate_portfolio_pnl[legs={num_legs},paths={num_paths}]', (
+                lambda: simulate_portfolio_pnl(book, num_simulations=num_paths, seed=1, **market),
+                num_paths, 'paths/s', params)
+            yield f'simulate_streaming[legs={num_legs},paths={num_paths}]', (
+                lambda: simulate_portfolio_pnl_streaming(book, num_simulations=num_paths, seed=1,
+                                                         **market),
+                num_paths, 'paths/s', params)
+
+
+def incremental_cases(book_sizes, path_counts, wanted):
+    market = dict(spot=100.0, expected_drift=0.05, volatility=0.2, maturity=1.0, rfr=0.05)
+    for num_legs in book_sizes:
+        for num_paths in path_counts:
+            name = f'incremental_add_remove_leg[legs={num_legs},paths={num_paths}]'
+            # The paths are drawn and the book valued up front, so skip unwanted cases early
+            if not wanted(name):
+                continue
+            book = make_book(num_legs)
+            live = IncrementalPnL(num_simulations=num_paths, seed=1, **market)
+            live.sync(book)
+
+            def add_and_remove():
+                book.append(Option('put', 95.0))
+                live.sync(book)
+                book.remove(-1)
+                live.sync(book)
+
+            params = {'legs': num_legs, 'paths': num_paths}
+            yield name, (add_and_remove, 2, 'changes/s', params)
+
+
+def compare(results: dict, baseline: dict, threshold: float,
+            min_wall_time: float = DEFAULT_MIN_WALL_TIME) -> list:
+    """
+    Return (name, ratio) for every case slower than the baseline by more than threshold.
+
+    Cases whose baseline wall time is under min_wall_time get a ratio but
+    are never flagged.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        ratio = result['wall_time'] / reference['wall_time']
+        result['baseline_ratio'] = ratio
+        if ratio > 1 + threshold and reference['wall_time'] >= min_wall_time:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--quick', action='store_true', help="Run the reduced matrix")
+    parser.add_argument('--output', type=Path, help="Write results as JSON to this file")
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown versus baseline as a fraction (default 0.25)")
+    parser.add_argument('--min-wall-time', type=float, default=DEFAULT_MIN_WALL_TIME,
+                        help="Do not gate cases whose baseline is faster than this, in seconds "
+                             "(default 0.005)")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Store these results as the new baseline instead of comparing")
+    parser.add_argument('--filter', default='', help="Only run cases whose name contains this text")
+    args = parser.parse_args(argv)
+
+    book_sizes = QUICK_BOOK_SIZES if args.quick else BOOK_SIZES
+    path_counts = QUICK_PATH_COUNTS if args.quick else PATH_COUNTS
+    lattice_steps = QUICK_LATTICE_STEPS if args.quick else LATTICE_STEPS
+    cases = [pricing_cases(book_sizes), lattice_cases(lattice_steps), payoff_cases(book_sizes),
+             surface_cases(book_sizes),
+             simulation_cases(book_sizes, path_counts),
+             incremental_cases(book_sizes, path_counts, wanted=lambda name: args.filter in name)]
+
+    results = {}
+    for group in cases:
+        for name, case in group:
+            if args.filter not in name:
+                continue
+            results[name] = result = measure(*case)
+            print(f"{name:<60} {result['wall_time'] * 1e3:>10.2f} ms "
+                  f"{result['throughput']:>14,.0f} {result['unit']:<13} "
+                  f"{result['peak_memory_bytes'] / 1024**2:>8.1f} MiB")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor()
+        },
+        'results': results
+    }
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + '\n')
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = []
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())['results']
+        regressions = compare(results, baseline, args.threshold, args.min_wall_time)
+    else:
+        print(f"No baseline at {args.baseline}; record one with --update-baseline")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + '\n')
+
+    for name, ratio in regressions:
+        print(f"REGRESSION {name}: {ratio:.2f}x baseline wall time")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Cold-start benchmark: import time of the app and each page.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --budget 0.3 --repeats 10
+
+For each entry script the module-level import statements are executed in
+a fresh interpreter and timed (best of --repeats). Streamlit's own import
+is timed once as a reference and excluded from every entry, as are any
+modules it loads itself. An entry fails if its imports take longer than
+--budget seconds or load one of HEAVY_MODULES, which should only be
+imported once a computation or chart needs them. Exits with status 1 on
+any failure.
+"""
+import argparse
+import ast
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+ENTRY_POINTS = ['app.py', *sorted(str(p.relative_to(ROOT)) for p in (ROOT / 'pages').glob('*.py'))]
+
+DEFAULT_BUDGET = 0.5
+DEFAULT_REPEATS = 5
+
+# Modules that must stay out of the cold-start path
+HEAVY_MODULES = ['scipy.stats', 'scipy.special', 'pandas', 'plotly', 'pyarrow']
+
+# Run in a fresh interpreter: time the given import statements, report the time and
+# loaded modules. Statements needing a missing streamlit are skipped, not faked.
+_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+for statement in json.loads(sys.argv[1]):
+    try:
+        exec(statement)
+    except ModuleNotFoundError as error:
+        if error.name != 'streamlit':
+            raise
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'modules': sorted(sys.modules)}))
+'''
+
+
+def module_imports(path: Path) -> list:
+    """Module-level import statements of a script (imports inside blocks are lazy)"""
+    tree = ast.parse(path.read_text(), filename=str(path))
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def probe(statements: list, repeats: int) -> dict:
+    """Best-of-repeats time of the import statements, each run in a new interpreter"""
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', _PROBE, json.dumps(statements)], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output))
+    return {'seconds': min(run['seconds'] for run in runs), 'modules': set(runs[0]['modules'])}
+
+
+def _loaded(modules: set, name: str) -> bool:
+    return name in modules or any(module.startswith(name + '.') for module in modules)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help="Allowed import time per entry in seconds, excluding streamlit")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    args = parser.parse_args(argv)
+
+    reference = probe(['import streamlit'], args.repeats)
+    if _loaded(reference['modules'], 'streamlit'):
+        print(f"{'streamlit (reference)':<32} {reference['seconds'] * 1e3:>8.1f} ms")
+    else:
+        print("streamlit not installed: imports that need it are skipped")
+
+    failures = []
+    for entry in ENTRY_POINTS:
+        try:
+            result = probe(module_imports(ROOT / entry), args.repeats)
+        except subprocess.CalledProcessError as error:
+            failures.append(entry)
+            print(f"{entry:<32} import failed: {error.stderr.strip().splitlines()[-1]}")
+            continue
+        seconds = max(result['seconds'] - reference['seconds'], 0.0)
+        heavy = [name for name in HEAVY_MODULES
+                 if _loaded(result['modules'], name) and not _loaded(reference['modules'], name)]
+
+        status = 'ok'
+        if seconds > args.budget:
+            status = 'OVER BUDGET'
+        if heavy:
+            status = f"loads {', '.join(heavy)}"
+        if status != 'ok':
+            failures.append(entry)
+        print(f"{entry:<32} {seconds * 1e3:>8.1f} ms   {status}")
+
+    print(f"Budget: {args.budget * 1e3:.0f} ms per entry")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import hashlib
+import inspect
+import numbers
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+from payoff import PiecewiseLinearPayoff
+from utils import as_book
+
+# Defaults for the process-wide cache shared by every Streamlit session
+DEFAULT_MAX_BYTES = 512 * 1024**2
+DEFAULT_MAX_ENTRIES = 256
+
+
+def _canonical(value) -> bytes:
+    """Bytes identifying a parameter value, equal for equal numbers whatever their type"""
+    if isinstance(value, (bool, np.bool_)):
+        return repr(bool(value)).encode()
+    if isinstance(value, numbers.Real):
+        # Integral values as int so large seeds keep every digit; 100 and 100.0 match
+        value = float(value) if not isinstance(value, numbers.Integral) else int(value)
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return repr(value).encode()
+    if isinstance(value, (np.ndarray, list, tuple)):
+        array = np.asarray(value)
+        if array.dtype.kind in 'biuf':
+            array = np.ascontiguousarray(array, dtype=np.float64)
+            return f"{array.shape}".encode() + array.tobytes()
+        return repr(array.tolist()).encode()
+    return repr(value).encode()
+
+
+def fingerprint(portfolio, **params) -> str:
+    """
+    Canonical key for a portfolio plus the market/simulation parameters.
+
+    Numbers are hashed by value (100, 100.0 and np.float64(100) agree),
+    numeric arrays and sequences as float64 content with their shape,
+    other values by repr; keyword order is ignored.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(as_book(portfolio).fingerprint().encode())
+    for name, value in sorted(params.items()):
+        digest.update(name.encode() + b'=')
+        digest.update(_canonical(value) + b';')
+    return digest.hexdigest()
+
+
+def _size_of(value) -> int:
+    """Approximate memory held by a cached value"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_size_of(v) for v in value.values())
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + _size_of(vars(value))
+    return sys.getsizeof(value)
+
+
+def _freeze(value):
+    """Make cached arrays read-only so one caller cannot corrupt another's result"""
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _freeze(item)
+    elif hasattr(value, '__dict__'):
+        _freeze(vars(value))
+    return value
+
+
+class ResultCache:
+    """
+    Thread-safe, size-bounded LRU cache keyed by content fingerprints.
+
+    Entries are evicted least-recently-used first once either max_bytes or
+    max_entries is exceeded. Hit/miss counters are kept for monitoring.
+    """
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached value or None, updating recency and counters"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = _size_of(value)
+        if size > self.max_bytes:
+            return value
+        value = _freeze(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+        return value
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
+
+
+# Module-level instance: Streamlit sessions share the interpreter, so they share this cache
+RESULT_CACHE = ResultCache()
+
+
+def resolve_seed(simulate, params: dict) -> dict:
+    """
+    params with an unseeded run's seed replaced by fresh entropy.
+
+    Keying on seed=None would hand every later unseeded run the first one's
+    draws; the entropy reproduces the run and is returned as its 'seed'.
+    """
+    if params.get('seed') is None and 'seed' in inspect.signature(simulate).parameters:
+        params = {**params, 'seed': np.random.SeedSequence().entropy}
+    return params
+
+
+def cached_simulation(simulate, portfolio, cache: ResultCache = RESULT_CACHE, **params) -> dict:
+    """
+    Run simulate(portfolio=..., **params) through the result cache.
+
+    An unseeded run draws fresh entropy first, so it is a new simulation
+    rather than a repeat of an earlier unseeded one.
+    """
+    params = resolve_seed(simulate, params)
+    key = fingerprint(portfolio, function=f"{simulate.__module__}.{simulate.__qualname__}", **params)
+    results = cache.get_or_compute(key, lambda: simulate(portfolio=portfolio, **params))
+    # Shallow copy so callers can add keys without touching the shared entry
+    return dict(results)
+
+
+def cached_payoff(portfolio, spot_prices, cache: ResultCache = RESULT_CACHE):
+    """Total payoff of the portfolio on the given spot grid, through the result cache"""
+    book = as_book(portfolio)
+    spot_prices = np.asarray(spot_prices, dtype=np.float64)
+    key = fingerprint(book, function='payoff', spot_prices=spot_prices)
+    return cache.get_or_compute(key, lambda: book.payoff(spot_prices))
+
+
+def cached_value_surface(portfolio, spot_prices, elapsed, rfr: float, maturity: float,
+                         cache: ResultCache = RESULT_CACHE):
+    """Book value over a (time elapsed x spot) grid (PortfolioBook.value_surface), through the result cache"""
+    book = as_book(portfolio)
+    spot_prices = np.asarray(spot_prices, dtype=np.float64)
+    elapsed = np.asarray(elapsed, dtype=np.float64)
+    key = fingerprint(book, function='value_surface', spot_prices=spot_prices, elapsed=elapsed,
+                      rfr=rfr, maturity=maturity)
+    return cache.get_or_compute(key, lambda: book.value_surface(spot_prices, elapsed, rfr, maturity))
+
+
+def cached_payoff_profile(portfolio, cache: ResultCache = RESULT_CACHE) -> PiecewiseLinearPayoff:
+    """Exact piecewise-linear payoff of the portfolio, through the result cache"""
+    book = as_book(portfolio)
+    key = fingerprint(book, function='payoff_profile')
+    return cache.get_or_compute(key, lambda: PiecewiseLinearPayoff.from_book(book))
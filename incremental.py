@@ -0,0 +1,128 @@
+import numpy as np
+from utils import PortfolioBook, as_book, simulate_terminal_prices, summarize_pnl
+
+
+def _payoff_rows(book: PortfolioBook) -> np.ndarray:
+    """One float row per leg holding every column its expiry payoff depends on"""
+    return np.column_stack([book.kind.astype(np.float64), book.strike, book.quantity,
+                            book.face_value])
+
+
+def _row_keys(rows: np.ndarray) -> np.ndarray:
+    """Rows as opaque byte strings, so equal legs compare equal even with NaN fields"""
+    rows = np.ascontiguousarray(rows)
+    return rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+
+
+class IncrementalPayoff:
+    """
+    Total expiry payoff of a book at fixed prices, kept current leg by leg.
+
+    sync(book) evaluates only the legs added or removed since the last sync,
+    rebuilding from the book when more legs changed than it holds.
+    """
+    def __init__(self, prices):
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.total = np.zeros_like(self.prices)
+        self.revalued_legs = 0
+        self._rows = np.empty((0, 4))
+
+    def sync(self, portfolio) -> int:
+        """Bring total up to date with the book; returns the number of legs evaluated"""
+        book = as_book(portfolio)
+        rows = _payoff_rows(book)
+        old_keys, new_keys = _row_keys(self._rows), _row_keys(rows)
+
+        # Common case first: legs were only appended
+        if len(rows) >= len(self._rows) and np.array_equal(new_keys[:len(old_keys)], old_keys):
+            changed, multiplicity = rows[len(self._rows):], np.ones(len(rows) - len(self._rows))
+        else:
+            # Multiset difference: every distinct leg with how many more (or fewer) copies it has
+            keys = np.concatenate([old_keys, new_keys])
+            _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            count = (np.bincount(inverse[len(old_keys):], minlength=len(first))
+                     - np.bincount(inverse[:len(old_keys)], minlength=len(first)))
+            moved = count != 0
+            changed = np.concatenate([self._rows, rows])[first[moved]]
+            multiplicity = count[moved].astype(np.float64)
+
+        if len(changed) >= len(rows):
+            self.total = book.payoff(self.prices)
+            self.revalued_legs = len(rows)
+        elif len(changed):
+            # Payoffs are linear in quantity (face value for debt), so a leg added or removed
+            # m times is one leg with m times the size
+            delta = PortfolioBook(capacity=len(changed))
+            delta.add_legs(changed[:, 0], strike=changed[:, 1], quantity=changed[:, 2] * multiplicity,
+                           face_value=changed[:, 3] * multiplicity)
+            self.total = self.total + delta.payoff(self.prices)
+            self.revalued_legs = len(changed)
+        else:
+            self.revalued_legs = 0
+        self._rows = rows
+        return self.revalued_legs
+
+
+class IncrementalPnL:
+    """
+    simulate_portfolio_pnl statistics kept current as legs are added or removed.
+
+    The terminal prices are drawn once, as simulate_portfolio_pnl draws them
+    for the same seed, and only changed legs are revalued on them. The
+    samples (24 bytes per path) stay on the instance, out of the results.
+    """
+    def __init__(
+        self,
+        spot: float,
+        expected_drift: float,
+        volatility: float,
+        maturity: float,
+        rfr: float,
+        num_simulations: int = 10000,
+        seed=None,
+        bins: int = None,
+        terminal_prices=None
+    ):
+        self.spot = spot
+        self.expected_drift = expected_drift
+        self.volatility = volatility
+        self.maturity = maturity
+        self.rfr = rfr
+        self.bins = bins
+        if terminal_prices is None:
+            terminal_prices, seed = simulate_terminal_prices(spot, expected_drift, volatility, maturity,
+                                                             num_simulations, seed)
+        self.seed = seed
+        self.terminal_values = IncrementalPayoff(terminal_prices)
+        self.pnl = None
+        self._results = None
+
+    @property
+    def terminal_prices(self) -> np.ndarray:
+        return self.terminal_values.prices
+
+    def sync(self, portfolio) -> dict:
+        """
+        Results for the book as simulate_portfolio_pnl returns them, without
+        'pnl_samples' / 'terminal_prices', plus the 'std_error' of the mean
+        and 'revalued_legs', the number of legs whose payoff had to be evaluated.
+        """
+        book = as_book(portfolio)
+        revalued = self.terminal_values.sync(book)
+        initial_cost = book.initial_cost(spot=self.spot, rfr=self.rfr, maturity=self.maturity)
+        if self._results is not None and revalued == 0 and initial_cost == self._results['initial_cost']:
+            self._results['revalued_legs'] = 0
+            return self._results
+
+        pnl = self.terminal_values.total - initial_cost * np.exp(self.rfr * self.maturity)
+        summary = summarize_pnl(pnl, initial_cost, self.bins)
+        self.pnl = pnl
+        self._results = {
+            'initial_cost': initial_cost,
+            'seed': self.seed,
+            'num_simulations': len(pnl),
+            **summary,
+            'std_error': summary['std'] / np.sqrt(len(pnl)),
+            'revalued_legs': revalued
+        }
+        return self._results
@@ -0,0 +1,243 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from cache import RESULT_CACHE, ResultCache, fingerprint, resolve_seed
+from simulation import (DEFAULT_CHUNK_SIZE, DEFAULT_NUM_WORKERS, plan_multi_asset_pnl,
+                        plan_portfolio_pnl_streaming, simulate_multi_asset_pnl,
+                        simulate_portfolio_pnl_streaming)
+from utils import as_book
+
+# Paths per task: the granularity of progress, partial results and cancellation
+DEFAULT_TASK_PATHS = 4 * DEFAULT_CHUNK_SIZE
+
+# A job nobody has polled for this long is treated as abandoned and cancelled
+DEFAULT_IDLE_TIMEOUT = 30.0
+
+# How often a job's coordinator wakes up to check for cancellation
+_WAIT_SECONDS = 0.25
+
+# Streaming simulations that can run as jobs, keyed by the function cached_simulation would call
+_PLANNERS = {
+    simulate_portfolio_pnl_streaming: plan_portfolio_pnl_streaming,
+    simulate_multi_asset_pnl: plan_multi_asset_pnl
+}
+
+
+class SimulationJob:
+    """
+    A streaming simulation running in the background, split into tasks.
+
+    status is 'running', 'done', 'cancelled' or 'failed'. Tasks merge in
+    order, so partial() covers a prefix of the paths and the result equals
+    the simulation with one worker per task.
+    """
+    def __init__(self, key: str, plan=None, results: dict = None):
+        self.key = key
+        # The request this job serves in JobManager; differs from key for unseeded runs
+        self.request_key = key
+        self.plan = plan
+        self.status = 'running' if results is None else 'done'
+        self.error = None
+        self.paths_total = sum(plan.task_paths) if plan is not None else results['num_simulations']
+        self.paths_done = 0 if results is None else self.paths_total
+        self.subscribers = 1
+        self.last_polled = time.monotonic()
+        self._results = results
+        self._accumulator = None if plan is None else plan.accumulator()
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+        if results is not None:
+            self._finished.set()
+
+    @property
+    def progress(self) -> float:
+        return self.paths_done / self.paths_total if self.paths_total else 1.0
+
+    def poll(self) -> 'SimulationJob':
+        """Mark the job as still wanted; pollers must call this within the idle timeout"""
+        self.last_polled = time.monotonic()
+        return self
+
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._finished.wait(timeout)
+
+    def cancel(self):
+        """Withdraw one subscriber; the job stops once none remain"""
+        with self._lock:
+            self.subscribers -= 1
+            if self.subscribers <= 0:
+                self._cancelled.set()
+
+    def partial(self) -> dict:
+        """Results over the paths merged so far, or None before the first task completes"""
+        if self._results is not None:
+            return self._results
+        with self._lock:
+            if self._accumulator.moments.count == 0:
+                return None
+            return self.plan.finish(self._accumulator)
+
+    def stage_records(self) -> list:
+        """Stage timings (profiling.StageProfiler records) of the tasks merged so far"""
+        if self._accumulator is None:
+            return []
+        with self._lock:
+            return list(self._accumulator.stage_records)
+
+    def result(self) -> dict:
+        """Final results (a shallow copy of the cached entry); raises unless status is 'done'"""
+        if self.status != 'done':
+            raise RuntimeError(f"Simulation job is {self.status}" + (f": {self.error}" if self.error else ""))
+        return dict(self._results)
+
+    def _merge(self, partial, paths: int):
+        with self._lock:
+            self._accumulator.merge(partial)
+            self.paths_done += paths
+
+    def _abandoned(self, idle_timeout: float) -> bool:
+        return self._cancelled.is_set() or time.monotonic() - self.last_polled > idle_timeout
+
+
+class JobManager:
+    """
+    Runs simulations as background jobs on one process pool shared by every session.
+
+    Identical requests share the running job or its cached result. A job
+    stops once every subscriber cancels or nobody polls it for idle_timeout.
+    """
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_NUM_WORKERS,
+        cache: ResultCache = RESULT_CACHE,
+        task_paths: int = DEFAULT_TASK_PATHS,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT
+    ):
+        if task_paths <= 0:
+            raise ValueError("task_paths must be positive")
+        self.max_workers = max(max_workers, 1)
+        self.cache = cache
+        self.task_paths = task_paths
+        self.idle_timeout = idle_timeout
+        self._jobs = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        # Created on first use, so importing this module starts no processes; callers hold _lock
+        if self._pool is None:
+            self._pool = (ProcessPoolExecutor(self.max_workers) if self.max_workers > 1
+                          else ThreadPoolExecutor(1))
+        return self._pool
+
+    def submit(self, simulate, portfolio, num_workers: int = None, **params) -> SimulationJob:
+        """
+        Start simulate(portfolio=..., **params) in the background, or join an identical job.
+
+        Results are reproducible for a given seed and path count; num_workers
+        only caps this job's tasks in flight. An unseeded request joins an
+        identical unseeded job in flight (its draws depend on nobody's
+        choice of seed) but never reuses a finished result.
+        """
+        if simulate not in _PLANNERS:
+            raise ValueError(f"{simulate.__qualname__} cannot run as a background job")
+        book = as_book(portfolio)
+        function = f"jobs:{simulate.__module__}.{simulate.__qualname__}"
+        resolved = resolve_seed(simulate, params)
+        unseeded = resolved is not params
+        # seed=None and an omitted seed are the same request
+        request_key = fingerprint(book, function=function, task_paths=self.task_paths,
+                                  **({**params, 'seed': None} if unseeded else params))
+        with self._lock:
+            job = self._jobs.get(request_key)
+            if job is not None:
+                with job._lock:
+                    if not job._cancelled.is_set():
+                        job.subscribers += 1
+                        return job.poll()
+            if not unseeded:
+                results = self.cache.get(request_key)
+                if results is not None:
+                    return SimulationJob(request_key, results=results)
+
+            # The result is cached under the seed actually used
+            params = resolved
+            key = fingerprint(book, function=function, task_paths=self.task_paths, **params)
+            target_std_error = params.pop('target_std_error', None)
+            num_tasks = max(-(-params.get('num_simulations', 10000) // self.task_paths), 1)
+            # The job keeps its own copy, so later edits to the session's book cannot leak in
+            plan = _PLANNERS[simulate](book.select(slice(None)), num_workers=num_tasks, **params)
+            job = SimulationJob(key, plan)
+            job.request_key = request_key
+            self._jobs[request_key] = job
+            pool = self._executor()
+
+        limit = min(num_workers or self.max_workers, self.max_workers)
+        threading.Thread(target=self._run, args=(job, pool, limit, target_std_error), daemon=True,
+                         name=f"simulation-job-{key[:8]}").start()
+        return job
+
+    def _run(self, job: SimulationJob, pool, limit: int, target_std_error: float):
+        """Coordinator thread: feed tasks to the pool and merge their results in order"""
+        plan = job.plan
+        in_flight, completed = {}, {}
+        next_task = merged = 0
+        try:
+            while merged < len(plan.tasks):
+                if job._abandoned(self.idle_timeout):
+                    job._cancelled.set()
+                    job.status = 'cancelled'
+                    break
+                while next_task < len(plan.tasks) and len(in_flight) < limit:
+                    future = pool.submit(plan.worker, *plan.tasks[next_task])
+                    in_flight[future] = next_task
+                    next_task += 1
+
+                finished, _ = wait(in_flight, timeout=_WAIT_SECONDS, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    completed[in_flight.pop(future)] = future.result()
+                while merged in completed:
+                    job._merge(completed.pop(merged), plan.task_paths[merged])
+                    merged += 1
+                    if target_std_error is not None and \
+                            job._accumulator.estimator.std_error <= target_std_error:
+                        break
+                else:
+                    continue
+                break
+
+            if job.status == 'running':
+                job._results = self.cache.put(job.key, job.partial())
+                job.status = 'done'
+        except Exception as error:  # surfaced to the page through status, not lost in the thread
+            job.status = 'failed'
+            job.error = f"{type(error).__name__}: {error}"
+        finally:
+            for future in in_flight:
+                future.cancel()
+            with self._lock:
+                if self._jobs.get(job.request_key) is job:
+                    del self._jobs[job.request_key]
+            job._finished.set()
+
+    def running(self) -> list:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def shutdown(self):
+        """Cancel every running job and stop the pool"""
+        for job in self.running():
+            job._cancelled.set()
+            job.wait()
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+# Shared by every session, like cache.RESULT_CACHE
+JOB_MANAGER = JobManager()
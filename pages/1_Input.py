@@ -1,10 +1,14 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
 from styling import apply_page_config
-from utils import Forward, Option, Debt
+from utils import (Forward, Option, Debt, PortfolioBook, LEG_CALL, LEG_PUT, LEG_FORWARD, LEG_DEBT,
+                   MAX_UNDERLYING_LENGTH)
+
+# Rows sent to the browser for the portfolio table; export the file for the full book
+MAX_TABLE_ROWS = 10_000
 
 if 'portfolio' not in st.session_state:
-    st.session_state.portfolio = []
+    st.session_state.portfolio = PortfolioBook()
 
 apply_page_config("Portfolio Input")
 
@@ -17,56 +21,58 @@ with col1:
     st.subheader("Current Portfolio")
         
     if len(st.session_state.portfolio) > 0:
-        # Create portfolio table
-        portfolio_data = []
-        
-        for i, asset in enumerate(st.session_state.portfolio):
-            if type(asset).__name__ == 'Option':
-                portfolio_data.append({
-                    'ID': i,
-                    'Type': 'Option',
-                    'Call/Put': asset.option_type.capitalize(),
-                    'Strike': asset.strike,
-                    'Quantity': asset.quantity,
-                    'Spot': asset.spot,
-                    'Maturity': asset.maturity,
-                    'RFR': asset.rfr,
-                    'Volatility': asset.volatility,
-                    'Face Value': '-'
-                })
-            elif type(asset).__name__ == 'Debt':
-                portfolio_data.append({
-                    'ID': i,
-                    'Type': 'Debt',
-                    'Call/Put': '-',
-                    'Strike': '-',
-                    'Quantity': '-',
-                    'Spot': '-',
-                    'Maturity': '-',
-                    'RFR': '-',
-                    'Volatility': '-',
-                    'Face Value': asset.face_value
-                })
-            elif type(asset).__name__ == 'Forward':
-                portfolio_data.append({
-                    'ID': i,
-                    'Type': 'Forward',
-                    'Call/Put': '-',
-                    'Strike': asset.strike,
-                    'Quantity': asset.quantity,
-                    'Spot': '-',
-                    'Maturity': '-',
-                    'RFR': '-',
-                    'Volatility': '-',
-                    'Face Value': '-'
-                })
+        # Create portfolio table straight from the book's columns; fields that do not
+        # apply to a leg are left empty (NaN) so every column stays numeric
+        book = st.session_state.portfolio.select(slice(0, MAX_TABLE_ROWS))
+        kind = book.kind
+        is_option = kind <= LEG_PUT
+        has_strike = kind != LEG_DEBT
+
+        def masked(values, mask):
+            return np.where(mask, values, np.nan)
+
+        portfolio_data = {
+            'ID': np.arange(len(book)),
+            'Type': np.select([is_option, kind == LEG_FORWARD], ['Option', 'Forward'], 'Debt'),
+            'Call/Put': np.select([kind == LEG_CALL, kind == LEG_PUT], ['Call', 'Put'], '-'),
+            'Underlying': np.where(has_strike, book.underlying, '-'),
+            'Strike': masked(book.strike, has_strike),
+            'Quantity': masked(book.quantity, has_strike),
+            'Spot': masked(book.spot, is_option),
+            'Maturity': masked(book.maturity, is_option),
+            'RFR': masked(book.rfr, is_option),
+            'Volatility': masked(book.volatility, is_option),
+            'Face Value': masked(book.face_value, kind == LEG_DEBT)
+        }
         
-        df_portfolio = pd.DataFrame(portfolio_data)
-        st.dataframe(df_portfolio, use_container_width=True, hide_index=True)
+        st.dataframe(portfolio_data, use_container_width=True, hide_index=True)
+        if len(st.session_state.portfolio) > MAX_TABLE_ROWS:
+            st.caption(f"Showing the first {MAX_TABLE_ROWS:,} of {len(st.session_state.portfolio):,} "
+                       "positions. Export the portfolio to see every row.")
         
-        if st.button("Clear Portfolio"):
-            st.session_state.portfolio = []
+        clear_col, export_col = st.columns(2)
+        if clear_col.button("Clear Portfolio"):
+            st.session_state.portfolio.clear()
             st.rerun()
+        
+        # Files are built (and pandas/pyarrow loaded) only on request, then kept until the book changes
+        book_fingerprint = st.session_state.portfolio.fingerprint()
+        if export_col.button("Prepare Export"):
+            from portfolio_io import write_positions
+            st.session_state.portfolio_export = {
+                'fingerprint': book_fingerprint,
+                'csv': write_positions(st.session_state.portfolio),
+                'parquet': write_positions(st.session_state.portfolio, file_format='parquet')
+            }
+        export = st.session_state.get('portfolio_export')
+        if export is not None and export['fingerprint'] != book_fingerprint:
+            export = st.session_state.portfolio_export = None
+        if export is not None:
+            csv_col, parquet_col = st.columns(2)
+            csv_col.download_button("Export CSV", data=export['csv'], file_name="portfolio.csv",
+                                    mime="text/csv")
+            parquet_col.download_button("Export Parquet", data=export['parquet'],
+                                        file_name="portfolio.parquet")
     else:
         st.info("None.")
 
@@ -89,9 +95,12 @@ with col2:
         )
         strike = st.number_input("Strike Price", value=100, step=5)
         quantity = st.number_input("Quantity", value=1, step=1)
+        underlying = st.text_input("Underlying", max_chars=MAX_UNDERLYING_LENGTH,
+                                   help="Optional identifier for books spanning several assets")
         
         if st.button("Add Option", use_container_width=True):
-            new_option = Option(option_type.lower(), strike=strike, quantity=quantity)
+            new_option = Option(option_type.lower(), strike=strike, quantity=quantity,
+                                underlying=underlying.strip())
             st.session_state.portfolio.append(new_option)
             st.rerun()
 
@@ -106,18 +115,39 @@ with col2:
     elif asset_type == "Forward":
         strike = st.number_input("Strike Price", value=100, step=5)
         quantity = st.number_input("Quantity", value=1, step=1)
+        underlying = st.text_input("Underlying", max_chars=MAX_UNDERLYING_LENGTH,
+                                   help="Optional identifier for books spanning several assets")
 
         if st.button("Add Forward", use_container_width=True):
-            new_forward = Forward(strike=strike, quantity=quantity)
+            new_forward = Forward(strike=strike, quantity=quantity, underlying=underlying.strip())
             st.session_state.portfolio.append(new_forward)
             st.rerun()
 
 
     st.divider()
 
-    # CSV Upload option
-    uploaded_file = st.file_uploader("**Upload CSV**", type=['csv'])
-    if uploaded_file is not None:
-        # TODO: Implement CSV parsing
-        st.info("CSV upload functionality coming soon!")
+    # Bulk upload: one row per leg with columns
+    # type, underlying, strike, quantity, spot, maturity, rfr, volatility, face_value
+    uploaded_file = st.file_uploader("**Upload Positions**", type=['csv', 'parquet'],
+                                     help="One row per leg. Columns: type (call/put/forward/debt), underlying, "
+                                          "strike, quantity, spot, maturity, rfr, volatility, face_value")
+    if uploaded_file is not None and st.button("Load Positions", use_container_width=True):
+        import pandas as pd
+        from portfolio_io import read_positions
+        # Only a file that parses to the end is added to the portfolio
+        try:
+            loaded, errors = read_positions(uploaded_file)
+        except pd.errors.ParserError as error:
+            st.error(f"Could not parse {uploaded_file.name}: {error}")
+        except ValueError as error:
+            st.error(str(error))
+        else:
+            st.session_state.portfolio.extend(loaded)
+            st.session_state.import_errors = errors
+            st.rerun()
+
+    if len(st.session_state.get('import_errors', [])) > 0:
+        errors = st.session_state.import_errors
+        st.warning(f"{errors['row'].nunique():,} row(s) were rejected")
+        st.dataframe(errors, hide_index=True, use_container_width=True)
 
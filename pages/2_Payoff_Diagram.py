@@ -1,61 +1,145 @@
+from contextlib import nullcontext
 import streamlit as st
 import numpy as np
-import plotly.graph_objects as go
 from styling import apply_page_config
+from utils import LEG_DEBT, LEG_PUT, PortfolioBook
+from cache import cached_payoff_profile, cached_value_surface
+from profiling import StageProfiler, stage
 
-if 'portfolio' not in st.session_state: st.session_state.portfolio = []
+if 'portfolio' not in st.session_state: st.session_state.portfolio = PortfolioBook()
 apply_page_config("Payoff Diagram")
 
 
 st.title("Payoff Diagram Analysis")
 
+st.sidebar.subheader("Value Before Expiry")
+time_slices = st.sidebar.slider("Time Slices", 0, 20, 4,
+                                help="Black-Scholes value of the book at evenly spaced dates from today "
+                                     "(T+0) up to expiry, overlaid on the payoff. 0 = payoff only")
+surface_rfr = st.sidebar.number_input("Risk-Free Rate", value=0.05, step=0.01, format="%.2f",
+                                      help="Discounts forwards and debt; option legs use their own "
+                                           "rate, volatility and maturity")
+spot = st.sidebar.number_input("Spot Price", value=100.0, step=1.0,
+                               help="Values forward legs in the initial cost behind the break-even")
+profile_performance = st.sidebar.checkbox("Show Performance", help="Time each stage of building this page")
+profiler = StageProfiler() if profile_performance else nullcontext()
+
+
+# Spot points per time-slice curve; the surface is valued for all slices in one batch
+SURFACE_POINTS = 500
+
+
+def format_payoff(value):
+    return "Unlimited" if np.isinf(value) else f"${value:,.2f}"
 
-# Settings
-spot_range = [90, 110]
-num_points = 21
-y_range = [-20, 20]
 
 if len(st.session_state.portfolio) > 0:
-    # Create spot range
-    spot_range_array = np.linspace(spot_range[0], spot_range[1], num_points)
-    
-    # Calculate total payoff
-    total_payoff = np.zeros_like(spot_range_array)
-    for asset in st.session_state.portfolio:
-        payoff = asset.payoff(spot_range_array)
-        total_payoff += payoff
-    
-    # Create plotly figure
-    fig = go.Figure()
-    
-    fig.add_trace(go.Scatter(
-        x=spot_range_array,
-        y=total_payoff,
-        mode='lines',
-        name='Total Payoff',
-        line=dict(color='#ff4b4b', width=3)
-    ))
-    
-    # Update layout
-    fig.update_layout(
-        title="Portfolio Payoff Diagram",
-        height=600,
-        xaxis_title="Spot Price",
-        yaxis_title="Payoff",
-        xaxis=dict(range=[spot_range[0], spot_range[1]], gridcolor='rgba(128,128,128,0.2)',
-        dtick=1,
-        showgrid=True),
-        yaxis=dict(range=y_range, gridcolor='rgba(128,128,128,0.2)'),
-        plot_bgcolor='#0e1117',
-        paper_bgcolor='#0e1117',
-        font=dict(color='white'),
-        hovermode='x unified'
-    )
-    
-    # Add zero line
-    fig.add_hline(y=0, line_color='white', line_width=1, opacity=.5)
-    
-    st.plotly_chart(fig, use_container_width=True)
+    # The chart has one spot axis, so a book spanning several underlyings is shown one at a time
+    book = st.session_state.portfolio
+    underlyings = book.underlyings()
+    if len(underlyings) > 1:
+        underlying = st.selectbox("Underlying", underlyings,
+                                  help="Legs on this underlying; debt is included in every view")
+        book = book.select((book.underlying == underlying) | (book.kind == LEG_DEBT))
+
+    with profiler:
+        # Exact piecewise-linear payoff, reused across reruns and sessions
+        with stage('payoff_profile'):
+            profile = cached_payoff_profile(book)
+
+        # Expiry is the longest option maturity
+        option_maturity = book.maturity[book.kind <= LEG_PUT]
+        expiry = option_maturity.max() if len(option_maturity) else 1.0
+
+        # Chart range follows the strikes and break-even points; break-even is on PnL, net of the cost
+        with stage('payoff_curve'):
+            initial_cost = book.initial_cost(spot=spot, rfr=surface_rfr, maturity=expiry)
+            cost_at_expiry = initial_cost * np.exp(surface_rfr * expiry)
+            spot_range = profile.auto_range(level=cost_at_expiry)
+            spot_range_array, total_payoff = profile.curve(spot_range)
+            break_evens = profile.break_evens(initial_cost, surface_rfr, expiry)
+            max_gain, max_gain_spot = profile.max_gain()
+            max_loss, max_loss_spot = profile.max_loss()
+
+        # Value at dates before expiry
+        if time_slices:
+            with stage('value_surface'):
+                elapsed = np.linspace(0.0, expiry, time_slices + 1)[:-1]
+                surface_spots = np.linspace(spot_range[0], spot_range[1], SURFACE_POINTS)
+                surface = cached_value_surface(book, surface_spots, elapsed, surface_rfr, expiry)
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Max Payoff", format_payoff(max_gain),
+                    help=None if np.isinf(max_gain) else f"At spot {max_gain_spot:,.2f}")
+        col2.metric("Min Payoff", format_payoff(max_loss),
+                    help=None if np.isinf(max_loss) else f"At spot {max_loss_spot:,.2f}")
+        col3.metric("Break-even", ", ".join(f"{x:,.2f}" for x in break_evens) or "None",
+                    help=f"Spot at expiry where the payoff covers the initial cost of "
+                         f"${initial_cost:,.2f} grown at the risk-free rate")
+
+        with stage('build_figure'):
+            import plotly.graph_objects as go
+            fig = go.Figure()
+
+            # Earliest dates faintest, drawn under the payoff curve
+            for i in range(time_slices):
+                fig.add_trace(go.Scatter(
+                    x=surface_spots,
+                    y=surface[i],
+                    mode='lines',
+                    name=f"T+{elapsed[i]:.2f}y",
+                    line=dict(color='#4b9bff', width=1.5),
+                    opacity=0.35 + 0.65 * (i + 1) / time_slices,
+                    hovertemplate=f"{expiry - elapsed[i]:.2f}y to expiry: %{{y:,.2f}}<extra></extra>"
+                ))
+
+            fig.add_trace(go.Scatter(
+                x=spot_range_array,
+                y=total_payoff,
+                mode='lines',
+                name='Total Payoff',
+                line=dict(color='#ff4b4b', width=3)
+            ))
+
+            # Break-even is where the payoff meets the cost grown to expiry
+            if len(break_evens) > 0:
+                fig.add_trace(go.Scatter(
+                    x=break_evens,
+                    y=np.full_like(break_evens, cost_at_expiry),
+                    mode='markers',
+                    name='Break-even',
+                    marker=dict(color='yellow', size=9)
+                ))
+
+            # Update layout
+            fig.update_layout(
+                title="Portfolio Payoff Diagram",
+                height=600,
+                xaxis_title="Spot Price",
+                yaxis_title="Payoff / Value" if time_slices else "Payoff",
+                xaxis=dict(range=[spot_range[0], spot_range[1]], gridcolor='rgba(128,128,128,0.2)',
+                showgrid=True),
+                yaxis=dict(gridcolor='rgba(128,128,128,0.2)'),
+                plot_bgcolor='#0e1117',
+                paper_bgcolor='#0e1117',
+                font=dict(color='white'),
+                hovermode='x unified'
+            )
+
+            # Add zero line
+            fig.add_hline(y=0, line_color='white', line_width=1, opacity=.5)
+            fig.add_hline(y=cost_at_expiry, line_color='yellow', line_width=1, line_dash='dash',
+                          opacity=.5, annotation_text="Cost at expiry",
+                          annotation_position="top left")
+
+        with stage('render_chart'):
+            st.plotly_chart(fig, use_container_width=True)
+
+    if profile_performance:
+        with st.expander("Performance", expanded=True):
+            st.dataframe(profiler.summary(), hide_index=True, use_container_width=True)
+            st.caption(f"{len(profile.vertices)} payoff vertices · "
+                       f"{time_slices} x {SURFACE_POINTS} value surface · "
+                       "cached profiles and surfaces skip their build time")
 else:
     st.info("No portfolio loaded.")
-
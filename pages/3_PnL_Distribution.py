@@ -1,12 +1,18 @@
+from contextlib import nullcontext
 import streamlit as st
 import numpy as np
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from styling import apply_page_config
-from utils import simulate_portfolio_pnl
+from utils import LEG_PUT, PortfolioBook
+from simulation import (DEFAULT_NUM_WORKERS, simulate_multi_asset_pnl, simulate_portfolio_pnl_streaming,
+                        simulate_stress_grid)
+from analytic import DEFAULT_EXACT_BINS, exact_portfolio_pnl
+from cache import RESULT_CACHE, cached_simulation
+from incremental import IncrementalPnL
+from jobs import JOB_MANAGER
+from profiling import StageProfiler, record_stages, stage
 
 if 'portfolio' not in st.session_state:
-    st.session_state.portfolio = []
+    st.session_state.portfolio = PortfolioBook()
 
 apply_page_config("PnL Distribution")
 
@@ -17,20 +23,88 @@ Unlike the payoff diagram which shows all possible outcomes equally, this shows
 outcomes are actually *likely* to occur based on how stocks actually move.
 """)
 
+# Paths kept in the session for live updates; 24 bytes each
+MAX_LIVE_PATHS = 10_000_000
+
+# Seconds between progress refreshes of a background simulation
+JOB_POLL_SECONDS = 0.5
+
+
+def format_pnl(value):
+    return "Unlimited" if np.isinf(value) else f"${value:.2f}"
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_progress():
+    # Reruns on its own timer, so the rest of the page stays responsive while the job runs
+    job = st.session_state.get('pnl_job')
+    if job is None:
+        return
+    if job.done():
+        st.session_state.pnl_job = None
+        if job.status == 'done':
+            st.session_state.pnl_results = job.result()
+            st.session_state.pnl_job_stages = job.stage_records()
+        else:
+            st.session_state.pnl_job_error = job.error or "Simulation cancelled"
+        st.rerun()
+
+    job.poll()
+    st.progress(job.progress, text=f"Running Monte Carlo simulation... "
+                                   f"{job.paths_done:,} / {job.paths_total:,} paths")
+    partial = job.partial()
+    if partial is not None:
+        st.caption(f"So far: mean ${partial['mean']:.2f} ± {partial['std_error']:.4f} · "
+                   f"std ${partial['std']:.2f} · probability of profit {partial['prob_profit'] * 100:.1f}%")
+    if st.button("Cancel Simulation"):
+        job.cancel()
+        st.session_state.pnl_job = None
+        st.rerun()
+
+
 # Main area + settings column
 main_col, settings_col = st.columns([3, 1])
 
 with settings_col:
     st.subheader("Simulation Settings")
     
+    # Books spanning several underlyings get per-underlying parameters and correlated draws
+    underlyings = st.session_state.portfolio.underlyings()
+    multi_asset = len(underlyings) > 1
+    # One GBM underlying has a closed-form distribution; Monte Carlo is needed beyond that
+    exact_mode = st.radio(
+        "Engine", ["Exact (closed form)", "Monte Carlo"], disabled=multi_asset,
+        index=1 if multi_asset else 0,
+        help="Exact integrates the payoff against the lognormal price distribution, with no "
+             "sampling noise. Monte Carlo is required for books with several underlyings."
+    ) == "Exact (closed form)" and not multi_asset
+    
     num_simulations = st.number_input(
         "Number of Simulations", 
         min_value=1000, 
-        max_value=100000, 
+        max_value=1_000_000_000, 
         value=10000, 
         step=1000,
-        help="More simulations = smoother histogram but slower computation"
+        help="More simulations = smoother histogram but slower computation. "
+             "Paths are streamed in chunks, so memory does not grow with this number."
     )
+    seed_text = st.text_input("Random Seed", value="",
+                              help="Leave empty for a fresh seed; the seed used is shown with the results. "
+                                   "Unseeded runs bypass the shared result cache (identical runs "
+                                   "already in progress are still shared); enter a seed to reuse "
+                                   "earlier results")
+    seed_text = seed_text.strip()
+    # isascii rules out Unicode digits such as '²' that int() rejects
+    seed_valid = seed_text == "" or (seed_text.isascii() and seed_text.isdigit())
+    seed = int(seed_text) if seed_text and seed_valid else None
+    if not seed_valid:
+        st.error("Random Seed must be a non-negative integer, or empty for a fresh seed")
+    num_workers = st.number_input("Worker Processes", min_value=1, max_value=DEFAULT_NUM_WORKERS,
+                                  value=DEFAULT_NUM_WORKERS, step=1,
+                                  help="Processes of the shared simulation pool this run may use at "
+                                       "once. Results are reproducible for a given seed and path count.")
+    histogram_bins = st.number_input("Histogram Bins", min_value=0, max_value=500, value=0, step=10,
+                                     help="0 = automatic (Freedman-Diaconis)")
     
     st.write("**Market Parameters**")
     spot = st.number_input("Spot Price", value=100.0, step=1.0,
@@ -44,42 +118,178 @@ with settings_col:
     time_horizon = st.number_input("Time Horizon (years)", value=1.0, step=0.1, format="%.2f",
                                    help="How long until options expire")
     
-    run_simulation = st.button("Run Simulation", type="primary", use_container_width=True)
+    st.write("**Variance Reduction**")
+    if exact_mode:
+        st.caption("Simulation and variance reduction settings apply to Monte Carlo only")
+    antithetic = st.checkbox("Antithetic Variates", help="Pair every draw z with -z")
+    control_variates = st.checkbox("Control Variates",
+                                   help="Correct the mean using the known lognormal mean of the terminal "
+                                        "price and the Black-Scholes value of the option legs")
+    use_sobol = st.checkbox("Sobol' Sequence",
+                            help="Quasi-random draws instead of pseudo-random; the standard error "
+                                 "comes from independently scrambled replicates")
+    target_std_error = st.number_input("Target Std Error ($)", value=0.0, min_value=0.0, step=0.01,
+                                       format="%.3f",
+                                       help="Stop once the mean's standard error is below this value "
+                                            "(Number of Simulations becomes the cap). 0 = off")
+    
+    if multi_asset:
+        import pandas as pd
+        st.write("**Underlyings**")
+        underlying_table = st.data_editor(
+            pd.DataFrame({
+                'Underlying': underlyings,
+                'Spot': spot,
+                'Drift (μ)': expected_drift,
+                'Volatility (σ)': volatility
+            }),
+            disabled=['Underlying'], hide_index=True, use_container_width=True,
+            key='underlying_parameters'
+        )
+        pairwise_correlation = st.slider("Pairwise Correlation", -0.5, 0.99, 0.5, step=0.01,
+                                         help="Correlation between every pair of underlyings")
+        st.caption("Variance reduction options apply to single-underlying books only")
+    
+    live_updates = st.checkbox(
+        "Keep Paths for Live Updates", disabled=exact_mode or multi_asset,
+        help="Keep this run's terminal prices so adding or removing legs updates the results by "
+             "revaluing only the changed legs. Plain pseudo-random draws, no variance reduction; "
+             f"up to {MAX_LIVE_PATHS:,} paths."
+    ) and not (exact_mode or multi_asset) and num_simulations <= MAX_LIVE_PATHS
+    
+    profile_performance = st.checkbox("Show Performance", help="Time each simulation and rendering "
+                                      "stage and show the breakdown below the results")
+    
+    run_simulation = st.button("Run Simulation", type="primary", use_container_width=True,
+                               disabled=not seed_valid)
+
+profiler = StageProfiler() if profile_performance else nullcontext()
 
-with main_col:
+with main_col, profiler:
     if len(st.session_state.portfolio) > 0:
         if run_simulation:
-            with st.spinner("Running Monte Carlo simulation..."):
+            with st.spinner("Computing PnL distribution..." if exact_mode else "Starting Monte Carlo simulation..."):
+                book = st.session_state.portfolio
                 # Update portfolio parameters
-                for asset in st.session_state.portfolio:
-                    if hasattr(asset, 'spot'):
-                        asset.spot = spot
-                    if hasattr(asset, 'maturity'):
-                        asset.maturity = time_horizon
-                    if hasattr(asset, 'volatility'):
-                        asset.volatility = volatility
-                    if hasattr(asset, 'rfr'):
-                        asset.rfr = rfr
-                
-                # Run simulation
-                results = simulate_portfolio_pnl(
-                    portfolio=st.session_state.portfolio,
+                book.set_market(
                     spot=spot,
-                    expected_drift=expected_drift,
-                    volatility=volatility,
                     maturity=time_horizon,
                     rfr=rfr,
-                    num_simulations=num_simulations
+                    volatility=volatility
                 )
                 
-                # Store results in session state
-                st.session_state.pnl_results = results
+                # Monte Carlo runs as a background job returning statistics and
+                # pre-binned histogram counts only, never the raw samples. Identical
+                # books and parameters are served from the shared result cache, or
+                # share the job already running for them.
+                if exact_mode:
+                    simulate = exact_portfolio_pnl
+                    params = dict(
+                        spot=spot,
+                        expected_drift=expected_drift,
+                        volatility=volatility,
+                        bins=histogram_bins or DEFAULT_EXACT_BINS
+                    )
+                elif multi_asset:
+                    spots = underlying_table['Spot'].to_numpy(dtype=float)
+                    volatilities = underlying_table['Volatility (σ)'].to_numpy(dtype=float)
+                    # Each option leg takes its own underlying's spot and volatility
+                    option_codes = book.underlying_codes(underlyings)[book.kind <= LEG_PUT]
+                    book.set_market(spot=spots[option_codes], volatility=volatilities[option_codes])
+                    correlation = np.full((len(underlyings), len(underlyings)), pairwise_correlation)
+                    np.fill_diagonal(correlation, 1.0)
+                    simulate = simulate_multi_asset_pnl
+                    params = dict(
+                        num_simulations=num_simulations,
+                        seed=seed,
+                        num_workers=num_workers,
+                        bins=histogram_bins or None,
+                        underlyings=underlyings,
+                        spot=spots,
+                        expected_drift=underlying_table['Drift (μ)'].to_numpy(dtype=float),
+                        volatility=volatilities,
+                        correlation=correlation
+                    )
+                else:
+                    simulate = simulate_portfolio_pnl_streaming
+                    params = dict(
+                        num_simulations=num_simulations,
+                        seed=seed,
+                        num_workers=num_workers,
+                        bins=histogram_bins or None,
+                        spot=spot,
+                        expected_drift=expected_drift,
+                        volatility=volatility,
+                        antithetic=antithetic,
+                        control_variates=control_variates,
+                        sampler='sobol' if use_sobol else 'pseudo',
+                        target_std_error=target_std_error or None
+                    )
+                
+                # A new run replaces the previous one; release it so it can stop
+                if st.session_state.get('pnl_job') is not None:
+                    st.session_state.pnl_job.cancel()
+                    st.session_state.pnl_job = None
+                
+                try:
+                    if exact_mode or live_updates:
+                        with stage('simulate', paths=params.get('num_simulations')):
+                            if live_updates:
+                                live = IncrementalPnL(spot, expected_drift, volatility, time_horizon, rfr,
+                                                      num_simulations, seed, bins=histogram_bins or None)
+                                results = live.sync(book)
+                            else:
+                                results = cached_simulation(
+                                    simulate,
+                                    book,
+                                    maturity=time_horizon,
+                                    rfr=rfr,
+                                    **params
+                                )
+                    else:
+                        job = JOB_MANAGER.submit(simulate, book, maturity=time_horizon, rfr=rfr, **params)
+                except ValueError as error:
+                    st.error(str(error))
+                else:
+                    # Store results in session state; a job's results arrive when it finishes
+                    st.session_state.live_pnl = live if live_updates else None
+                    if exact_mode or live_updates:
+                        st.session_state.pnl_results = results
+                    else:
+                        st.session_state.pop('pnl_results', None)
+                        st.session_state.pnl_job = job
+        
+        elif st.session_state.get('live_pnl') is not None and not multi_asset:
+            # Portfolio edits since the last run: revalue only the changed legs on its paths
+            live = st.session_state.live_pnl
+            st.session_state.portfolio.set_market(spot=live.spot, maturity=live.maturity, rfr=live.rfr,
+                                                  volatility=live.volatility)
+            with stage('live_update', paths=len(live.terminal_prices)):
+                st.session_state.pnl_results = live.sync(st.session_state.portfolio)
+        
+        if st.session_state.get('pnl_job') is not None:
+            show_job_progress()
+        # Timed in the pool while the job ran; shown on the run that picks up its results
+        record_stages(st.session_state.pop('pnl_job_stages', []))
+        if 'pnl_job_error' in st.session_state:
+            st.warning(st.session_state.pop('pnl_job_error'))
         
         # Display results if they exist
         if 'pnl_results' in st.session_state:
             results = st.session_state.pnl_results
             
             st.subheader("Portfolio Statistics")
+            exact = results['num_simulations'] == 0
+            if exact:
+                caption = "Exact closed-form distribution · no sampling error"
+            else:
+                caption = (f"Seed: {results['seed']} · {results['num_simulations']:,} paths"
+                           f" · Std error of mean: ${results['std_error']:.4f}")
+            if results.get('revalued_legs'):
+                caption += f" · Updated live: {results['revalued_legs']:,} legs revalued"
+            cache_stats = RESULT_CACHE.stats()
+            caption += f" · Result cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses"
+            st.caption(caption)
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
@@ -87,10 +297,10 @@ with main_col:
                 st.metric("Mean PnL", f"${results['mean']:.2f}")
             with col2:
                 st.metric("Std Dev", f"${results['std']:.2f}")
-                st.metric("Min PnL", f"${results['min']:.2f}")
+                st.metric("Min PnL", format_pnl(results['min']))
             with col3:
                 st.metric("Skewness", f"{results['skew']:.3f}")
-                st.metric("Max PnL", f"${results['max']:.2f}")
+                st.metric("Max PnL", format_pnl(results['max']))
             with col4:
                 st.metric("Kurtosis", f"{results['kurtosis']:.3f}")
                 st.metric("5th %ile", f"${results['percentile_5']:.2f}")
@@ -98,55 +308,74 @@ with main_col:
             # Create histogram
             st.subheader("PnL Distribution")
             
-            fig = go.Figure()
+            with stage('build_figure'):
+                import plotly.graph_objects as go
+                fig = go.Figure()
             
-            fig.add_trace(go.Histogram(
-                x=results['pnl_samples'],
-                nbinsx=50,
-                name='PnL Distribution',
-                marker=dict(
-                    color='#ff4b4b',
-                    line=dict(color='white', width=1)
-                ),
-                hovertemplate='PnL: %{x:.2f}<br>Count: %{y}<extra></extra>'
-            ))
+                # Bars from the server-side bins: the payload depends on the bin count, not the path count
+                edges = results['histogram']['edges']
+                fig.add_trace(go.Bar(
+                    x=(edges[:-1] + edges[1:]) / 2,
+                    y=results['histogram']['counts'],
+                    width=np.diff(edges),
+                    name='PnL Distribution',
+                    marker=dict(
+                        color='#ff4b4b',
+                        line=dict(color='white', width=1)
+                    ),
+                    hovertemplate=('PnL: %{x:.2f}<br>Probability: %{y:.4f}<extra></extra>' if exact
+                                   else 'PnL: %{x:.2f}<br>Count: %{y:,.0f}<extra></extra>')
+                ))
+                
+                # Exact density scaled to bin probabilities; flat payoff regions show as tall bars
+                if exact:
+                    density = results['density']
+                    fig.add_trace(go.Scatter(
+                        x=density['pnl'],
+                        y=density['density'] * np.diff(edges).mean(),
+                        mode='lines',
+                        name='Exact Density',
+                        line=dict(color='yellow', width=2),
+                        hoverinfo='skip'
+                    ))
             
-            # Add vertical line at mean
-            fig.add_vline(
-                x=results['mean'], 
-                line_dash="dash", 
-                line_color="yellow",
-                annotation_text=f"Mean: ${results['mean']:.2f}",
-                annotation_position="top"
-            )
+                # Add vertical line at mean
+                fig.add_vline(
+                    x=results['mean'], 
+                    line_dash="dash", 
+                    line_color="yellow",
+                    annotation_text=f"Mean: ${results['mean']:.2f}",
+                    annotation_position="top"
+                )
             
-            # Add vertical line at zero
-            fig.add_vline(
-                x=0, 
-                line_dash="dot", 
-                line_color="white",
-                opacity=0.5
-            )
+                # Add vertical line at zero
+                fig.add_vline(
+                    x=0, 
+                    line_dash="dot", 
+                    line_color="white",
+                    opacity=0.5
+                )
             
-            fig.update_layout(
-                title="Probability Distribution of Profit and Loss",
-                xaxis_title="Profit/Loss ($)",
-                yaxis_title="Frequency",
-                height=500,
-                plot_bgcolor='#0e1117',
-                paper_bgcolor='#0e1117',
-                font=dict(color='white'),
-                showlegend=False,
-                hovermode='x'
-            )
+                fig.update_layout(
+                    title="Probability Distribution of Profit and Loss",
+                    xaxis_title="Profit/Loss ($)",
+                    yaxis_title="Probability" if exact else "Frequency",
+                    height=500,
+                    plot_bgcolor='#0e1117',
+                    paper_bgcolor='#0e1117',
+                    font=dict(color='white'),
+                    showlegend=False,
+                    hovermode='x'
+                )
             
-            st.plotly_chart(fig, use_container_width=True)
+            with stage('render_chart'):
+                st.plotly_chart(fig, use_container_width=True)
             
             # Probability metrics
             st.subheader("Probability Analysis")
-            prob_profit = np.mean(results['pnl_samples'] > 0) * 100
-            prob_loss = np.mean(results['pnl_samples'] < 0) * 100
-            prob_total_loss = np.mean(results['pnl_samples'] <= -results['initial_cost']) * 100
+            prob_profit = results['prob_profit'] * 100
+            prob_loss = results['prob_loss'] * 100
+            prob_total_loss = results['prob_total_loss'] * 100
             
             col1, col2, col3 = st.columns(3)
             col1.metric("Probability of Profit", f"{prob_profit:.1f}%")
@@ -158,8 +387,7 @@ with main_col:
                 st.markdown(f"""
                 **What does this tell us?**
                 
-                Your portfolio has an initial cost of **${results['initial_cost']:.2f}**. After running 
-                {num_simulations:,} simulations of possible future scenarios, here's what we learned:
+                Your portfolio has an initial cost of **${results['initial_cost']:.2f}**. {"Integrating the payoff over every possible future stock price" if exact else f"After running {results['num_simulations']:,} simulations of possible future scenarios"}, here's what we learned:
                 
                 - **Average Outcome**: The mean PnL is ${results['mean']:.2f}. However, notice that the 
                   average doesn't tell the whole story with options!
@@ -179,8 +407,91 @@ with main_col:
                 The Black-Scholes price uses the risk-free rate, but YOUR outcomes depend on what actually happens!
                 """)
         
-        else:
+        elif st.session_state.get('pnl_job') is None:
             st.info("Click 'Run Simulation' to generate the PnL distribution")
             
     else:
-        st.info("📊 No portfolio loaded. Add assets on the Portfolio Input page to see their PnL distribution.")
\ No newline at end of file
+        st.info("📊 No portfolio loaded. Add assets on the Portfolio Input page to see their PnL distribution.")
+
+if profile_performance:
+    with main_col.expander("Performance", expanded=True):
+        st.dataframe(profiler.summary(), hide_index=True, use_container_width=True)
+        st.caption("Stages run in worker processes, and those of a background Monte Carlo "
+                   "job once it finishes, are summed across processes. Cached results skip "
+                   "the simulation stages.")
+
+# Stress grid: the same draws reused across a (volatility x drift) grid per horizon
+if len(st.session_state.portfolio) > 0:
+    st.divider()
+    st.subheader("Stress Grid")
+    
+    grid_col1, grid_col2, grid_col3 = st.columns(3)
+    with grid_col1:
+        vol_range = st.slider("Volatility Range (σ)", 0.01, 1.50, (0.10, 0.50), step=0.01)
+        grid_size = st.slider("Grid Size", 5, 50, 20, help="Number of points along each axis")
+    with grid_col2:
+        drift_range = st.slider("Drift Range (μ)", -0.50, 0.50, (-0.10, 0.20), step=0.01)
+        grid_simulations = st.number_input("Paths per Scenario", min_value=1000, max_value=100000,
+                                           value=10000, step=1000,
+                                           help="Every scenario reuses the same random draws")
+    with grid_col3:
+        horizons_text = st.text_input("Horizons (years)", value="0.25, 0.5, 1.0",
+                                      help="Comma-separated list of time horizons")
+        grid_metric = st.selectbox("Metric", ["mean", "prob_profit", "percentile_5", "percentile_95", "std"],
+                                   format_func=lambda name: {
+                                       'mean': "Mean PnL", 'prob_profit': "Probability of Profit",
+                                       'percentile_5': "5th Percentile", 'percentile_95': "95th Percentile",
+                                       'std': "Std Dev"
+                                   }[name])
+    
+    if multi_asset:
+        st.caption("The stress grid moves every underlying together as a single asset")
+    
+    if st.button("Run Stress Grid", disabled=not seed_valid):
+        try:
+            horizons = [float(x) for x in horizons_text.split(',') if x.strip()]
+        except ValueError:
+            st.error("Horizons must be comma-separated numbers")
+        else:
+            try:
+                with st.spinner("Evaluating stress grid..."):
+                    st.session_state.stress_results = simulate_stress_grid(
+                        st.session_state.portfolio,
+                        spot=spot,
+                        rfr=rfr,
+                        volatilities=np.linspace(vol_range[0], vol_range[1], grid_size),
+                        drifts=np.linspace(drift_range[0], drift_range[1], grid_size),
+                        horizons=horizons,
+                        num_simulations=grid_simulations,
+                        seed=seed
+                    )
+            except ValueError as error:
+                st.error(str(error))
+    
+    if 'stress_results' in st.session_state:
+        stress = st.session_state.stress_results
+        horizon_index = st.select_slider(
+            "Horizon", options=list(range(len(stress['horizon']))),
+            format_func=lambda i: f"{stress['horizon'][i]:g}y"
+        ) if len(stress['horizon']) > 1 else 0
+        
+        import plotly.graph_objects as go
+        fig = go.Figure(go.Heatmap(
+            x=stress['drift'],
+            y=stress['volatility'],
+            z=stress[grid_metric][:, :, horizon_index],
+            colorscale='RdYlGn',
+            zmid=0 if grid_metric != 'prob_profit' else 0.5,
+            hovertemplate='μ: %{x:.3f}<br>σ: %{y:.3f}<br>Value: %{z:.3f}<extra></extra>'
+        ))
+        fig.update_layout(
+            title=f"Stress Grid at {stress['horizon'][horizon_index]:g}y horizon",
+            xaxis_title="Expected Drift (μ)",
+            yaxis_title="Volatility (σ)",
+            height=500,
+            plot_bgcolor='#0e1117',
+            paper_bgcolor='#0e1117',
+            font=dict(color='white')
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption(f"{stress['num_simulations']:,} common paths per scenario · Seed: {stress['seed']}")
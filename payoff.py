@@ -0,0 +1,141 @@
+import numpy as np
+from utils import LEG_PUT, LEG_FORWARD, LEG_DEBT, as_book
+
+# Fraction of the breakpoint span added either side of an auto-ranged chart
+DEFAULT_RANGE_PADDING = 0.25
+
+
+class PiecewiseLinearPayoff:
+    """
+    Exact expiry payoff of a book as a piecewise-linear function of spot.
+
+    The function is stored as vertices (spot = 0 plus every strike where the
+    slope changes) with their payoff values and the slope beyond the last
+    vertex. Calls and puts both add +quantity to the slope at their strike,
+    forwards add a constant slope and debt a constant level, so the whole
+    representation is built in O(legs log legs) without sampling.
+    """
+    def __init__(self, vertices, values, right_slope: float):
+        self.vertices = np.asarray(vertices, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.right_slope = float(right_slope)
+
+    @classmethod
+    def from_book(cls, portfolio) -> 'PiecewiseLinearPayoff':
+        book = as_book(portfolio)
+        # One spot axis: legs on different underlyings cannot be summed along it
+        book.require_single_underlying()
+        kind, strike, quantity = book.kind, book.strike, book.quantity
+
+        is_option = kind <= LEG_PUT
+        is_put = kind == LEG_PUT
+        is_forward = kind == LEG_FORWARD
+
+        # Payoff and slope at S = 0: puts are fully in the money, calls worthless
+        value_at_zero = (book.face_value[kind == LEG_DEBT].sum()
+                         - (quantity[is_forward] * strike[is_forward]).sum()
+                         + (quantity[is_put] * strike[is_put]).sum())
+        slope_at_zero = quantity[is_forward].sum() - quantity[is_put].sum()
+
+        # Net slope change at each distinct strike; drop strikes where legs cancel
+        strikes, inverse = np.unique(strike[is_option], return_inverse=True)
+        slope_change = np.bincount(inverse, weights=quantity[is_option], minlength=len(strikes))
+        keep = slope_change != 0
+        strikes, slope_change = strikes[keep], slope_change[keep]
+
+        vertices = np.concatenate([[0.0], strikes])
+        slopes = slope_at_zero + np.concatenate([[0.0], np.cumsum(slope_change)])
+        values = value_at_zero + np.concatenate([[0.0], np.cumsum(slopes[:-1] * np.diff(vertices))])
+        return cls(vertices, values, slopes[-1])
+
+    @property
+    def left_slope(self) -> float:
+        if len(self.vertices) < 2:
+            return self.right_slope
+        return (self.values[1] - self.values[0]) / (self.vertices[1] - self.vertices[0])
+
+    def __call__(self, spot_prices):
+        """Evaluate the payoff at the given spot prices"""
+        shape = np.shape(spot_prices)
+        spot_prices = np.atleast_1d(np.asarray(spot_prices, dtype=np.float64))
+        result = np.interp(spot_prices, self.vertices, self.values)
+        # np.interp clamps outside the vertices, so extend the end segments linearly
+        above = spot_prices > self.vertices[-1]
+        result[above] = self.values[-1] + self.right_slope * (spot_prices[above] - self.vertices[-1])
+        below = spot_prices < self.vertices[0]
+        result[below] = self.values[0] + self.left_slope * (spot_prices[below] - self.vertices[0])
+        return result.reshape(shape)
+
+    def roots(self, level: float = 0.0):
+        """
+        Spot prices (>= 0) where the payoff crosses or touches level, e.g. break-even points.
+
+        A flat stretch at level is not a root in itself; it counts once, at
+        its left end, only when the payoff crosses from one side to the other.
+        """
+        x, g = self.vertices, self.values - level
+        roots = []
+
+        # Strict sign change inside a segment
+        crossing = g[:-1] * g[1:] < 0
+        x0, x1, g0, g1 = x[:-1][crossing], x[1:][crossing], g[:-1][crossing], g[1:][crossing]
+        roots.append(x0 - g0 * (x1 - x0) / (g1 - g0))
+
+        # Vertices at level, grouped into runs of consecutive vertices
+        at_level = np.flatnonzero(g == 0)
+        runs = np.split(at_level, np.flatnonzero(np.diff(at_level) > 1) + 1) if len(at_level) else []
+        for run in runs:
+            first, last = run[0], run[-1]
+            # Beyond the last vertex the sign is that of the open-ended slope
+            after = np.sign(g[last + 1]) if last + 1 < len(g) else np.sign(self.right_slope)
+            before = np.sign(g[first - 1]) if first > 0 else 0
+            if after != 0 and (first == last or before == -after):
+                roots.append(x[first:first + 1])
+
+        # The open-ended segment beyond the last vertex
+        if g[-1] * self.right_slope < 0:
+            roots.append([x[-1] - g[-1] / self.right_slope])
+        return np.sort(np.concatenate(roots))
+
+    def break_evens(self, initial_cost: float, rfr: float, maturity: float):
+        """Spot prices where the PnL at maturity, payoff less initial_cost grown at rfr, is zero"""
+        return self.roots(initial_cost * np.exp(rfr * maturity))
+
+    def max_gain(self):
+        """(value, spot) of the highest payoff; value is inf if unbounded above"""
+        if self.right_slope > 0:
+            return np.inf, np.inf
+        i = np.argmax(self.values)
+        return self.values[i], self.vertices[i]
+
+    def max_loss(self):
+        """(value, spot) of the lowest payoff; value is -inf if unbounded below"""
+        if self.right_slope < 0:
+            return -np.inf, np.inf
+        i = np.argmin(self.values)
+        return self.values[i], self.vertices[i]
+
+    def auto_range(self, padding: float = DEFAULT_RANGE_PADDING, level: float = 0.0, reference=None):
+        """
+        Spot range covering every strike and crossing of level, padded either side.
+
+        reference (e.g. current spot) is included when given; a book with no
+        kinks is centred on it.
+        """
+        points = np.concatenate([self.vertices[1:], self.roots(level)])
+        points = points[points > 0]
+        if reference is not None:
+            points = np.append(points, reference)
+        if len(points) == 0:
+            points = np.array([100.0])
+
+        lo, hi = points.min(), points.max()
+        span = max(hi - lo, 0.2 * hi)
+        return max(lo - padding * span, 0.0), hi + padding * span
+
+    def curve(self, spot_range):
+        """Exact (spots, payoffs) vertices of the payoff over spot_range, for plotting"""
+        lo, hi = spot_range
+        inner = self.vertices[(self.vertices > lo) & (self.vertices < hi)]
+        spots = np.concatenate([[lo], inner, [hi]])
+        return spots, self(spots)
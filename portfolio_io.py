@@ -0,0 +1,196 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from utils import (DEFAULT_UNDERLYING, LEG_CALL, LEG_PUT, LEG_FORWARD, LEG_DEBT, MAX_UNDERLYING_LENGTH,
+                   PortfolioBook, as_book)
+
+# Rows parsed per chunk when importing
+DEFAULT_IMPORT_CHUNK_SIZE = 100_000
+
+# Position file layout: one row per leg. Only 'type' is required; missing
+# columns or blank cells fall back to the Option/Forward defaults below.
+POSITION_COLUMNS = ['type', 'underlying', 'strike', 'quantity', 'spot', 'maturity', 'rfr', 'volatility',
+                    'face_value']
+# Columns parsed as numbers; 'type' and 'underlying' are text
+NUMERIC_COLUMNS = POSITION_COLUMNS[2:]
+POSITION_TYPES = np.array(['call', 'put', 'forward', 'debt'])
+_TYPE_CODES = {'call': LEG_CALL, 'put': LEG_PUT, 'forward': LEG_FORWARD, 'debt': LEG_DEBT}
+_DEFAULTS = {'quantity': 1.0, 'spot': 100.0, 'maturity': 1.0, 'rfr': 0.12, 'volatility': 0.20}
+
+
+def _file_format(source, file_format):
+    if file_format is not None:
+        return file_format.lower()
+    name = getattr(source, 'name', source)
+    suffix = Path(str(name)).suffix.lower()
+    if suffix in ('.parquet', '.pq'):
+        return 'parquet'
+    return 'csv'
+
+
+def _iter_chunks(source, file_format, chunk_size):
+    if file_format == 'csv':
+        yield from pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                               skipinitialspace=True)
+    elif file_format == 'parquet':
+        # pyarrow ships with streamlit; import it only when a Parquet file is read
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        raise ValueError("file_format must be 'csv' or 'parquet'")
+
+
+def _validate_chunk(chunk: pd.DataFrame, first_row: int):
+    """
+    Vectorized checks mirroring Option._validate_inputs and Forward._validate_inputs.
+
+    Returns the parsed columns, a per-row validity mask and a DataFrame of
+    (row, column, message) errors, where row is the 1-based data row.
+    """
+    chunk.columns = [str(column).strip().lower() for column in chunk.columns]
+    n = len(chunk)
+    if 'type' not in chunk.columns:
+        raise ValueError("Position file must have a 'type' column")
+
+    type_name = chunk['type'].astype(str).str.strip().str.lower().to_numpy()
+    kind = pd.Series(type_name).map(_TYPE_CODES).to_numpy()
+    known_type = ~pd.isna(kind)
+    kind = np.where(known_type, kind, -1).astype(np.int8)
+    is_option = (kind == LEG_CALL) | (kind == LEG_PUT)
+    has_strike = is_option | (kind == LEG_FORWARD)
+    is_debt = kind == LEG_DEBT
+
+    values = {}
+    problems = [('type', ~known_type, "type must be 'call', 'put', 'forward' or 'debt'")]
+    for name in NUMERIC_COLUMNS:
+        if name not in chunk.columns:
+            values[name] = np.full(n, _DEFAULTS.get(name, np.nan))
+            continue
+        raw = chunk[name]
+        parsed = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=np.float64)
+        blank = raw.isna().to_numpy() | (raw.astype(str).str.strip() == '').to_numpy()
+        problems.append((name, ~blank & np.isnan(parsed), f"{name} is not a number"))
+        values[name] = np.where(blank & (name in _DEFAULTS), _DEFAULTS.get(name, np.nan), parsed)
+
+    if 'underlying' in chunk.columns:
+        underlying = chunk['underlying'].fillna('').astype(str).str.strip()
+        values['underlying'] = underlying.replace('', DEFAULT_UNDERLYING).to_numpy(dtype=str)
+        problems.append(('underlying', (underlying.str.len() > MAX_UNDERLYING_LENGTH).to_numpy(),
+                         f"underlying is longer than {MAX_UNDERLYING_LENGTH} characters"))
+    else:
+        values['underlying'] = np.full(n, DEFAULT_UNDERLYING)
+
+    strike, spot = values['strike'], values['spot']
+    problems += [
+        ('strike', has_strike & ~(strike > 0), "Strike must be positive"),
+        ('spot', is_option & ~(spot > 0), "Spot must be positive"),
+        ('maturity', is_option & ~(values['maturity'] >= 0), "Maturity must be non-negative"),
+        ('volatility', is_option & ~(values['volatility'] > 0), "Volatility must be positive"),
+        ('rfr', is_option & np.isnan(values['rfr']), "rfr is required"),
+        ('quantity', has_strike & np.isnan(values['quantity']), "quantity is required"),
+        ('face_value', is_debt & ~np.isfinite(values['face_value']), "Face value is required for debt"),
+    ]
+
+    # One message per row and column: a value that is not a number skips the range check
+    valid = np.ones(n, dtype=bool)
+    errors = []
+    reported = {name: np.zeros(n, dtype=bool) for name in POSITION_COLUMNS}
+    for column, failed, message in problems:
+        failed = failed & ~reported[column]
+        if failed.any():
+            valid &= ~failed
+            reported[column] |= failed
+            rows = np.flatnonzero(failed) + first_row
+            errors.append(pd.DataFrame({'row': rows, 'column': column, 'message': message}))
+
+    values['kind'] = kind
+    return values, valid, errors
+
+
+def read_positions(
+    source,
+    book: PortfolioBook = None,
+    file_format: str = None,
+    chunk_size: int = DEFAULT_IMPORT_CHUNK_SIZE
+):
+    """
+    Bulk-load positions from a CSV or Parquet file (path or file-like object).
+
+    The file is parsed chunk by chunk, every chunk is validated with array
+    checks and its valid rows are collected as columns, without creating
+    per-row objects. They are appended to book (a new book if None) only
+    once the whole file has been read, so a parse error leaves book as it
+    was. Returns (book, errors) where errors lists (row, column, message)
+    for every rejected row.
+    """
+    file_format = _file_format(source, file_format)
+    loaded = PortfolioBook()
+
+    errors = []
+    first_row = 1
+    for chunk in _iter_chunks(source, file_format, chunk_size):
+        values, valid, chunk_errors = _validate_chunk(chunk, first_row)
+        errors += chunk_errors
+        first_row += len(chunk)
+
+        # Non-option legs carry no market parameters, forwards/options no face value
+        kind = values['kind'][valid]
+        is_option = kind <= LEG_PUT
+        is_debt = kind == LEG_DEBT
+        market = {name: np.where(is_option, values[name][valid], np.nan)
+                  for name in ('spot', 'maturity', 'rfr', 'volatility')}
+        loaded.add_legs(
+            kind,
+            strike=np.where(is_debt, values['face_value'][valid], values['strike'][valid]),
+            quantity=np.where(is_debt, 1.0, values['quantity'][valid]),
+            face_value=np.where(is_debt, values['face_value'][valid], np.nan),
+            underlying=np.where(is_debt, DEFAULT_UNDERLYING, values['underlying'][valid]),
+            **market
+        )
+
+    if book is None:
+        book = loaded
+    else:
+        book.extend(loaded)
+
+    if errors:
+        errors = pd.concat(errors, ignore_index=True).sort_values('row', kind='stable', ignore_index=True)
+    else:
+        errors = pd.DataFrame({'row': pd.Series(dtype=np.int64), 'column': pd.Series(dtype=str),
+                               'message': pd.Series(dtype=str)})
+    return book, errors
+
+
+def positions_frame(portfolio) -> pd.DataFrame:
+    """The portfolio in position-file layout, built column-wise from the book"""
+    book = as_book(portfolio)
+    return pd.DataFrame({
+        'type': POSITION_TYPES[book.kind],
+        'underlying': book.underlying,
+        'strike': np.where(book.kind == LEG_DEBT, np.nan, book.strike),
+        'quantity': np.where(book.kind == LEG_DEBT, np.nan, book.quantity),
+        'spot': book.spot,
+        'maturity': book.maturity,
+        'rfr': book.rfr,
+        'volatility': book.volatility,
+        'face_value': book.face_value,
+    })
+
+
+def write_positions(portfolio, destination=None, file_format: str = None):
+    """
+    Export the portfolio in the layout read_positions accepts.
+
+    Writes to destination (path or file-like) or, when destination is None,
+    returns the encoded file as bytes. The format defaults to the
+    destination's suffix, else CSV.
+    """
+    frame = positions_frame(portfolio)
+    file_format = _file_format(destination or '', file_format)
+    if file_format == 'csv':
+        data = frame.to_csv(destination, index=False)
+        return data.encode() if destination is None else None
+    if file_format == 'parquet':
+        return frame.to_parquet(destination, index=False)
+    raise ValueError("file_format must be 'csv' or 'parquet'")
@@ -0,0 +1,368 @@
+import numpy as np
+
+_INV_SQRT_2PI = 1 / np.sqrt(2 * np.pi)
+
+
+def _call_mask(option_type):
+    """
+    Normalise an option type input to a boolean "is call" array.
+
+    Accepts 'call'/'put' strings, booleans (True = call) or the integer
+    leg codes used by PortfolioBook (0 = call, 1 = put).
+    """
+    option_type = np.asarray(option_type)
+    if option_type.dtype.kind in 'USO':
+        lowered = np.char.lower(option_type.astype(str))
+        if not np.isin(lowered, ['call', 'put']).all():
+            raise ValueError("option_type must be 'call' or 'put'")
+        return lowered == 'call'
+    if option_type.dtype.kind == 'b':
+        return option_type
+    return option_type == 0
+
+
+def black_scholes(
+    option_type,
+    strike,
+    spot,
+    maturity,
+    rfr,
+    volatility,
+    greeks: bool = True
+) -> dict:
+    """
+    Price a batch of European options in one vectorized pass.
+
+    All inputs broadcast against each other. Returns per-contract arrays of
+    'price' and, when greeks is True, 'delta', 'gamma', 'vega', 'theta'
+    (per year) and 'rho'. Expired contracts (maturity == 0) are valued at
+    intrinsic with a step delta and zero for the other Greeks.
+    """
+    # scipy.special is imported on first use to keep module import (and app start) cheap
+    from scipy.special import ndtr
+    is_call, strike, spot, maturity, rfr, volatility = np.broadcast_arrays(
+        _call_mask(option_type),
+        *(np.asarray(x, dtype=np.float64) for x in (strike, spot, maturity, rfr, volatility))
+    )
+
+    expired = maturity <= 0
+    # Substitute a dummy maturity on expired contracts so the formula stays finite
+    tau = np.where(expired, 1.0, maturity)
+    sqrt_tau = np.sqrt(tau)
+    vol_sqrt_tau = volatility * sqrt_tau
+
+    d1 = (np.log(spot / strike) + (rfr + 0.5 * volatility**2) * tau) / vol_sqrt_tau
+    d2 = d1 - vol_sqrt_tau
+    discounted_strike = strike * np.exp(-rfr * tau)
+
+    # Put values follow from N(-d) = 1 - N(d); signing the argument evaluates
+    # ndtr once per contract rather than on both branches
+    sign = np.where(is_call, 1.0, -1.0)
+    nd1 = sign * ndtr(sign * d1)
+    nd2 = sign * ndtr(sign * d2)
+    price = spot * nd1 - discounted_strike * nd2
+
+    intrinsic = np.maximum(np.where(is_call, spot - strike, strike - spot), 0)
+    results = {'price': np.where(expired, intrinsic, price)}
+    if not greeks:
+        return results
+
+    pdf_d1 = _INV_SQRT_2PI * np.exp(-0.5 * d1**2)
+    in_the_money = np.where(is_call, spot > strike, spot < strike)
+    expired_delta = np.where(in_the_money, np.where(is_call, 1.0, -1.0), 0.0)
+
+    delta = nd1
+    gamma = pdf_d1 / (spot * vol_sqrt_tau)
+    vega = spot * pdf_d1 * sqrt_tau
+    theta = -spot * pdf_d1 * volatility / (2 * sqrt_tau) - rfr * discounted_strike * nd2
+    rho = discounted_strike * tau * nd2
+
+    results['delta'] = np.where(expired, expired_delta, delta)
+    results['gamma'] = np.where(expired, 0.0, gamma)
+    results['vega'] = np.where(expired, 0.0, vega)
+    results['theta'] = np.where(expired, 0.0, theta)
+    results['rho'] = np.where(expired, 0.0, rho)
+    return results
+
+
+# Search interval for implied volatility; quotes needing more are reported unconverged
+IMPLIED_VOL_BOUNDS = (1e-6, 10.0)
+
+
+def _price_vega(is_call, spot, discounted_strike, tau, volatility):
+    """Price and vega only, the two quantities a Newton step needs"""
+    from scipy.special import ndtr
+    sqrt_tau = np.sqrt(tau)
+    vol_sqrt_tau = volatility * sqrt_tau
+    d1 = np.log(spot / discounted_strike) / vol_sqrt_tau + 0.5 * vol_sqrt_tau
+    d2 = d1 - vol_sqrt_tau
+    # Puts are priced directly: going through parity loses the digits of cheap puts
+    price = np.where(is_call, spot * ndtr(d1) - discounted_strike * ndtr(d2),
+                     discounted_strike * ndtr(-d2) - spot * ndtr(-d1))
+    vega = spot * sqrt_tau * _INV_SQRT_2PI * np.exp(-0.5 * d1**2)
+    return price, vega
+
+
+def implied_volatility(
+    option_type,
+    price,
+    strike,
+    spot,
+    maturity,
+    rfr,
+    tol: float = 1e-8,
+    max_iterations: int = 50
+) -> dict:
+    """
+    Invert black_scholes for volatility over a batch of quotes.
+
+    Safeguarded Newton from the Corrado-Miller guess; all inputs broadcast.
+    Returns per-quote 'volatility', 'converged' and 'iterations'; quotes
+    that cannot be inverted get NaN and converged False.
+    """
+    is_call, price, strike, spot, maturity, rfr = np.broadcast_arrays(
+        _call_mask(option_type),
+        *(np.asarray(x, dtype=np.float64) for x in (price, strike, spot, maturity, rfr))
+    )
+    shape = strike.shape
+    price, strike, spot, maturity, rfr, is_call = (
+        x.ravel() for x in (price, strike, spot, maturity, rfr, is_call))
+
+    volatility = np.full(price.shape, np.nan)
+    converged = np.zeros(price.shape, dtype=bool)
+    iterations = np.zeros(price.shape, dtype=np.int64)
+
+    discounted_strike = strike * np.exp(-rfr * maturity)
+    # A price strictly between intrinsic value and the upper bound (S for a call,
+    # K e^{-rT} for a put) has a unique implied volatility
+    lo_vol, hi_vol = IMPLIED_VOL_BOUNDS
+    intrinsic = np.maximum(np.where(is_call, spot - discounted_strike, discounted_strike - spot), 0)
+    solvable = ((maturity > 0) & (price > intrinsic)
+                & (price < np.where(is_call, spot, discounted_strike)))
+    index = np.flatnonzero(solvable)
+    is_call, S, X, T, P = (x[index] for x in (is_call, spot, discounted_strike, maturity, price))
+
+    # Corrado-Miller initial guess, on the equivalent call price by put-call parity;
+    # the radicand is clipped where the approximation breaks down
+    C = np.where(is_call, P, P + S - X)
+    half_moneyness = 0.5 * (S - X)
+    radicand = np.maximum((C - half_moneyness)**2 - (S - X)**2 / np.pi, 0)
+    sigma = np.sqrt(2 * np.pi / T) / (S + X) * (C - half_moneyness + np.sqrt(radicand))
+    lo = np.full(len(index), lo_vol)
+    hi = np.full(len(index), hi_vol)
+    sigma = np.where((sigma > lo) & (sigma < hi), sigma, np.sqrt(2 * np.abs(np.log(S / X)) / T))
+    sigma = np.where((sigma > lo) & (sigma < hi), sigma, 0.5 * (lo + hi))
+
+    for iteration in range(1, max_iterations + 1):
+        if len(index) == 0:
+            break
+        model, vega = _price_vega(is_call, S, X, T, sigma)
+        error = model - P
+        iterations[index] = iteration
+
+        # Price rises with volatility, so the sign of the error tightens the bracket
+        hi = np.where(error > 0, sigma, hi)
+        lo = np.where(error < 0, sigma, lo)
+        # Newton on log price: far out of the money the price is close to exponential in
+        # volatility, where plain Newton steps overshoot from below
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correction = np.log(model / P) * model / vega
+        step = sigma - correction
+        bisect = ~((step > lo) & (step < hi))
+        step[bisect] = np.sqrt(lo[bisect] * hi[bisect])
+
+        done = (error == 0) | (~bisect & (np.abs(correction) <= tol)) | (hi - lo <= tol)
+        # A bracket collapsed onto a search bound means the quote needs a volatility outside it
+        done &= (sigma > lo_vol * (1 + tol)) & (sigma < hi_vol * (1 - tol))
+        volatility[index[done]] = step[done]
+        converged[index[done]] = True
+        stuck = ~done & ((hi - lo <= tol) | (lo >= hi_vol * (1 - tol)) | (hi <= lo_vol * (1 + tol)))
+        keep = ~(done | stuck)
+        index, is_call, S, X, T, P, lo, hi, sigma = (
+            x[keep] for x in (index, is_call, S, X, T, P, lo, hi, step))
+
+    return {
+        'volatility': volatility.reshape(shape),
+        'converged': converged.reshape(shape),
+        'iterations': iterations.reshape(shape)
+    }
+
+
+LATTICE_METHODS = ('binomial', 'trinomial')
+DEFAULT_LATTICE_STEPS = 1000
+
+# Lattices only track nodes within this many standard deviations of the spot's log
+# price; paths beyond it carry ~1e-9 probability and the edge value is close to exact
+LATTICE_WINDOW_STD = 6.0
+
+
+def _lattice_bound(method: str, layer: int, window: int) -> int:
+    """Largest |k| of the nodes S e^{k h} tracked at a layer (binomial nodes share its parity)"""
+    if layer <= window:
+        return layer
+    return window - (window - layer) % 2 if method == 'binomial' else window
+
+
+def lattice_price(
+    option_type,
+    strike,
+    spot: float,
+    maturity: float,
+    rfr: float,
+    volatility: float,
+    steps: int = DEFAULT_LATTICE_STEPS,
+    american: bool = True,
+    method: str = 'binomial'
+) -> dict:
+    """
+    Price a batch of American or European options on one recombining lattice.
+
+    The contracts share spot, maturity, rfr and volatility, so a whole chain
+    rolls back through one tree, holding a single time layer. method is
+    'binomial' (Cox-Ross-Rubinstein) or 'trinomial'; American calls with
+    rfr >= 0 roll back as European. Returns per-contract 'price' and the
+    root 'delta' and 'gamma'.
+    """
+    if method not in LATTICE_METHODS:
+        raise ValueError(f"method must be one of {LATTICE_METHODS}")
+    if steps < 2:
+        raise ValueError("steps must be at least 2")
+    if maturity <= 0 or volatility <= 0:
+        raise ValueError("maturity and volatility must be positive")
+    is_call, strike = np.broadcast_arrays(_call_mask(option_type), np.asarray(strike, dtype=np.float64))
+    shape = strike.shape
+    is_call, strike = is_call.ravel(), strike.ravel()
+
+    dt = maturity / steps
+    growth = np.exp(rfr * dt)
+    if method == 'binomial':
+        h = volatility * np.sqrt(dt)
+        up = (growth - np.exp(-h)) / (np.exp(h) - np.exp(-h))
+        weights = (1 - up, up)
+    else:
+        h = volatility * np.sqrt(2 * dt)
+        half_up, half_down, sqrt_growth = np.exp(0.5 * h), np.exp(-0.5 * h), np.sqrt(growth)
+        up = ((sqrt_growth - half_down) / (half_up - half_down))**2
+        down = ((half_up - sqrt_growth) / (half_up - half_down))**2
+        weights = (down, 1 - up - down, up)
+    if not all(0 <= weight <= 1 for weight in weights):
+        raise ValueError("too few steps for these parameters: lattice probabilities fall outside [0, 1]")
+    weights = tuple(weight / growth for weight in weights)
+    stride = 2 if method == 'binomial' else 1
+
+    # Window half-width in node units: the spread of ln S_T plus its drift, and at
+    # least 2 so the root Greeks see complete layers
+    window = max(int(np.ceil((LATTICE_WINDOW_STD * volatility * np.sqrt(maturity)
+                              + abs(rfr - 0.5 * volatility**2) * maturity) / h)), 2)
+    # Prices of every tracked node, plus one on either side for the edge values
+    reach = min(steps, window) + stride
+    prices = spot * np.exp(h * np.arange(-reach, reach + 1))
+
+    def node_prices(bound):
+        return prices[reach - bound:reach + bound + 1:stride]
+
+    # Calls and puts roll back separately so the exercise value is one subtraction
+    groups = []
+    for sign, members in ((1.0, is_call), (-1.0, ~is_call)):
+        if members.any():
+            exercised = american and (sign < 0 or rfr < 0)
+            groups.append((sign, strike[members], members, exercised))
+
+    # Layers whose outermost children fall outside the window, and the edge prices
+    # and time to expiry of those children
+    bounds = [_lattice_bound(method, layer, window) for layer in range(steps + 1)]
+    clipped = [bounds[layer + 1] < bounds[layer] + 1 for layer in range(steps)]
+    clipped_layers = np.flatnonzero(clipped)
+    edge_prices = spot * np.exp(h * np.multiply.outer(
+        [bounds[layer + 1] + stride for layer in clipped_layers], [-1.0, 1.0]))
+    edge_discount = np.exp(-rfr * (maturity - (clipped_layers + 1) * dt))
+
+    # Each group's current layer sits in rows 1..n of a buffer, with a spare row on
+    # either side for edge values
+    n = len(node_prices(bounds[steps]))
+    rows = 2 * reach // stride + 3
+    buffers = []
+    for sign, group_strike, _, exercised in groups:
+        values, scratch, term = (np.empty((rows, len(group_strike))) for _ in range(3))
+        np.maximum(sign * (node_prices(bounds[steps])[:, None] - group_strike), 0, out=values[1:n + 1])
+        # Deep in/out of the money value of every edge child: max(forward intrinsic, 0),
+        # or the exercise value if larger
+        edges = np.maximum(sign * (edge_prices[..., None]
+                                   - edge_discount[:, None, None] * group_strike), 0)
+        if exercised:
+            np.maximum(edges, sign * (edge_prices[..., None] - group_strike), out=edges)
+        buffers.append([values, scratch, term, dict(zip(clipped_layers, edges))])
+    # The first layers are kept for the root delta and gamma
+    layers = [{steps: buffer[0][1:n + 1].copy()} for buffer in buffers]
+
+    for layer in range(steps - 1, -1, -1):
+        bound = bounds[layer]
+        start, stop = (0, n + 2) if clipped[layer] else (1, n + 1)
+        n = stop - start - len(weights) + 1
+
+        for (sign, group_strike, _, exercised), buffer, kept in zip(groups, buffers, layers):
+            values, scratch, term, edges = buffer
+            if clipped[layer]:
+                values[0], values[stop - 1] = edges[layer]
+            new = scratch[1:n + 1]
+            np.multiply(values[start:start + n], weights[0], out=new)
+            for offset, weight in enumerate(weights[1:], 1):
+                new += np.multiply(values[start + offset:start + offset + n], weight, out=term[:n])
+            if exercised:
+                exercise = np.subtract(node_prices(bound)[:, None], group_strike, out=term[:n])
+                if sign < 0:
+                    np.negative(exercise, out=exercise)
+                np.maximum(new, exercise, out=new)
+            buffer[0], buffer[1] = scratch, values
+            if layer <= 2:
+                kept[layer] = new.copy()
+
+    price, delta, gamma = (np.empty(len(strike)) for _ in range(3))
+    for (_, _, members, _), kept in zip(groups, layers):
+        # Root Greeks by finite differences across the first layers
+        first, second = kept[1], kept[2] if method == 'binomial' else kept[1]
+        s1 = node_prices(1)
+        s2 = node_prices(2) if method == 'binomial' else s1
+        slope_up = (second[-1] - second[-2]) / (s2[-1] - s2[-2])
+        slope_down = (second[1] - second[0]) / (s2[1] - s2[0])
+        price[members] = kept[0][0]
+        delta[members] = (first[-1] - first[0]) / (s1[-1] - s1[0])
+        gamma[members] = (slope_up - slope_down) / (0.5 * (s2[-1] - s2[0]))
+
+    return {
+        'price': price.reshape(shape),
+        'delta': delta.reshape(shape),
+        'gamma': gamma.reshape(shape)
+    }
+
+
+def lattice_convergence(
+    option_type,
+    strike,
+    spot: float,
+    maturity: float,
+    rfr: float,
+    volatility: float,
+    steps=(50, 100, 200, 500, 1000, 2000, 5000),
+    method: str = 'binomial'
+) -> dict:
+    """
+    European lattice prices against Black-Scholes as the number of steps grows.
+
+    Returns 'steps', 'price' (one row per step count), 'black_scholes' and
+    'max_error', the largest absolute pricing error over the batch at each
+    step count.
+    """
+    exact = black_scholes(option_type, strike, spot, maturity, rfr, volatility, greeks=False)['price']
+    prices = np.array([
+        lattice_price(option_type, strike, spot, maturity, rfr, volatility, steps=n,
+                      american=False, method=method)['price']
+        for n in steps
+    ])
+    errors = np.abs(prices - exact).reshape(len(steps), -1)
+    return {
+        'steps': np.asarray(steps),
+        'price': prices,
+        'black_scholes': exact,
+        'max_error': errors.max(axis=1)
+    }
@@ -0,0 +1,134 @@
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+_ACTIVE = ContextVar('stage_profiler', default=None)
+
+# Returned by stage() while no profiler is active: entering it does nothing
+_DISABLED = nullcontext()
+
+
+class StageProfiler:
+    """
+    Collects wall time, peak allocated bytes and path counts per named stage.
+
+    While active (as a context manager), stage(...) blocks in the current
+    context are recorded, passed to callback and logged on the 'profiling'
+    logger at DEBUG. trace_memory uses tracemalloc, which slows allocation.
+    """
+    def __init__(self, trace_memory: bool = True, callback=None):
+        self.trace_memory = trace_memory
+        self.callback = callback
+        self.records = []
+        self._frames = []
+        self._token = None
+        self._started_tracing = False
+        self._pid = None
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._token = _ACTIVE.set(self)
+        self._pid = os.getpid()
+        return self
+
+    def __exit__(self, *exc_info):
+        _ACTIVE.reset(self._token)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return False
+
+    @contextmanager
+    def stage(self, name: str, paths: int = None):
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # Keep the enclosing stage's peak before resetting it for this one
+            if self._frames:
+                self._frames[-1][1] = max(self._frames[-1][1], peak)
+            tracemalloc.reset_peak()
+        frame = [current if tracing else 0, 0]
+        self._frames.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._frames.pop()
+            allocated = None
+            if tracing:
+                peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+                allocated = max(peak - frame[0], 0)
+                if self._frames:
+                    self._frames[-1][1] = max(self._frames[-1][1], peak)
+            self._record({'stage': name, 'seconds': seconds, 'allocated_bytes': allocated,
+                          'paths': paths})
+
+    def _record(self, record: dict):
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+        logger.debug("%s: %.6fs", record['stage'], record['seconds'], extra={'profile': record})
+
+    def summary(self) -> dict:
+        """Records aggregated per stage, in first-seen order, as columns for a table"""
+        stages = {}
+        for record in self.records:
+            total = stages.setdefault(record['stage'], {'calls': 0, 'seconds': 0.0,
+                                                        'allocated_bytes': None, 'paths': None})
+            total['calls'] += 1
+            total['seconds'] += record['seconds']
+            if record['allocated_bytes'] is not None:
+                total['allocated_bytes'] = max(total['allocated_bytes'] or 0, record['allocated_bytes'])
+            if record['paths'] is not None:
+                total['paths'] = (total['paths'] or 0) + record['paths']
+        return {
+            'stage': list(stages),
+            'calls': [total['calls'] for total in stages.values()],
+            'seconds': [total['seconds'] for total in stages.values()],
+            'peak_allocated_MiB': [None if total['allocated_bytes'] is None
+                                   else total['allocated_bytes'] / 1024**2 for total in stages.values()],
+            'paths': [total['paths'] for total in stages.values()],
+        }
+
+
+def stage(name: str, paths: int = None):
+    """
+    Context manager timing a block as stage name on the active profiler.
+
+    With no active profiler this returns a shared no-op context, so
+    instrumented code pays one context-variable lookup per stage.
+    """
+    profiler = _ACTIVE.get()
+    if profiler is None:
+        return _DISABLED
+    return profiler.stage(name, paths)
+
+
+def task_profiler():
+    """
+    Profiler for a task that may run in a pool worker, whose stages would otherwise be lost.
+
+    Memory is not traced. Inside a profiler active in this process this
+    returns the no-op context (entered as None), and the task's stages are
+    recorded there; a forked worker inherits the parent's profiler but not its records.
+    """
+    profiler = _ACTIVE.get()
+    if profiler is not None and profiler._pid == os.getpid():
+        return _DISABLED
+    return StageProfiler(trace_memory=False)
+
+
+def record_stages(records: list):
+    """Add records timed elsewhere, e.g. by task_profiler() in pool workers, to the active profiler"""
+    profiler = _ACTIVE.get()
+    if profiler is not None:
+        for record in records:
+            profiler._record(dict(record))
@@ -0,0 +1,774 @@
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Literal
+import numpy as np
+from payoff import PiecewiseLinearPayoff
+from pricing import black_scholes
+from profiling import record_stages, stage, task_profiler
+from stats import (ControlVariateMean, Histogram, ReplicatedMean, RunningMoments, QuantileSketch,
+                   freedman_diaconis_edges)
+from utils import LEG_PUT, LEG_FORWARD, LEG_DEBT, as_book
+
+# Paths generated per chunk by the streaming simulator; bounds peak memory.
+# A power of two keeps Sobol' chunks balanced.
+DEFAULT_CHUNK_SIZE = 65536
+
+DEFAULT_NUM_WORKERS = os.cpu_count() or 1
+
+# Independently scrambled Sobol' sequences per worker; the spread of their
+# means gives the standard error, which the i.i.d. formula overstates for QMC
+SOBOL_REPLICATES = 8
+
+
+class PnLAccumulator:
+    """
+    Online summary of simulated PnL.
+
+    Holds running moments, a quantile sketch and the outcome counts the PnL
+    page reports, so results can be built chunk by chunk (and merged across
+    chunks) without ever keeping the samples. With bin_edges an exact
+    histogram is filled as well; otherwise result() bins the sketch.
+    replicated estimates the mean from independent replicates (ReplicatedMean).
+    stage_records holds stage timings a pool worker reports back with it.
+    """
+    def __init__(
+        self,
+        initial_cost: float,
+        relative_accuracy: float = 0.005,
+        num_controls: int = 0,
+        bin_edges=None,
+        replicated: bool = False
+    ):
+        self.initial_cost = initial_cost
+        self.moments = RunningMoments()
+        self.sketch = QuantileSketch(relative_accuracy)
+        self.estimator = ReplicatedMean(num_controls) if replicated else ControlVariateMean(num_controls)
+        self.histogram = None if bin_edges is None else Histogram(bin_edges)
+        self.num_profit = 0
+        self.num_loss = 0
+        self.num_total_loss = 0
+        self.stage_records = []
+
+    @property
+    def count(self) -> int:
+        return self.moments.count
+
+    def update(self, pnl):
+        self.moments.update(pnl)
+        self.sketch.update(pnl)
+        if self.histogram is not None:
+            self.histogram.update(pnl)
+        self.num_profit += int(np.count_nonzero(pnl > 0))
+        self.num_loss += int(np.count_nonzero(pnl < 0))
+        self.num_total_loss += int(np.count_nonzero(pnl <= -self.initial_cost))
+
+    def merge(self, other: 'PnLAccumulator'):
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+        self.estimator.merge(other.estimator)
+        if self.histogram is not None:
+            self.histogram.merge(other.histogram)
+        self.num_profit += other.num_profit
+        self.num_loss += other.num_loss
+        self.num_total_loss += other.num_total_loss
+        self.stage_records.extend(other.stage_records)
+
+    def binned(self, bins: int = None) -> Histogram:
+        """
+        The PnL histogram: the exact one when bin_edges were given, else the
+        sketch re-binned onto bins equal-width bins (Freedman-Diaconis when None)
+        """
+        if self.histogram is not None:
+            return self.histogram
+        moments = self.moments
+        if bins is None:
+            q25, q75 = self.sketch.quantile([0.25, 0.75])
+            edges = freedman_diaconis_edges(q25, q75, moments.min, moments.max, moments.count)
+        elif moments.max > moments.min:
+            edges = np.linspace(moments.min, moments.max, bins + 1)
+        else:
+            edges = np.array([moments.min - 0.5, moments.min + 0.5])
+        return self.sketch.histogram(edges)
+
+    def result(self, bins: int = None) -> dict:
+        moments = self.moments
+        count = max(moments.count, 1)
+        percentile_5, percentile_95 = self.sketch.percentile([5, 95])
+        # The mean comes from the estimator so it picks up any variance reduction
+        return {
+            'initial_cost': self.initial_cost,
+            'num_simulations': moments.count,
+            'mean': self.estimator.mean if self.estimator.count else moments.mean,
+            'std_error': self.estimator.std_error,
+            'std': moments.std,
+            'skew': moments.skew,
+            'kurtosis': moments.kurtosis,
+            'min': moments.min,
+            'max': moments.max,
+            'percentile_5': percentile_5,
+            'percentile_95': percentile_95,
+            'prob_profit': self.num_profit / count,
+            'prob_loss': self.num_loss / count,
+            'prob_total_loss': self.num_total_loss / count,
+            'histogram': self.binned(bins).to_dict()
+        }
+
+
+class _NormalSampler:
+    """Standard normal draws from pseudo-random or scrambled Sobol' sequences"""
+    def __init__(self, rng: np.random.Generator, sampler: Literal['pseudo', 'sobol']):
+        self.rng = rng
+        self.sobol = None
+        if sampler == 'sobol':
+            # scipy.stats is slow to import; only Sobol' runs need it
+            from scipy.stats import qmc
+            self.sobol = qmc.Sobol(d=1, scramble=True, seed=rng)
+
+    def fill(self, out):
+        if self.sobol is None:
+            self.rng.standard_normal(out=out)
+            return
+        with warnings.catch_warnings():
+            # Only the final partial chunk can break the power-of-two balance
+            warnings.simplefilter('ignore', UserWarning)
+            uniforms = self.sobol.random(len(out))[:, 0]
+        from scipy.special import ndtri
+        # Guard the open interval so ndtri never returns +/-inf
+        np.clip(uniforms, 1e-16, 1 - 1e-16, out=uniforms)
+        ndtri(uniforms, out=out)
+
+
+def _simulate_chunks(
+    book,
+    accumulator: PnLAccumulator,
+    rng: np.random.Generator,
+    spot: float,
+    expected_drift: float,
+    volatility: float,
+    maturity: float,
+    rfr: float,
+    num_paths: int,
+    chunk_size: int,
+    antithetic: bool = False,
+    control_variates: bool = False,
+    sampler: Literal['pseudo', 'sobol'] = 'pseudo',
+    target_std_error: float = None
+):
+    """
+    Draw up to num_paths terminal prices chunk by chunk and fold their PnL into accumulator.
+
+    With sampler='sobol' every chunk is shared across SOBOL_REPLICATES
+    independently scrambled sequences, one replicate of accumulator.estimator
+    each. Stops early once accumulator.estimator reaches target_std_error.
+    """
+    drift_term = (expected_drift - 0.5 * volatility**2) * maturity
+    diffusion = volatility * np.sqrt(maturity)
+    future_cost = accumulator.initial_cost * np.exp(rfr * maturity)
+    if sampler == 'sobol':
+        streams = [(_NormalSampler(replicate_rng, sampler), accumulator.estimator.new_replicate())
+                   for replicate_rng in rng.spawn(SOBOL_REPLICATES)]
+    else:
+        streams = [(_NormalSampler(rng, sampler), accumulator.estimator)]
+
+    # Paths come in (z, -z) pairs when antithetic, so keep every chunk even
+    unit = 2 if antithetic else 1
+    if antithetic:
+        chunk_size = max(chunk_size - chunk_size % 2, 2)
+        num_paths += num_paths % 2
+
+    if control_variates:
+        # Controls: S_T and the option legs' payoff, whose means under the
+        # simulated drift are the lognormal mean and the Black-Scholes price
+        # with rfr replaced by the drift, compounded back to maturity
+        is_option = book.kind <= LEG_PUT
+        option_book, other_book = book.select(is_option), book.select(~is_option)
+        growth = np.exp(expected_drift * maturity)
+        option_mean = growth * black_scholes(
+            option_book.kind, option_book.strike, spot, maturity,
+            expected_drift, volatility, greeks=False
+        )['price'] @ option_book.quantity
+        control_means = np.array([spot * growth, option_mean])
+
+    # One reusable buffer holds the normals and, in place, the terminal prices
+    buffer = np.empty(max(min(chunk_size, num_paths), 0))
+    remaining = num_paths
+    while remaining > 0:
+        chunk = min(chunk_size, remaining)
+        share, extra = divmod(chunk // unit, len(streams))
+        for i, (normals, estimator) in enumerate(streams):
+            n = unit * (share + (i < extra))
+            if n == 0:
+                continue
+            terminal_prices = buffer[:n]
+            with stage('draw_normals', paths=n):
+                if antithetic:
+                    half = n // 2
+                    normals.fill(terminal_prices[:half])
+                    np.negative(terminal_prices[:half], out=terminal_prices[half:])
+                else:
+                    normals.fill(terminal_prices)
+                terminal_prices *= diffusion
+                terminal_prices += drift_term
+                np.exp(terminal_prices, out=terminal_prices)
+                terminal_prices *= spot
+
+            with stage('payoff', paths=n):
+                if control_variates:
+                    option_payoff = option_book.payoff(terminal_prices)
+                    pnl = option_payoff + other_book.payoff(terminal_prices)
+                    controls = np.column_stack([terminal_prices, option_payoff]) - control_means
+                else:
+                    pnl = book.payoff(terminal_prices)
+                    controls = None
+                pnl -= future_cost
+
+            with stage('accumulate', paths=n):
+                accumulator.update(pnl)
+
+                # The mean estimator sees antithetic pairs as single averaged samples
+                if antithetic:
+                    half = n // 2
+                    pnl = 0.5 * (pnl[:half] + pnl[half:])
+                    if controls is not None:
+                        controls = 0.5 * (controls[:half] + controls[half:])
+                estimator.update(pnl, controls)
+
+        remaining -= chunk
+        if target_std_error is not None and accumulator.estimator.std_error <= target_std_error:
+            break
+
+
+def _simulate_worker(book, initial_cost, seed_sequence, spot, expected_drift,
+                     volatility, maturity, rfr, num_paths, chunk_size, antithetic,
+                     control_variates, sampler, target_std_error, bin_edges):
+    """Process pool entry point: simulate one worker's share of the paths"""
+    accumulator = PnLAccumulator(initial_cost, num_controls=2 if control_variates else 0,
+                                 bin_edges=bin_edges, replicated=sampler == 'sobol')
+    with task_profiler() as profiler:
+        _simulate_chunks(book, accumulator, np.random.default_rng(seed_sequence), spot,
+                         expected_drift, volatility, maturity, rfr, num_paths, chunk_size,
+                         antithetic, control_variates, sampler, target_std_error)
+    if profiler is not None:
+        accumulator.stage_records = profiler.records
+    return accumulator
+
+
+def _split_work(num_simulations: int, num_workers: int, seed):
+    """Spawn one seed per worker from SeedSequence(seed) and share the paths evenly"""
+    if num_workers < 1:
+        raise ValueError("num_workers must be at least 1")
+    seed_sequence = np.random.SeedSequence(seed)
+    share, extra = divmod(num_simulations, num_workers)
+    worker_paths = [share + (i < extra) for i in range(num_workers)]
+    return seed_sequence, list(zip(seed_sequence.spawn(num_workers), worker_paths))
+
+
+def _run_workers(worker, worker_args: list) -> list:
+    """Run worker over each argument tuple, in-process for a single worker, results in order"""
+    if len(worker_args) == 1:
+        return [worker(*worker_args[0])]
+    with ProcessPoolExecutor(max_workers=len(worker_args)) as pool:
+        return list(pool.map(worker, *zip(*worker_args)))
+
+
+class SimulationPlan:
+    """
+    A streaming simulation split into independent tasks.
+
+    worker(*tasks[i]) returns the PnLAccumulator of task_paths[i] paths;
+    merge them in order into accumulator() and pass it to finish().
+    """
+    def __init__(self, worker, tasks: list, task_paths: list, initial_cost: float, seed,
+                 num_controls: int = 0, bins: int = None, bin_edges=None, extra: dict = None,
+                 replicated: bool = False):
+        self.worker = worker
+        self.tasks = tasks
+        self.task_paths = task_paths
+        self.initial_cost = initial_cost
+        self.seed = seed
+        self.num_controls = num_controls
+        self.bins = bins
+        self.bin_edges = bin_edges
+        self.extra = extra or {}
+        self.replicated = replicated
+
+    def accumulator(self) -> PnLAccumulator:
+        return PnLAccumulator(self.initial_cost, num_controls=self.num_controls, bin_edges=self.bin_edges,
+                              replicated=self.replicated)
+
+    def finish(self, accumulator: PnLAccumulator) -> dict:
+        results = accumulator.result(self.bins)
+        results['seed'] = self.seed
+        results.update(self.extra)
+        return results
+
+
+def run_plan(plan: SimulationPlan) -> dict:
+    """Run every task of plan, one process per task (in-process for one), and merge them"""
+    if len(plan.tasks) > 1:
+        # Stages inside the pool come back with each task's results, summed across processes
+        with stage('workers', paths=sum(plan.task_paths)):
+            partials = _run_workers(plan.worker, plan.tasks)
+        for partial in partials:
+            record_stages(partial.stage_records)
+    else:
+        partials = _run_workers(plan.worker, plan.tasks)
+
+    with stage('statistics'):
+        accumulator = plan.accumulator()
+        for partial in partials:
+            accumulator.merge(partial)
+        return plan.finish(accumulator)
+
+
+def simulate_portfolio_pnl_streaming(
+    portfolio,
+    spot: float,
+    expected_drift: float,
+    volatility: float,
+    maturity: float,
+    rfr: float,
+    num_simulations: int = 10000,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    num_workers: int = 1,
+    seed=None,
+    antithetic: bool = False,
+    control_variates: bool = False,
+    sampler: Literal['pseudo', 'sobol'] = 'pseudo',
+    target_std_error: float = None,
+    bins: int = None,
+    bin_edges=None
+) -> dict:
+    """
+    Streaming counterpart of simulate_portfolio_pnl; memory is independent of num_simulations.
+
+    Returns the same statistics without the samples, with sketch percentiles
+    (~0.5% relative error) and pre-binned 'histogram' counts. A seed and
+    worker count reproduce bit-identical results; 'seed' holds the entropy
+    used. With target_std_error, num_simulations is a cap. For Sobol' draws
+    'std_error' is the spread of independently scrambled replicates.
+    """
+    return run_plan(plan_portfolio_pnl_streaming(
+        portfolio, spot, expected_drift, volatility, maturity, rfr, num_simulations, chunk_size,
+        num_workers, seed, antithetic, control_variates, sampler, target_std_error, bins, bin_edges
+    ))
+
+
+def plan_portfolio_pnl_streaming(
+    portfolio,
+    spot: float,
+    expected_drift: float,
+    volatility: float,
+    maturity: float,
+    rfr: float,
+    num_simulations: int = 10000,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    num_workers: int = 1,
+    seed=None,
+    antithetic: bool = False,
+    control_variates: bool = False,
+    sampler: Literal['pseudo', 'sobol'] = 'pseudo',
+    target_std_error: float = None,
+    bins: int = None,
+    bin_edges=None
+) -> SimulationPlan:
+    """simulate_portfolio_pnl_streaming as a SimulationPlan with one task per worker"""
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if sampler not in ('pseudo', 'sobol'):
+        raise ValueError("sampler must be 'pseudo' or 'sobol'")
+    book = as_book(portfolio)
+    # Checked here so a job fails on submit rather than in its first task
+    book.require_single_underlying()
+    with stage('initial_cost'):
+        initial_cost = book.initial_cost(spot=spot, rfr=rfr, maturity=maturity)
+
+    seed_sequence, work = _split_work(num_simulations, num_workers, seed)
+    # Independent workers combine as an average, shrinking the error by sqrt(num_workers)
+    worker_target = None if target_std_error is None else target_std_error * np.sqrt(num_workers)
+    worker_args = [
+        (book, initial_cost, worker_seed, spot, expected_drift, volatility,
+         maturity, rfr, num_paths, chunk_size, antithetic, control_variates,
+         sampler, worker_target, bin_edges)
+        for worker_seed, num_paths in work
+    ]
+    return SimulationPlan(_simulate_worker, worker_args, [num_paths for _, num_paths in work],
+                          initial_cost, seed_sequence.entropy, num_controls=2 if control_variates else 0,
+                          bins=bins, bin_edges=bin_edges, replicated=sampler == 'sobol')
+
+
+def _multi_asset_worker(profiles, constant, initial_cost, seed_sequence, log_spot, drift_term,
+                        diffusion, factor, num_paths, chunk_size, bin_edges):
+    """Process pool entry point: simulate one worker's share of the correlated paths"""
+    accumulator = PnLAccumulator(initial_cost, bin_edges=bin_edges)
+    rng = np.random.default_rng(seed_sequence)
+    # One reusable (paths x underlyings) buffer holds the normals and, in place, the prices
+    buffer = np.empty((max(min(chunk_size, num_paths), 0), len(log_spot)))
+    with task_profiler() as profiler:
+        remaining = num_paths
+        while remaining > 0:
+            n = min(chunk_size, remaining)
+            with stage('draw_normals', paths=n):
+                terminal_prices = buffer[:n]
+                rng.standard_normal(out=terminal_prices)
+                # Rows of Z F^T are N(0, correlation): one batched product per chunk
+                terminal_prices[:] = terminal_prices @ factor.T
+                terminal_prices *= diffusion
+                terminal_prices += log_spot + drift_term
+                np.exp(terminal_prices, out=terminal_prices)
+
+            with stage('payoff', paths=n):
+                pnl = np.full(n, constant)
+                for column, profile in profiles:
+                    pnl += profile(terminal_prices[:, column])
+
+            with stage('accumulate', paths=n):
+                accumulator.update(pnl)
+                accumulator.estimator.update(pnl, None)
+            remaining -= n
+    if profiler is not None:
+        accumulator.stage_records = profiler.records
+    return accumulator
+
+
+def simulate_multi_asset_pnl(
+    portfolio,
+    underlyings,
+    spot,
+    expected_drift,
+    volatility,
+    correlation,
+    maturity: float,
+    rfr: float,
+    num_simulations: int = 10000,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    num_workers: int = 1,
+    seed=None,
+    bins: int = None,
+    bin_edges=None
+) -> dict:
+    """
+    Correlated multi-underlying counterpart of simulate_portfolio_pnl_streaming.
+
+    spot, expected_drift and volatility are per-underlying, in the order of
+    underlyings, and correlation is their correlation matrix. Returns the
+    streaming statistics plus 'underlyings'.
+    """
+    return run_plan(plan_multi_asset_pnl(
+        portfolio, underlyings, spot, expected_drift, volatility, correlation, maturity, rfr,
+        num_simulations, chunk_size, num_workers, seed, bins, bin_edges
+    ))
+
+
+def plan_multi_asset_pnl(
+    portfolio,
+    underlyings,
+    spot,
+    expected_drift,
+    volatility,
+    correlation,
+    maturity: float,
+    rfr: float,
+    num_simulations: int = 10000,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    num_workers: int = 1,
+    seed=None,
+    bins: int = None,
+    bin_edges=None
+) -> SimulationPlan:
+    """simulate_multi_asset_pnl as a SimulationPlan with one task per worker"""
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    book = as_book(portfolio)
+    names = np.asarray(underlyings, dtype=str)
+    num_underlyings = len(names)
+    spot, expected_drift, volatility = (
+        np.broadcast_to(np.asarray(x, dtype=np.float64), (num_underlyings,))
+        for x in (spot, expected_drift, volatility))
+    correlation = np.asarray(correlation, dtype=np.float64)
+    if correlation.shape != (num_underlyings, num_underlyings):
+        raise ValueError("correlation must be a square matrix with one row per underlying")
+    if not (np.allclose(correlation, correlation.T) and np.allclose(np.diag(correlation), 1)):
+        raise ValueError("correlation must be symmetric with a unit diagonal")
+    # factor @ factor.T == correlation: Cholesky, or through the eigenvalues when the
+    # matrix is singular but valid (e.g. perfectly correlated underlyings)
+    try:
+        factor = np.linalg.cholesky(correlation)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(correlation)
+        if eigenvalues.min() < -1e-10 * num_underlyings:
+            raise ValueError("correlation must be positive semi-definite") from None
+        factor = eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+    codes = book.underlying_codes(names)
+    is_debt = book.kind == LEG_DEBT
+    missing = np.unique(book.underlying[(codes < 0) & ~is_debt])
+    if len(missing):
+        raise ValueError(f"No market parameters for underlying(s): {', '.join(repr(str(name)) for name in missing)}")
+
+    with stage('initial_cost'):
+        debt = book.select(is_debt)
+        initial_cost = debt.initial_cost(spot=0.0, rfr=rfr, maturity=maturity)
+        profiles = []
+        for column in np.unique(codes[~is_debt]):
+            legs = book.select((codes == column) & ~is_debt)
+            initial_cost += legs.initial_cost(spot=spot[column], rfr=rfr, maturity=maturity)
+            profiles.append((column, PiecewiseLinearPayoff.from_book(legs)))
+    constant = debt.face_value.sum() - initial_cost * np.exp(rfr * maturity)
+
+    log_spot = np.log(spot)
+    drift_term = (expected_drift - 0.5 * volatility**2) * maturity
+    diffusion = volatility * np.sqrt(maturity)
+
+    seed_sequence, work = _split_work(num_simulations, num_workers, seed)
+    worker_args = [
+        (profiles, constant, initial_cost, worker_seed, log_spot, drift_term, diffusion,
+         factor, num_paths, chunk_size, bin_edges)
+        for worker_seed, num_paths in work
+    ]
+    return SimulationPlan(_multi_asset_worker, worker_args, [num_paths for _, num_paths in work],
+                          initial_cost, seed_sequence.entropy, bins=bins, bin_edges=bin_edges,
+                          extra={'underlyings': names})
+
+
+class PathStatistics:
+    """
+    Running statistics of a chunk of simulated paths.
+
+    Only the statistics requested by the products are tracked; the others
+    stay None. maximum/minimum include the starting spot, average is over
+    the num_steps fixings after it.
+    """
+    def __init__(self, spot: float, num_paths: int, statistics):
+        self.terminal = np.full(num_paths, float(spot))
+        self.maximum = self.terminal.copy() if 'maximum' in statistics else None
+        self.minimum = self.terminal.copy() if 'minimum' in statistics else None
+        self.average = np.zeros(num_paths) if 'average' in statistics else None
+
+    def step(self, growth):
+        """Advance every path by one multiplicative step and update the running statistics"""
+        self.terminal *= growth
+        if self.maximum is not None:
+            np.maximum(self.maximum, self.terminal, out=self.maximum)
+        if self.minimum is not None:
+            np.minimum(self.minimum, self.terminal, out=self.minimum)
+        if self.average is not None:
+            self.average += self.terminal
+
+
+def generate_path_statistics(
+    rng: np.random.Generator,
+    spot: float,
+    drift: float,
+    volatility: float,
+    maturity: float,
+    num_steps: int,
+    num_paths: int,
+    statistics
+) -> PathStatistics:
+    """
+    Step num_paths GBM paths through num_steps time steps.
+
+    Normals are drawn one step at a time into a single reused buffer, so
+    memory is O(num_paths) rather than O(num_paths x num_steps).
+    """
+    if num_steps < 1:
+        raise ValueError("num_steps must be at least 1")
+    dt = maturity / num_steps
+    drift_step = (drift - 0.5 * volatility**2) * dt
+    diffusion = volatility * np.sqrt(dt)
+
+    path = PathStatistics(spot, num_paths, statistics)
+    growth = np.empty(num_paths)
+    for _ in range(num_steps):
+        rng.standard_normal(out=growth)
+        growth *= diffusion
+        growth += drift_step
+        np.exp(growth, out=growth)
+        path.step(growth)
+    if path.average is not None:
+        path.average /= num_steps
+    return path
+
+
+def _path_payoffs(book, products, path: PathStatistics):
+    payoff = book.payoff(path.terminal)
+    for product in products:
+        payoff += product.payoff_from_path(path)
+    return payoff
+
+
+def price_path_dependent(
+    product,
+    num_simulations: int = 20000,
+    num_steps: int = 252,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    seed=None
+) -> float:
+    """Risk-neutral Monte Carlo price of a PathDependentOption from its own market parameters"""
+    rng = np.random.default_rng(seed)
+    total = 0.0
+    remaining = num_simulations
+    while remaining > 0:
+        n = min(chunk_size, remaining)
+        path = generate_path_statistics(rng, product.spot, product.rfr, product.volatility,
+                                        product.maturity, num_steps, n, product.path_statistics)
+        total += product.payoff_from_path(path).sum()
+        remaining -= n
+    return total / num_simulations * np.exp(-product.rfr * product.maturity)
+
+
+def _path_worker(book, products, initial_cost, seed_sequence, spot, expected_drift,
+                 volatility, maturity, rfr, num_paths, num_steps, chunk_size, bin_edges):
+    """Process pool entry point: simulate one worker's share of the stepped paths"""
+    rng = np.random.default_rng(seed_sequence)
+    statistics = frozenset().union(*(product.path_statistics for product in products))
+    future_cost = initial_cost * np.exp(rfr * maturity)
+
+    accumulator = PnLAccumulator(initial_cost, bin_edges=bin_edges)
+    remaining = num_paths
+    while remaining > 0:
+        n = min(chunk_size, remaining)
+        path = generate_path_statistics(rng, spot, expected_drift, volatility,
+                                        maturity, num_steps, n, statistics)
+        pnl = _path_payoffs(book, products, path)
+        pnl -= future_cost
+        accumulator.update(pnl)
+        accumulator.estimator.update(pnl)
+        remaining -= n
+    return accumulator
+
+
+def simulate_path_dependent_pnl(
+    portfolio,
+    products: list,
+    spot: float,
+    expected_drift: float,
+    volatility: float,
+    maturity: float,
+    rfr: float,
+    num_simulations: int = 10000,
+    num_steps: int = 252,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    num_workers: int = 1,
+    seed=None,
+    bins: int = None,
+    bin_edges=None
+) -> dict:
+    """
+    PnL distribution of vanilla legs plus path-dependent products.
+
+    Same keys and seeding as simulate_portfolio_pnl_streaming; each
+    product's initial cost is its own Monte Carlo price().
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    book = as_book(portfolio)
+    initial_cost = book.initial_cost(spot=spot, rfr=rfr, maturity=maturity)
+
+    seed_sequence, work = _split_work(num_simulations, num_workers, seed)
+    # The pricing streams are spawned after the workers' so they never overlap
+    for product, pricing_seed in zip(products, seed_sequence.spawn(len(products))):
+        initial_cost += product.price(num_steps=num_steps, seed=pricing_seed)
+
+    worker_args = [
+        (book, products, initial_cost, worker_seed, spot, expected_drift, volatility,
+         maturity, rfr, num_paths, num_steps, chunk_size, bin_edges)
+        for worker_seed, num_paths in work
+    ]
+    accumulator = PnLAccumulator(initial_cost, bin_edges=bin_edges)
+    for partial in _run_workers(_path_worker, worker_args):
+        accumulator.merge(partial)
+
+    results = accumulator.result(bins)
+    results['seed'] = seed_sequence.entropy
+    return results
+
+
+# Elements of the (scenarios x paths) block evaluated at once by the stress grid
+STRESS_BLOCK_ELEMENTS = 2**22
+
+
+def simulate_stress_grid(
+    portfolio,
+    spot: float,
+    rfr: float,
+    volatilities,
+    drifts,
+    horizons,
+    num_simulations: int = 10000,
+    seed=None
+) -> dict:
+    """
+    PnL statistics over a (volatility x drift x horizon) scenario grid.
+
+    Every scenario reuses one set of normals (common random numbers).
+    Statistics have shape (volatilities, drifts, horizons); 'initial_cost'
+    has shape (volatilities, horizons).
+    """
+    book = as_book(portfolio)
+    volatilities = np.atleast_1d(np.asarray(volatilities, dtype=np.float64))
+    drifts = np.atleast_1d(np.asarray(drifts, dtype=np.float64))
+    horizons = np.atleast_1d(np.asarray(horizons, dtype=np.float64))
+    for name, axis in (('volatilities', volatilities), ('drifts', drifts), ('horizons', horizons)):
+        if axis.size == 0:
+            raise ValueError(f"{name} must not be empty")
+    if (volatilities <= 0).any():
+        raise ValueError("volatilities must be positive")
+    if (horizons < 0).any():
+        raise ValueError("horizons must be non-negative")
+
+    seed_sequence = np.random.SeedSequence(seed)
+    epsilon = np.random.default_rng(seed_sequence).standard_normal(num_simulations)
+
+    # Initial cost per (volatility, horizon): option legs repriced in one broadcast
+    vol, horizon = np.meshgrid(volatilities, horizons, indexing='ij')
+    kind, strike, quantity = book.kind, book.strike, book.quantity
+    is_option = kind <= LEG_PUT
+    option_prices = black_scholes(
+        kind[is_option], strike[is_option], spot, horizon[..., None], rfr,
+        vol[..., None], greeks=False
+    )['price']
+    discount = np.exp(-rfr * horizon)
+    is_forward = kind == LEG_FORWARD
+    initial_cost = (option_prices @ quantity[is_option]
+                    + spot * quantity[is_forward].sum()
+                    - discount * (quantity[is_forward] * strike[is_forward]).sum()
+                    + discount * book.face_value[kind == LEG_DEBT].sum())
+
+    # Scenarios flattened in (volatility, drift, horizon) order
+    vol_cell, drift_cell, horizon_cell = (x.ravel() for x in np.meshgrid(
+        volatilities, drifts, horizons, indexing='ij'))
+    future_cost = np.broadcast_to(initial_cost[:, None, :], (len(volatilities), len(drifts),
+                                                            len(horizons))).ravel()
+    future_cost = future_cost * np.exp(rfr * horizon_cell)
+
+    num_cells = len(vol_cell)
+    stats = {name: np.empty(num_cells) for name in
+             ('mean', 'std', 'prob_profit', 'prob_loss', 'percentile_5', 'percentile_95')}
+    block = max(1, STRESS_BLOCK_ELEMENTS // max(num_simulations, 1))
+    for start in range(0, num_cells, block):
+        cells = slice(start, start + block)
+        sigma, mu, tau = vol_cell[cells, None], drift_cell[cells, None], horizon_cell[cells, None]
+        terminal_prices = spot * np.exp((mu - 0.5 * sigma**2) * tau + sigma * np.sqrt(tau) * epsilon)
+        pnl = book.payoff(terminal_prices)
+        pnl -= future_cost[cells, None]
+
+        stats['mean'][cells] = pnl.mean(axis=1)
+        stats['std'][cells] = pnl.std(axis=1)
+        stats['prob_profit'][cells] = (pnl > 0).mean(axis=1)
+        stats['prob_loss'][cells] = (pnl < 0).mean(axis=1)
+        stats['percentile_5'][cells], stats['percentile_95'][cells] = np.percentile(pnl, [5, 95], axis=1)
+
+    shape = (len(volatilities), len(drifts), len(horizons))
+    results = {name: values.reshape(shape) for name, values in stats.items()}
+    results.update({
+        'volatility': volatilities,
+        'drift': drifts,
+        'horizon': horizons,
+        'initial_cost': initial_cost,
+        'num_simulations': num_simulations,
+        'seed': seed_sequence.entropy
+    })
+    return results
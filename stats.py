@@ -0,0 +1,345 @@
+import numpy as np
+
+# Bounds on the number of bins chosen by freedman_diaconis_edges
+MIN_HISTOGRAM_BINS = 10
+MAX_HISTOGRAM_BINS = 200
+
+
+class RunningMoments:
+    """
+    Mergeable online mean / variance / skew / kurtosis / min / max.
+
+    Chunks are folded in with the pairwise update of Chan et al. and
+    Pébay, so partial results from separate chunks or workers combine
+    exactly as if the samples had been seen in one pass. skew and
+    kurtosis match scipy.stats defaults (biased, Fisher excess).
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._m3 = 0.0
+        self._m4 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        chunk = RunningMoments()
+        chunk.count = values.size
+        chunk.mean = float(values.mean())
+        centred = values - chunk.mean
+        squared = centred * centred
+        chunk._m2 = float(squared.sum())
+        chunk._m3 = float((squared * centred).sum())
+        chunk._m4 = float((squared * squared).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        self.merge(chunk)
+
+    def merge(self, other: 'RunningMoments'):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return
+
+        na, nb = self.count, other.count
+        n = na + nb
+        delta = other.mean - self.mean
+        delta_n = delta / n
+
+        m2 = self._m2 + other._m2 + delta * delta_n * na * nb
+        m3 = (self._m3 + other._m3
+              + delta * delta_n**2 * na * nb * (na - nb)
+              + 3 * delta_n * (na * other._m2 - nb * self._m2))
+        m4 = (self._m4 + other._m4
+              + delta * delta_n**3 * na * nb * (na * na - na * nb + nb * nb)
+              + 6 * delta_n**2 * (na * na * other._m2 + nb * nb * self._m2)
+              + 4 * delta_n * (na * other._m3 - nb * self._m3))
+
+        self.count = n
+        self.mean = self.mean + delta_n * nb
+        self._m2, self._m3, self._m4 = m2, m3, m4
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / self.count if self.count else np.nan
+
+    @property
+    def std(self) -> float:
+        return np.sqrt(self.variance)
+
+    @property
+    def skew(self) -> float:
+        if self._m2 == 0:
+            return np.nan
+        return np.sqrt(self.count) * self._m3 / self._m2**1.5
+
+    @property
+    def kurtosis(self) -> float:
+        if self._m2 == 0:
+            return np.nan
+        return self.count * self._m4 / self._m2**2 - 3
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with bounded relative error.
+
+    Values are counted in logarithmically spaced buckets (separately for
+    positive and negative values) whose width is set by relative_accuracy,
+    so memory is fixed by the representable range rather than the number
+    of samples. Two sketches with the same settings merge by adding counts.
+    """
+    def __init__(
+        self,
+        relative_accuracy: float = 0.005,
+        min_value: float = 1e-9,
+        max_value: float = 1e15
+    ):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self._gamma)
+        self._offset = int(np.floor(np.log(min_value) / self._log_gamma))
+        num_buckets = int(np.ceil(np.log(max_value) / self._log_gamma)) - self._offset + 1
+
+        self.count = 0
+        self._zero = 0
+        self._positive = np.zeros(num_buckets, dtype=np.int64)
+        self._negative = np.zeros(num_buckets, dtype=np.int64)
+
+    def _bucket_counts(self, magnitudes):
+        index = np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64) - self._offset
+        np.clip(index, 0, len(self._positive) - 1, out=index)
+        return np.bincount(index, minlength=len(self._positive))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        magnitudes = np.abs(values)
+        is_zero = magnitudes < self.min_value
+        is_positive = (values > 0) & ~is_zero
+        is_negative = (values < 0) & ~is_zero
+
+        self.count += values.size
+        self._zero += int(is_zero.sum())
+        self._positive += self._bucket_counts(magnitudes[is_positive])
+        self._negative += self._bucket_counts(magnitudes[is_negative])
+
+    def merge(self, other: 'QuantileSketch'):
+        if (other.relative_accuracy, other.min_value, other.max_value) != \
+                (self.relative_accuracy, self.min_value, self.max_value):
+            raise ValueError("Cannot merge sketches with different settings")
+        self.count += other.count
+        self._zero += other._zero
+        self._positive += other._positive
+        self._negative += other._negative
+
+    def _bucket_values(self):
+        """Representative value of every positive bucket"""
+        index = np.arange(len(self._positive)) + self._offset
+        return 2 * self._gamma**index / (self._gamma + 1)
+
+    def quantile(self, q):
+        """Estimate the q-th quantile(s), q in [0, 1]"""
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan)[()]
+        magnitude = self._bucket_values()
+        values = np.concatenate([-magnitude[::-1], [0.0], magnitude])
+        counts = np.concatenate([self._negative[::-1], [self._zero], self._positive])
+
+        rank = np.asarray(q, dtype=np.float64) * (self.count - 1)
+        position = np.searchsorted(np.cumsum(counts), rank, side='right')
+        return values[position][()]
+
+    def percentile(self, p):
+        return self.quantile(np.asarray(p) / 100)
+
+    def histogram(self, edges) -> 'Histogram':
+        """
+        Re-bin the sketch onto the given edges.
+
+        Counts are spread uniformly within each bucket, so the estimated bin
+        counts (floats) are accurate to the sketch's relative accuracy at
+        the bin boundaries. Mass just outside the edges (buckets straddle
+        the true min/max) is folded into the end bins.
+        """
+        histogram = Histogram(edges)
+        # Bucket i of each sign spans (gamma^(i-1), gamma^i] in magnitude; the
+        # zero bucket sits between the smallest negative and positive bounds
+        bounds = self._gamma ** np.arange(self._offset - 1, self._offset + len(self._positive))
+        boundaries = np.concatenate([-bounds[::-1], bounds])
+        cumulative = np.concatenate([
+            [0], np.cumsum(np.concatenate([self._negative[::-1], [self._zero], self._positive]))
+        ]).astype(np.float64)
+
+        cdf = np.interp(histogram.edges, boundaries, cumulative)
+        counts = np.diff(cdf)
+        counts[0] += cdf[0]
+        counts[-1] += self.count - cdf[-1]
+        histogram.counts = counts
+        return histogram
+
+
+class ControlVariateMean:
+    """
+    Mergeable running estimate of E[Y] with optional control variates.
+
+    Controls are passed with their true means subtracted; the regression
+    coefficient is re-estimated from the pooled sums.
+    """
+    def __init__(self, num_controls: int = 0):
+        self.num_controls = num_controls
+        self.count = 0
+        self._sum_y = 0.0
+        self._sum_yy = 0.0
+        self._sum_x = np.zeros(num_controls)
+        self._sum_xx = np.zeros((num_controls, num_controls))
+        self._sum_xy = np.zeros(num_controls)
+
+    def update(self, y, x=None):
+        y = np.asarray(y, dtype=np.float64)
+        self.count += y.size
+        self._sum_y += float(y.sum())
+        self._sum_yy += float(y @ y)
+        if self.num_controls:
+            x = np.asarray(x, dtype=np.float64).reshape(y.size, self.num_controls)
+            self._sum_x += x.sum(axis=0)
+            self._sum_xx += x.T @ x
+            self._sum_xy += x.T @ y
+
+    def merge(self, other: 'ControlVariateMean'):
+        if other.num_controls != self.num_controls:
+            raise ValueError("Cannot merge estimators with different controls")
+        self.count += other.count
+        self._sum_y += other._sum_y
+        self._sum_yy += other._sum_yy
+        self._sum_x += other._sum_x
+        self._sum_xx += other._sum_xx
+        self._sum_xy += other._sum_xy
+
+    def _fit(self):
+        """Return (mean, residual variance) of the controlled estimator"""
+        n = self.count
+        mean_y = self._sum_y / n
+        var_y = max(self._sum_yy / n - mean_y**2, 0.0)
+        if not self.num_controls:
+            return mean_y, var_y
+
+        mean_x = self._sum_x / n
+        cov_xx = self._sum_xx / n - np.outer(mean_x, mean_x)
+        cov_xy = self._sum_xy / n - mean_x * mean_y
+        # pinv tolerates degenerate controls (e.g. a book with no options)
+        beta = np.linalg.pinv(cov_xx) @ cov_xy
+        return mean_y - beta @ mean_x, max(var_y - cov_xy @ beta, 0.0)
+
+    @property
+    def mean(self) -> float:
+        return self._fit()[0] if self.count else np.nan
+
+    @property
+    def std_error(self) -> float:
+        if self.count < 2:
+            return np.inf
+        return np.sqrt(self._fit()[1] / (self.count - 1))
+
+
+class ReplicatedMean:
+    """
+    Mean over independent replicates (e.g. randomized QMC scrambles), with the error from their spread.
+
+    Each replicate is a ControlVariateMean; merging pools the replicates, so
+    the standard error is std(replicate means) / sqrt(replicates).
+    """
+    def __init__(self, num_controls: int = 0):
+        self.num_controls = num_controls
+        self.replicates = []
+
+    @property
+    def count(self) -> int:
+        return sum(replicate.count for replicate in self.replicates)
+
+    def new_replicate(self) -> ControlVariateMean:
+        replicate = ControlVariateMean(self.num_controls)
+        self.replicates.append(replicate)
+        return replicate
+
+    def merge(self, other: 'ReplicatedMean'):
+        if other.num_controls != self.num_controls:
+            raise ValueError("Cannot merge estimators with different controls")
+        self.replicates += other.replicates
+
+    def _means(self) -> np.ndarray:
+        return np.array([replicate.mean for replicate in self.replicates if replicate.count])
+
+    @property
+    def mean(self) -> float:
+        means = self._means()
+        return float(means.mean()) if len(means) else np.nan
+
+    @property
+    def std_error(self) -> float:
+        means = self._means()
+        if len(means) < 2:
+            return np.inf
+        return float(means.std(ddof=1) / np.sqrt(len(means)))
+
+
+class Histogram:
+    """
+    Fixed-edge histogram that can be filled chunk by chunk and merged.
+
+    Values outside the edges are tallied in underflow / overflow instead of
+    the end bins. Histograms estimated from a QuantileSketch carry float counts.
+    """
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        if self.edges.ndim != 1 or len(self.edges) < 2 or np.any(np.diff(self.edges) <= 0):
+            raise ValueError("edges must be a strictly increasing array of at least two values")
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        index = np.searchsorted(self.edges, values, side='right') - 1
+        # The last edge is inclusive, as in np.histogram
+        index[values == self.edges[-1]] = len(self.counts) - 1
+        inside = (index >= 0) & (index < len(self.counts))
+        self.counts += np.bincount(index[inside], minlength=len(self.counts))
+        self.underflow += int(np.count_nonzero(values < self.edges[0]))
+        self.overflow += int(np.count_nonzero(values > self.edges[-1]))
+
+    def merge(self, other: 'Histogram'):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge histograms with different edges")
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+
+    def to_dict(self) -> dict:
+        return {'edges': self.edges, 'counts': self.counts}
+
+
+def freedman_diaconis_edges(q25: float, q75: float, minimum: float, maximum: float, count: int):
+    """
+    Bin edges spanning [minimum, maximum] with the Freedman-Diaconis width
+    2 * IQR / count^(1/3), the bin count clipped to
+    [MIN_HISTOGRAM_BINS, MAX_HISTOGRAM_BINS].
+    """
+    if not maximum > minimum:
+        return np.array([minimum - 0.5, minimum + 0.5])
+    span = maximum - minimum
+    width = 2 * (q75 - q25) / max(count, 1) ** (1 / 3)
+    num_bins = int(np.ceil(span / width)) if width > 0 else MAX_HISTOGRAM_BINS
+    num_bins = int(np.clip(num_bins, MIN_HISTOGRAM_BINS, MAX_HISTOGRAM_BINS))
+    return np.linspace(minimum, maximum, num_bins + 1)
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from batch import run_batch
+
+MARKET = dict(spot=100.0, expected_drift=0.07, volatility=0.2, maturity=1.0, rfr=0.05)
+
+
+def test_break_evens_are_net_of_the_initial_cost(tmp_path):
+    strangle = tmp_path / 'strangle.csv'
+    strangle.write_text("type,strike,quantity,spot,maturity,rfr,volatility\n"
+                        "put,95,1,100,1,0.05,0.2\n"
+                        "call,100,1,100,1,0.05,0.2\n")
+    broken = tmp_path / 'broken.csv'
+    broken.write_text("strike,quantity\n100,1\n")
+    results, summary = run_batch([strangle, broken], num_simulations=1000, seed=3, num_workers=1,
+                                 **MARKET)
+    row = results.iloc[0]
+    future_cost = row['initial_cost'] * np.exp(0.05)
+    assert row['break_even_low'] == pytest.approx(95 - future_cost)
+    assert row['break_even_high'] == pytest.approx(100 + future_cost)
+    assert summary['failed'] == 1 and isinstance(results.iloc[1]['error'], str)
+
+
+def test_books_spanning_several_underlyings_are_reported(tmp_path):
+    pair = tmp_path / 'pair.csv'
+    pair.write_text("type,underlying,strike,quantity,spot,maturity,rfr,volatility\n"
+                    "call,AAA,100,1,100,1,0.05,0.2\n"
+                    "put,BBB,50,1,50,1,0.05,0.4\n")
+    results, summary = run_batch([pair], num_simulations=1000, seed=3, num_workers=1, **MARKET)
+    assert summary['failed'] == 1 and 'AAA, BBB' in results.iloc[0]['error']
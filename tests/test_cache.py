@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from cache import ResultCache, cached_simulation, fingerprint
+from utils import Option, PortfolioBook
+
+
+@pytest.fixture
+def book():
+    return PortfolioBook([Option('call', 100), Option('put', 90, quantity=-2)])
+
+
+@pytest.mark.parametrize('a, b', [
+    (100, 100.0),
+    (np.float64(0.2), 0.2),
+    (np.int64(7), 7),
+    ([1, 2], np.array([1.0, 2.0])),
+    ((0.5, 1.0), [0.5, 1]),
+    (np.array(['A', 'B'], dtype='U16'), ['A', 'B']),
+])
+def test_equal_values_give_equal_keys(book, a, b):
+    assert fingerprint(book, value=a) == fingerprint(book, value=b)
+
+
+@pytest.mark.parametrize('a, b', [
+    (0.2, 0.21),
+    (2**64 + 1, 2**64),
+    (True, 'True'),
+    (None, 0),
+    ([1, 2], [2, 1]),
+    (np.zeros(4), np.zeros((2, 2))),
+])
+def test_different_values_give_different_keys(book, a, b):
+    assert fingerprint(book, value=a) != fingerprint(book, value=b)
+
+
+def test_key_ignores_keyword_order_but_not_the_book(book):
+    assert fingerprint(book, spot=100, rfr=0.05) == fingerprint(book, rfr=0.05, spot=100)
+    other = PortfolioBook([Option('call', 105)])
+    assert fingerprint(book, spot=100) != fingerprint(other, spot=100)
+
+
+def test_cached_simulation_reuses_results_for_equivalent_parameters(book):
+    cache = ResultCache()
+    calls = []
+
+    def simulate(portfolio, spot):
+        calls.append(spot)
+        return {'value': spot}
+
+    cached_simulation(simulate, book, cache=cache, spot=100)
+    assert cached_simulation(simulate, book, cache=cache, spot=np.float64(100.0)) == {'value': 100}
+    assert calls == [100]
+    assert cache.stats()['hits'] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_unseeded_simulations_are_not_served_from_the_cache(book):
+    cache = ResultCache()
+
+    def simulate(portfolio, seed=None):
+        return {'seed': np.random.SeedSequence(seed).entropy}
+
+    first = cached_simulation(simulate, book, cache=cache, seed=None)
+    second = cached_simulation(simulate, book, cache=cache, seed=None)
+    assert first['seed'] != second['seed']
+    assert cached_simulation(simulate, book, cache=cache, seed=first['seed']) == first
+    assert cache.stats()['hits'] == 1
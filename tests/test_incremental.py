@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from incremental import IncrementalPayoff, IncrementalPnL
+from utils import Debt, Forward, Option, PortfolioBook, simulate_portfolio_pnl
+
+MARKET = dict(spot=100.0, expected_drift=0.07, volatility=0.25, maturity=1.0, rfr=0.05)
+
+
+def make_book():
+    return PortfolioBook([Option('call', 100), Option('put', 90, quantity=-2),
+                          Forward(105), Debt(-10.0)])
+
+
+def assert_matches_fresh_run(results, book, seed):
+    fresh = simulate_portfolio_pnl(book, num_simulations=20000, seed=seed, **MARKET)
+    for name in ('initial_cost', 'mean', 'std', 'percentile_5', 'percentile_95', 'prob_profit'):
+        assert results[name] == pytest.approx(fresh[name], rel=1e-9, abs=1e-9)
+
+
+def test_sync_tracks_added_and_removed_legs():
+    book = make_book()
+    live = IncrementalPnL(num_simulations=20000, seed=11, **MARKET)
+    assert live.sync(book)['revalued_legs'] == len(book)
+
+    book.append(Option('call', 120, quantity=3))
+    results = live.sync(book)
+    assert results['revalued_legs'] == 1
+    assert_matches_fresh_run(results, book, seed=11)
+
+    book.remove(1)
+    results = live.sync(book)
+    assert results['revalued_legs'] == 1
+    assert_matches_fresh_run(results, book, seed=11)
+
+    assert live.sync(book)['revalued_legs'] == 0
+
+
+def test_results_hold_no_samples():
+    live = IncrementalPnL(num_simulations=20000, seed=3, **MARKET)
+    results = live.sync(make_book())
+    assert 'pnl_samples' not in results and 'terminal_prices' not in results
+    assert not any(isinstance(value, np.ndarray) and value.size >= 20000 for value in results.values())
+    assert len(live.pnl) == len(live.terminal_prices) == 20000
+
+
+def test_incremental_payoff_handles_duplicates_and_clear():
+    prices = np.linspace(50, 150, 11)
+    book = PortfolioBook([Option('call', 100)] * 3)
+    payoff = IncrementalPayoff(prices)
+    payoff.sync(book)
+    book.remove(0)
+    assert payoff.sync(book) == 1
+    np.testing.assert_allclose(payoff.total, book.payoff(prices))
+    book.clear()
+    payoff.sync(book)
+    np.testing.assert_array_equal(payoff.total, 0.0)
@@ -0,0 +1,97 @@
+import threading
+import pytest
+from cache import ResultCache
+from jobs import JobManager
+from simulation import simulate_portfolio_pnl_streaming
+from utils import Option, PortfolioBook
+
+MARKET = dict(spot=100.0, expected_drift=0.07, volatility=0.25, maturity=1.0, rfr=0.05)
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=2, cache=ResultCache(), task_paths=5000)
+    yield manager
+    manager.shutdown()
+
+
+@pytest.fixture
+def book():
+    return PortfolioBook([Option('call', 100), Option('put', 90, quantity=-2)])
+
+
+def test_job_matches_one_worker_per_task(manager, book):
+    job = manager.submit(simulate_portfolio_pnl_streaming, book, num_simulations=20000, seed=4, **MARKET)
+    assert job.wait(60) and job.status == 'done'
+    direct = simulate_portfolio_pnl_streaming(book, num_simulations=20000, seed=4, num_workers=4, **MARKET)
+    results = job.result()
+    for name in ('mean', 'std', 'percentile_5', 'prob_profit', 'num_simulations', 'seed'):
+        assert results[name] == direct[name]
+
+
+def test_identical_requests_share_a_job_then_the_cache(manager, book):
+    params = dict(num_simulations=200000, seed=1, **MARKET)
+    job = manager.submit(simulate_portfolio_pnl_streaming, book, **params)
+    # 100 and 100.0 are the same request
+    same = manager.submit(simulate_portfolio_pnl_streaming, book, **{**params, 'spot': 100})
+    assert same is job and job.subscribers == 2
+    job.wait(60)
+    cached = manager.submit(simulate_portfolio_pnl_streaming, book, **params)
+    assert cached is not job and cached.done() and cached.result()['mean'] == job.result()['mean']
+
+
+def test_unseeded_submits_share_a_job_in_flight(manager, book):
+    params = dict(num_simulations=200000, **MARKET)
+    job = manager.submit(simulate_portfolio_pnl_streaming, book, seed=None, **params)
+    same = manager.submit(simulate_portfolio_pnl_streaming, book, **params)
+    assert same is job and job.subscribers == 2
+    assert job.wait(60) and job.result()['seed'] is not None
+
+
+def test_unseeded_submits_draw_fresh_seeds(manager, book):
+    params = dict(num_simulations=10000, **MARKET)
+    first = manager.submit(simulate_portfolio_pnl_streaming, book, seed=None, **params)
+    assert first.wait(60)
+    second = manager.submit(simulate_portfolio_pnl_streaming, book, **params)
+    assert second is not first and second.wait(60)
+    assert first.result()['seed'] != second.result()['seed']
+    assert first.result()['mean'] != second.result()['mean']
+
+
+def test_job_stops_once_every_subscriber_cancels(manager, book):
+    job = manager.submit(simulate_portfolio_pnl_streaming, book, num_simulations=10**8, seed=2, **MARKET)
+    job.cancel()
+    assert job.wait(60) and job.status == 'cancelled'
+    assert job.paths_done < job.paths_total
+
+
+def test_concurrent_submits_share_one_pool(book):
+    manager = JobManager(max_workers=2, cache=ResultCache(), task_paths=5000)
+    pools = []
+    original = manager._executor
+
+    def record():
+        pools.append(original())
+        return pools[-1]
+
+    manager._executor = record
+    threads = [threading.Thread(target=manager.submit, args=(simulate_portfolio_pnl_streaming, book),
+                                kwargs=dict(num_simulations=10000, seed=seed, **MARKET))
+               for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for job in manager.running():
+        job.wait(60)
+    assert len({id(pool) for pool in pools}) == 1
+    manager.shutdown()
+
+
+def test_job_collects_the_stage_records_of_its_tasks(manager, book):
+    job = manager.submit(simulate_portfolio_pnl_streaming, book, num_simulations=20000, seed=6, **MARKET)
+    assert job.wait(60) and job.status == 'done'
+    draws = [record for record in job.stage_records() if record['stage'] == 'draw_normals']
+    assert sum(record['paths'] for record in draws) == 20000
+    cached = manager.submit(simulate_portfolio_pnl_streaming, book, num_simulations=20000, seed=6, **MARKET)
+    assert cached.stage_records() == []
@@ -0,0 +1,64 @@
+import pytest
+from analytic import exact_portfolio_pnl
+from payoff import PiecewiseLinearPayoff
+from simulation import simulate_multi_asset_pnl
+from utils import Forward, Option, PortfolioBook
+
+UNDERLYINGS = ['AAA', 'BBB']
+SPOT = [100.0, 50.0]
+DRIFT = [0.08, 0.03]
+VOLATILITY = [0.25, 0.4]
+
+
+def legs(underlying: str) -> list:
+    spot, volatility = (SPOT[0], VOLATILITY[0]) if underlying == 'AAA' else (SPOT[1], VOLATILITY[1])
+    return [Option('call', spot, spot=spot, volatility=volatility, rfr=0.05, underlying=underlying),
+            Option('put', 0.9 * spot, quantity=-2, spot=spot, volatility=volatility, rfr=0.05,
+                   underlying=underlying),
+            Forward(spot, underlying=underlying)]
+
+
+def simulate(book, correlation, **kwargs):
+    return simulate_multi_asset_pnl(book, UNDERLYINGS, SPOT, DRIFT, VOLATILITY, correlation,
+                                    maturity=1.0, rfr=0.05, **kwargs)
+
+
+def test_mean_is_the_sum_of_per_underlying_exact_means():
+    book = PortfolioBook(legs('AAA') + legs('BBB'))
+    exact = sum(
+        exact_portfolio_pnl(PortfolioBook(legs(name)), spot=SPOT[i], expected_drift=DRIFT[i],
+                            volatility=VOLATILITY[i], maturity=1.0, rfr=0.05)['mean']
+        for i, name in enumerate(UNDERLYINGS))
+    results = simulate(book, [[1.0, 0.6], [0.6, 1.0]], num_simulations=200000, seed=7)
+    assert results['mean'] == pytest.approx(exact, abs=4 * results['std_error'])
+    assert list(results['underlyings']) == UNDERLYINGS
+
+
+@pytest.mark.parametrize('correlation', [
+    [[1.0, 0.9, -0.9], [0.9, 1.0, 0.9], [-0.9, 0.9, 1.0]],
+    [[1.0, 0.5, 0.0], [0.4, 1.0, 0.0], [0.0, 0.0, 1.0]],
+    [[1.0, 0.0], [0.0, 1.0]],
+])
+def test_invalid_correlation_is_rejected(correlation):
+    book = PortfolioBook(legs('AAA'))
+    with pytest.raises(ValueError, match='correlation'):
+        simulate_multi_asset_pnl(book, ['AAA', 'BBB', 'CCC'], 100.0, 0.05, 0.2, correlation,
+                                 maturity=1.0, rfr=0.05, num_simulations=1000, seed=1)
+
+
+def test_positive_correlation_widens_same_sign_books():
+    book = PortfolioBook([Forward(100.0, underlying='AAA'), Forward(50.0, quantity=2, underlying='BBB')])
+    spread = [simulate(book, [[1.0, rho], [rho, 1.0]], num_simulations=50000, seed=3)['std']
+              for rho in (-0.8, 0.0, 0.8, 1.0)]
+    assert spread == sorted(spread) and spread[0] < 0.7 * spread[-1]
+
+
+@pytest.mark.parametrize('single_axis', [
+    lambda book: book.payoff([100.0]),
+    PiecewiseLinearPayoff.from_book,
+    lambda book: exact_portfolio_pnl(book, spot=100.0, expected_drift=0.08, volatility=0.25,
+                                     maturity=1.0, rfr=0.05),
+])
+def test_single_axis_valuation_rejects_several_underlyings(single_axis):
+    with pytest.raises(ValueError, match="several underlyings"):
+        single_axis(PortfolioBook(legs('AAA') + legs('BBB')))
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from scipy.stats import norm
+from simulation import simulate_path_dependent_pnl
+from utils import AsianOption, BarrierOption, LookbackOption, PathDependentOption, black_scholes
+
+MARKET = dict(spot=100.0, maturity=1.0, rfr=0.05, volatility=0.2)
+STEPS = 50
+
+
+def european_call(strike: float = 100.0) -> float:
+    return float(black_scholes('call', strike, 100.0, 1.0, 0.05, 0.2, greeks=False)['price'])
+
+
+def test_path_dependent_option_is_abstract():
+    with pytest.raises(TypeError):
+        PathDependentOption('call', 100)
+
+
+@pytest.mark.parametrize('direction, barrier', [('up', 120.0), ('down', 85.0)])
+def test_knock_in_plus_knock_out_is_vanilla(direction, barrier):
+    knock_in = BarrierOption('call', 100, barrier, f'{direction}-and-in', **MARKET)
+    knock_out = BarrierOption('call', 100, barrier, f'{direction}-and-out', **MARKET)
+    total = knock_in.price(20000, STEPS, seed=1) + knock_out.price(20000, STEPS, seed=1)
+    # Same seed, same paths: the pair pays the vanilla on every path
+    assert total == pytest.approx(european_call(), abs=0.3)
+
+
+def test_asian_call_between_geometric_asian_and_european():
+    dt = 1.0 / STEPS
+    # Discretely monitored geometric average: lognormal, priced in closed form
+    mean = np.log(100.0) + (0.05 - 0.02) * dt * (STEPS + 1) / 2
+    variance = 0.04 * dt * (STEPS + 1) * (2 * STEPS + 1) / (6 * STEPS)
+    d2 = (mean - np.log(100.0)) / np.sqrt(variance)
+    geometric = np.exp(-0.05) * (np.exp(mean + variance / 2) * norm.cdf(d2 + np.sqrt(variance))
+                                 - 100.0 * norm.cdf(d2))
+    asian = AsianOption('call', 100, **MARKET).price(20000, STEPS, seed=2)
+    assert geometric < asian < european_call()
+
+
+def test_floating_lookback_call_between_european_and_continuous_monitoring():
+    # Goldman-Sosin-Gatto price with the running minimum at spot
+    sigma, r = 0.2, 0.05
+    a1 = (r + sigma**2 / 2) / sigma
+    a2 = a1 - sigma
+    a3 = (-r + sigma**2 / 2) / sigma
+    continuous = 100.0 * (norm.cdf(a1) - sigma**2 / (2 * r) * norm.cdf(-a1)
+                          - np.exp(-r) * (norm.cdf(a2) - sigma**2 / (2 * r) * norm.cdf(-a3)))
+    lookback = LookbackOption('call', **MARKET).price(20000, STEPS, seed=3)
+    assert european_call() < lookback < continuous
+
+
+def test_risk_neutral_pnl_of_path_dependent_products_is_zero_on_average():
+    products = [AsianOption('put', 95, **MARKET), BarrierOption('call', 100, 130, 'up-and-out', **MARKET)]
+    results = simulate_path_dependent_pnl([], products, spot=100.0, expected_drift=0.05, volatility=0.2,
+                                          maturity=1.0, rfr=0.05, num_simulations=20000, num_steps=STEPS,
+                                          seed=4)
+    assert results['num_simulations'] == 20000
+    assert abs(results['mean']) < 4 * np.sqrt(2) * results['std_error']
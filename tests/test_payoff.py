@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from benchmarks.bench_hot_paths import make_book
+from payoff import PiecewiseLinearPayoff
+from utils import PIECEWISE_MIN_OPTION_LEGS, PortfolioBook
+
+
+def loop_payoff(book, spot_prices):
+    return sum(leg.payoff(spot_prices) for leg in book)
+
+
+@pytest.mark.parametrize('num_options', [PIECEWISE_MIN_OPTION_LEGS - 22, PIECEWISE_MIN_OPTION_LEGS + 8])
+def test_book_payoff_scalar_matches_array_across_threshold(num_options):
+    book = PortfolioBook()
+    book.add_legs(np.arange(num_options) % 2, strike=np.linspace(80, 120, num_options), quantity=1.0)
+    spots = np.array([50.0, 100.0, 150.0])
+    array = book.payoff(spots)
+    for spot, expected in zip(spots, array):
+        scalar = book.payoff(spot)
+        assert np.shape(scalar) == ()
+        assert scalar == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('num_legs', [1, 10, 200])
+def test_book_payoff_matches_leg_loop(num_legs):
+    book = make_book(num_legs)
+    spots = np.linspace(0, 250, 101)
+    np.testing.assert_allclose(book.payoff(spots), loop_payoff(book, spots), atol=1e-9)
+
+
+def test_piecewise_payoff_keeps_input_shape_and_extends_ends():
+    profile = PiecewiseLinearPayoff.from_book(make_book(50))
+    grid = np.linspace(-10, 400, 12).reshape(3, 4)
+    values = profile(grid)
+    assert values.shape == (3, 4)
+    np.testing.assert_allclose(values.ravel(), [profile(x) for x in grid.ravel()])
+
+
+def test_roots_are_break_evens():
+    profile = PiecewiseLinearPayoff.from_book(make_book(30, seed=3))
+    roots = profile.roots()
+    np.testing.assert_allclose(profile(roots), 0.0, atol=1e-9)
+
+
+def test_flat_stretches_at_level_are_not_roots():
+    book = PortfolioBook()
+    book.add_legs([0], strike=[100.0], quantity=1.0)
+    profile = PiecewiseLinearPayoff.from_book(book)
+    assert len(profile.roots()) == 0
+    # Touching zero at a single vertex still counts
+    book.add_legs([1], strike=[100.0], quantity=1.0)
+    np.testing.assert_allclose(PiecewiseLinearPayoff.from_book(book).roots(), [100.0])
+
+
+def test_long_call_break_even_includes_the_premium():
+    book = PortfolioBook()
+    book.add_legs([0], strike=[100.0], quantity=1.0, spot=100.0, maturity=1.0, rfr=0.05, volatility=0.2)
+    profile = PiecewiseLinearPayoff.from_book(book)
+    premium = book.initial_cost(spot=100.0, rfr=0.05, maturity=1.0)
+    np.testing.assert_allclose(profile.break_evens(premium, 0.05, 1.0), [100.0 + premium * np.exp(0.05)])
+
+
+def test_long_strangle_has_two_break_evens():
+    book = PortfolioBook()
+    book.add_legs([1, 0], strike=[95.0, 100.0], quantity=1.0)
+    profile = PiecewiseLinearPayoff.from_book(book)
+    assert len(profile.roots()) == 0
+    np.testing.assert_allclose(profile.break_evens(4.0, 0.0, 1.0), [91.0, 104.0])
+    # A flat stretch at zero counts once, at its left end, when the payoff crosses through it
+    np.testing.assert_allclose(PiecewiseLinearPayoff([0, 95, 100], [-95, 0, 0], 1).roots(), [95.0])
+    assert len(PiecewiseLinearPayoff([0, 95, 100], [-95, 0, 0], -1).roots()) == 0
@@ -0,0 +1,42 @@
+import io
+import pandas as pd
+import pytest
+from portfolio_io import read_positions, write_positions
+from utils import Debt, Forward, Option, PortfolioBook
+
+
+@pytest.fixture
+def book():
+    return PortfolioBook([Option('call', 100, underlying='AAA'), Option('put', 90, quantity=-2, volatility=0.3),
+                          Forward(105, quantity=3), Debt(-10.0)])
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'parquet'])
+def test_round_trip_preserves_the_book(book, file_format):
+    if file_format == 'parquet':
+        pytest.importorskip('pyarrow')
+    data = write_positions(book, file_format=file_format)
+    loaded, errors = read_positions(io.BytesIO(data), file_format=file_format, chunk_size=3)
+    assert len(errors) == 0
+    assert loaded.fingerprint() == book.fingerprint()
+
+
+def test_parse_error_leaves_the_book_untouched(book):
+    data = "type,strike\n" + "call,100\n" * 4 + 'put,"95\n'
+    with pytest.raises(pd.errors.ParserError):
+        read_positions(io.StringIO(data), book=book, chunk_size=2)
+    assert len(book) == 4
+
+
+def test_bad_rows_are_rejected_once_per_column():
+    data = "type,strike,quantity\ncall,abc,1\nswap,100,1\nput,-5,x\ncall,100,2\n"
+    loaded, errors = read_positions(io.StringIO(data))
+    assert len(loaded) == 1 and loaded.quantity[0] == 2
+    assert errors[['row', 'column']].values.tolist() == [[1, 'strike'], [2, 'type'], [3, 'quantity'],
+                                                         [3, 'strike']]
+    assert errors['message'].iloc[0] == "strike is not a number"
+
+
+def test_missing_type_column_is_an_error():
+    with pytest.raises(ValueError, match="'type'"):
+        read_positions(io.StringIO("strike,quantity\n100,1\n"))
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from pricing import black_scholes
+
+
+def test_black_scholes_broadcasts_option_type_against_scalars():
+    result = black_scholes(['call', 'put'], 100, 100, 1, 0.05, 0.2)
+    assert result['price'].shape == (2,)
+    assert result['price'][0] == pytest.approx(10.450584, abs=1e-6)
+    assert result['price'][1] == pytest.approx(5.573526, abs=1e-6)
+
+
+def test_black_scholes_broadcasts_option_type_against_columns():
+    result = black_scholes(['call', 'put'], [[90], [110]], 100, 1, 0.05, 0.2)
+    assert result['price'].shape == (2, 2)
+    for i, strike in enumerate([90, 110]):
+        expected = [black_scholes(kind, strike, 100, 1, 0.05, 0.2)['price'] for kind in ('call', 'put')]
+        np.testing.assert_allclose(result['price'][i], expected)
+
+
+def test_put_call_parity():
+    strike = np.linspace(60, 140, 9)
+    call = black_scholes('call', strike, 100, 0.5, 0.03, 0.25, greeks=False)['price']
+    put = black_scholes('put', strike, 100, 0.5, 0.03, 0.25, greeks=False)['price']
+    np.testing.assert_allclose(call - put, 100 - strike * np.exp(-0.03 * 0.5), atol=1e-10)
+
+
+def test_expired_contracts_are_intrinsic():
+    result = black_scholes(['call', 'put'], 100, [90, 110], 0, 0.05, 0.2)
+    np.testing.assert_array_equal(result['price'], [0.0, 0.0])
+    result = black_scholes(['call', 'put'], 100, [110, 90], 0, 0.05, 0.2)
+    np.testing.assert_array_equal(result['price'], [10.0, 10.0])
+    np.testing.assert_array_equal(result['delta'], [1.0, -1.0])
+
+
+def test_implied_volatility_round_trip():
+    from pricing import implied_volatility
+    volatility = np.array([0.05, 0.2, 0.6, 1.5])
+    option_type = ['call', 'put', 'call', 'put']
+    strike = np.array([80.0, 95.0, 110.0, 130.0])
+    premium = black_scholes(option_type, strike, 100, 0.75, 0.03, volatility, greeks=False)['price']
+    solved = implied_volatility(option_type, premium, strike, 100, 0.75, 0.03)
+    assert solved['converged'].all()
+    np.testing.assert_allclose(solved['volatility'], volatility, rtol=1e-6)
+
+
+def test_implied_volatility_rejects_arbitrage_quotes():
+    from pricing import implied_volatility
+    solved = implied_volatility('call', [150.0, -1.0], 100, 100, 1, 0.05)
+    assert not solved['converged'].any()
+    assert np.isnan(solved['volatility']).all()
+
+
+@pytest.mark.parametrize('method', ['binomial', 'trinomial'])
+def test_european_lattice_converges_to_black_scholes(method):
+    from pricing import lattice_price
+    strike = np.array([80.0, 100.0, 120.0])
+    option_type = ['call', 'put', 'put']
+    lattice = lattice_price(option_type, strike, 100, 1, 0.05, 0.2, steps=2000, american=False,
+                            method=method)
+    exact = black_scholes(option_type, strike, 100, 1, 0.05, 0.2)
+    np.testing.assert_allclose(lattice['price'], exact['price'], atol=5e-3)
+    np.testing.assert_allclose(lattice['delta'], exact['delta'], atol=5e-3)
+
+
+def test_american_put_carries_early_exercise_premium():
+    from pricing import lattice_price
+    american = lattice_price('put', 110, 100, 1, 0.08, 0.2, steps=1000)['price']
+    european = lattice_price('put', 110, 100, 1, 0.08, 0.2, steps=1000, american=False)['price']
+    assert float(american) > float(european)
+    assert float(american) >= 10.0
@@ -0,0 +1,60 @@
+import time
+import numpy as np
+from profiling import StageProfiler, stage
+from simulation import simulate_portfolio_pnl_streaming
+from utils import Option, PortfolioBook
+
+
+def test_nested_stages_record_their_own_time_and_memory():
+    with StageProfiler() as profiler:
+        with stage('outer', paths=10):
+            outer_block = np.ones(2**20)  # 8 MiB held by the outer stage only
+            with stage('inner'):
+                inner_block = np.ones(2**17)  # 1 MiB
+                time.sleep(0.02)
+                del inner_block
+            time.sleep(0.01)
+            del outer_block
+
+    inner, outer = profiler.records
+    assert (inner['stage'], outer['stage']) == ('inner', 'outer')
+    assert outer['paths'] == 10 and inner['paths'] is None
+    assert 0.02 <= inner['seconds'] < outer['seconds']
+    assert 2**20 <= inner['allocated_bytes'] < 2 * 2**20
+    # The outer peak covers both blocks at once
+    assert outer['allocated_bytes'] >= 9 * 2**20
+    assert profiler.summary()['stage'] == ['inner', 'outer']
+
+
+def test_stage_is_a_no_op_without_an_active_profiler():
+    first, second = stage('idle'), stage('idle', paths=5)
+    assert first is second
+    with first:
+        pass
+
+    profiler = StageProfiler()
+    with profiler:
+        pass
+    with stage('after'):
+        pass
+    assert profiler.records == []
+
+
+def test_records_reach_the_callback_without_memory_tracing():
+    seen = []
+    with StageProfiler(trace_memory=False, callback=seen.append) as profiler:
+        with stage('work'):
+            pass
+    assert seen == profiler.records
+    assert seen[0]['allocated_bytes'] is None
+
+
+def test_pool_worker_stages_reach_the_active_profiler():
+    book = PortfolioBook([Option('call', 100)])
+    with StageProfiler(trace_memory=False) as profiler:
+        simulate_portfolio_pnl_streaming(book, spot=100.0, expected_drift=0.07, volatility=0.25,
+                                         maturity=1.0, rfr=0.05, num_simulations=20000,
+                                         chunk_size=5000, num_workers=2, seed=3)
+    summary = profiler.summary()
+    paths = dict(zip(summary['stage'], summary['paths']))
+    assert paths['workers'] == paths['draw_normals'] == 20000
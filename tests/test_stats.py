@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from scipy import stats as scipy_stats
+from stats import (MAX_HISTOGRAM_BINS, Histogram, QuantileSketch, RunningMoments,
+                   freedman_diaconis_edges)
+
+
+def sample(seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # Skewed, mixed-sign data with exact zeros
+    return np.concatenate([rng.lognormal(1.0, 0.8, 40000) - 3.0, np.zeros(500), -rng.exponential(5.0, 9500)])
+
+
+def test_merged_moments_match_one_pass():
+    values = sample()
+    merged = RunningMoments()
+    for chunk in np.array_split(values, [7, 1000, 1001, 23000]):
+        part = RunningMoments()
+        part.update(chunk)
+        merged.merge(part)
+    assert merged.count == len(values)
+    assert merged.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert merged.variance == pytest.approx(values.var(), rel=1e-12)
+    assert merged.skew == pytest.approx(scipy_stats.skew(values), rel=1e-10)
+    assert merged.kurtosis == pytest.approx(scipy_stats.kurtosis(values), rel=1e-10)
+    assert (merged.min, merged.max) == (values.min(), values.max())
+
+
+def test_moments_of_constant_data():
+    moments = RunningMoments()
+    moments.update(np.full(10, 3.0))
+    moments.update([])
+    assert moments.mean == 3.0 and moments.variance == 0.0
+    assert np.isnan(moments.skew) and np.isnan(moments.kurtosis)
+
+
+@pytest.mark.parametrize('relative_accuracy', [0.005, 0.02])
+def test_merged_sketch_quantiles_within_relative_accuracy(relative_accuracy):
+    values = sample(1)
+    merged = QuantileSketch(relative_accuracy)
+    for chunk in np.array_split(values, 5):
+        part = QuantileSketch(relative_accuracy)
+        part.update(chunk)
+        merged.merge(part)
+
+    q = np.linspace(0, 1, 201)
+    exact = np.sort(values)[np.floor(q * (len(values) - 1)).astype(int)]
+    estimate = merged.quantile(q)
+    assert (exact < 0).any() and (exact == 0).any() and (exact > 0).any()
+    np.testing.assert_array_less(np.abs(estimate - exact), relative_accuracy * np.abs(exact) + 1e-12)
+
+
+def test_sketches_with_different_settings_do_not_merge():
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+
+def test_merged_histograms_match_one_pass():
+    values = sample(2)
+    edges = np.linspace(-20, 20, 41)
+    one_pass = Histogram(edges)
+    one_pass.update(values)
+    merged = Histogram(edges)
+    for chunk in np.array_split(values, 7):
+        part = Histogram(edges)
+        part.update(chunk)
+        merged.merge(part)
+    np.testing.assert_array_equal(merged.counts, one_pass.counts)
+    assert (merged.underflow, merged.overflow) == (one_pass.underflow, one_pass.overflow)
+    inside = (values >= -20) & (values <= 20)
+    np.testing.assert_array_equal(merged.counts, np.histogram(values[inside], edges)[0])
+
+
+@pytest.mark.parametrize('values', [np.full(1000, 7.5), np.array([7.5])])
+def test_freedman_diaconis_edges_for_degenerate_data(values):
+    q25, q75 = np.percentile(values, [25, 75])
+    edges = freedman_diaconis_edges(q25, q75, values.min(), values.max(), len(values))
+    histogram = Histogram(edges)
+    histogram.update(values)
+    assert histogram.counts.sum() == len(values)
+
+
+def test_freedman_diaconis_zero_width_uses_the_maximum_bins():
+    values = np.concatenate([np.zeros(999), [1.0]])
+    edges = freedman_diaconis_edges(0.0, 0.0, 0.0, 1.0, len(values))
+    assert len(edges) == MAX_HISTOGRAM_BINS + 1
+    assert (edges[0], edges[-1]) == (0.0, 1.0)
+
+
+@pytest.mark.parametrize('num_samples', [1, 5000])
+def test_constant_pnl_bins_every_sample(num_samples):
+    from simulation import PnLAccumulator
+    accumulator = PnLAccumulator(initial_cost=10.0)
+    accumulator.update(np.full(num_samples, -2.5))
+    counts = accumulator.binned().counts
+    assert counts.sum() == pytest.approx(num_samples)
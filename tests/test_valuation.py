@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from analytic import exact_portfolio_pnl
+from simulation import simulate_portfolio_pnl_streaming
+from utils import Debt, Forward, Option, PortfolioBook, black_scholes
+
+MARKET = dict(spot=100.0, expected_drift=0.07, volatility=0.25, maturity=1.0, rfr=0.05)
+
+
+@pytest.fixture
+def book():
+    return PortfolioBook([Option('call', 100, volatility=0.25, rfr=0.05), Option('put', 90, quantity=-2,
+                          volatility=0.25, rfr=0.05), Forward(105), Debt(-10.0)])
+
+
+def test_value_surface_matches_per_leg_pricing(book):
+    spots = np.linspace(60, 140, 9)
+    elapsed = np.array([0.0, 0.5, 1.0])
+    surface = book.value_surface(spots, elapsed, rfr=0.05, maturity=1.0)
+    assert surface.shape == (3, 9)
+    for row, t in zip(surface, elapsed):
+        discount = np.exp(-0.05 * (1.0 - t))
+        expected = (black_scholes('call', 100, spots, 1.0 - t, 0.05, 0.25, greeks=False)['price']
+                    - 2 * black_scholes('put', 90, spots, 1.0 - t, 0.05, 0.25, greeks=False)['price']
+                    + spots - 105 * discount - 10 * discount)
+        np.testing.assert_allclose(row, expected, atol=1e-10)
+    np.testing.assert_allclose(surface[-1], book.payoff(spots), atol=1e-10)
+
+
+def test_exact_mode_agrees_with_monte_carlo(book):
+    exact = exact_portfolio_pnl(book, **MARKET)
+    simulated = simulate_portfolio_pnl_streaming(book, num_simulations=400000, seed=9, **MARKET)
+    assert exact['std_error'] == 0 and exact['num_simulations'] == 0
+    assert exact['mean'] == pytest.approx(simulated['mean'], abs=4 * simulated['std_error'])
+    assert exact['prob_profit'] == pytest.approx(simulated['prob_profit'], abs=0.01)
+    assert exact['histogram']['counts'].sum() == pytest.approx(0.998, abs=1e-3)
+
+
+def test_streaming_is_reproducible_per_seed_and_worker_count(book):
+    first = simulate_portfolio_pnl_streaming(book, num_simulations=50000, seed=5, **MARKET)
+    again = simulate_portfolio_pnl_streaming(book, num_simulations=50000, seed=5, **MARKET)
+    assert first['mean'] == again['mean'] and first['seed'] == again['seed']
+    np.testing.assert_array_equal(first['histogram']['counts'], again['histogram']['counts'])
@@ -1,6 +1,22 @@
+import hashlib
+from abc import ABC, abstractmethod
 from typing import Literal
 import numpy as np
-from scipy.stats import norm, skew, kurtosis
+from pricing import black_scholes, implied_volatility
+from profiling import stage
+from stats import RunningMoments, freedman_diaconis_edges
+
+# Underlying of legs created without one; single-asset books use it throughout
+DEFAULT_UNDERLYING = ''
+
+# Underlying identifiers are stored as fixed-width strings in PortfolioBook
+MAX_UNDERLYING_LENGTH = 16
+
+
+def _validate_underlying(underlying):
+    underlying = np.asarray(underlying, dtype=str)
+    if underlying.size and np.char.str_len(underlying).max() > MAX_UNDERLYING_LENGTH:
+        raise ValueError(f"Underlying identifiers are limited to {MAX_UNDERLYING_LENGTH} characters")
 
 class Option:
     def __init__(
@@ -11,7 +27,8 @@ class Option:
         maturity: float = 1,
         rfr: float = 0.12,
         volatility: float = 0.20,
-        quantity: int = 1
+        quantity: int = 1,
+        underlying: str = DEFAULT_UNDERLYING
     ):
         self.option_type = option_type.lower()
         self.strike = strike
@@ -20,11 +37,13 @@ class Option:
         self.rfr = rfr
         self.volatility = volatility
         self.quantity = quantity
+        self.underlying = underlying
         self._validate_inputs()
 
     def _validate_inputs(self):
         if self.option_type not in ['call', 'put']:
             raise ValueError("option_type must be 'call' or 'put'")
+        _validate_underlying(self.underlying)
         if self.strike <= 0:
             raise ValueError("Strike must be positive")
         if self.spot <= 0:
@@ -42,25 +61,9 @@ class Option:
         return payoff * self.quantity
     
     def price(self):
-
-        if self.maturity == 0:
-            return self.payoff(self.spot)[0] if isinstance(self.spot, np.ndarray) else self.payoff(np.array([self.spot]))[0]
-        
-        d1 = (np.log(self.spot / self.strike) + 
-              (self.rfr + 0.5 * self.volatility**2) * self.maturity) / \
-             (self.volatility * np.sqrt(self.maturity))
-        
-        d2 = d1 - self.volatility * np.sqrt(self.maturity)
-
-        # N(d) is the cumulative normal distribution - it gives us probabilities
-        if self.option_type == 'call':
-            price = (self.spot * norm.cdf(d1) - 
-                    self.strike * np.exp(-self.rfr * self.maturity) * norm.cdf(d2))
-        else:  # put
-            price = (self.strike * np.exp(-self.rfr * self.maturity) * norm.cdf(-d2) - 
-                    self.spot * norm.cdf(-d1))
-        
-        return price * self.quantity
+        result = black_scholes(self.option_type, self.strike, self.spot,
+                               self.maturity, self.rfr, self.volatility, greeks=False)
+        return result['price'][()] * self.quantity
     
 class Debt:
     def __init__(self, face_value: float):
@@ -78,15 +81,18 @@ class Forward:
     def __init__(
         self,
         strike: float,
-        quantity: int = 1
+        quantity: int = 1,
+        underlying: str = DEFAULT_UNDERLYING
     ):
         self.strike = strike
         self.quantity = quantity
+        self.underlying = underlying
         self._validate_inputs()
     
     def _validate_inputs(self):
         if self.strike <= 0:
             raise ValueError("Strike must be positive")
+        _validate_underlying(self.underlying)
     
     def payoff(self, spot_prices):
         return (spot_prices - self.strike) * self.quantity
@@ -96,51 +102,606 @@ class Forward:
         forward_price = spot * np.exp(rfr * maturity)
         return (forward_price - self.strike) * np.exp(-rfr * maturity) * self.quantity
 
-    
+
+
+class PathDependentOption(ABC):
+    """
+    Base class for options whose payoff depends on the whole price path.
+
+    Subclasses list the running path statistics they need in
+    path_statistics ('maximum', 'minimum', 'average') and compute their
+    payoff from a PathStatistics object in payoff_from_path. The
+    time-stepped engine in simulation.py only tracks the requested
+    statistics, so memory stays O(paths) whatever the number of steps.
+    """
+    path_statistics = frozenset()
+
+    def __init__(
+        self,
+        option_type: Literal['call', 'put'],
+        strike: float = None,
+        spot: float = 100,
+        maturity: float = 1,
+        rfr: float = 0.12,
+        volatility: float = 0.20,
+        quantity: int = 1
+    ):
+        self.option_type = option_type.lower()
+        self.strike = strike
+        self.spot = spot
+        self.maturity = maturity
+        self.rfr = rfr
+        self.volatility = volatility
+        self.quantity = quantity
+        self._validate_inputs()
+
+    def _validate_inputs(self):
+        if self.option_type not in ['call', 'put']:
+            raise ValueError("option_type must be 'call' or 'put'")
+        if self.strike is not None and self.strike <= 0:
+            raise ValueError("Strike must be positive")
+        if self.spot <= 0:
+            raise ValueError("Spot must be positive")
+        if self.maturity < 0:
+            raise ValueError("Maturity must be non-negative")
+        if self.volatility <= 0:
+            raise ValueError("Volatility must be positive")
+
+    def _vanilla_payoff(self, prices):
+        if self.option_type == 'call':
+            return np.maximum(prices - self.strike, 0)
+        return np.maximum(self.strike - prices, 0)
+
+    @abstractmethod
+    def payoff_from_path(self, path):
+        """Payoff per path from a PathStatistics object"""
+
+    def price(self, num_simulations: int = 20000, num_steps: int = 252, seed=None):
+        """Risk-neutral Monte Carlo price using the option's own market parameters"""
+        from simulation import price_path_dependent
+        return price_path_dependent(self, num_simulations=num_simulations,
+                                    num_steps=num_steps, seed=seed)
+
+
+class BarrierOption(PathDependentOption):
+    """Knock-in / knock-out option, barrier monitored at every time step"""
+    def __init__(
+        self,
+        option_type: Literal['call', 'put'],
+        strike: float,
+        barrier: float,
+        barrier_type: Literal['up-and-out', 'up-and-in', 'down-and-out', 'down-and-in'],
+        **kwargs
+    ):
+        self.barrier = barrier
+        self.barrier_type = barrier_type.lower()
+        super().__init__(option_type, strike, **kwargs)
+        self.path_statistics = frozenset(
+            ['maximum'] if self.barrier_type.startswith('up') else ['minimum']
+        )
+
+    def _validate_inputs(self):
+        super()._validate_inputs()
+        if self.strike is None:
+            raise ValueError("Strike is required")
+        if self.barrier <= 0:
+            raise ValueError("Barrier must be positive")
+        if self.barrier_type not in ['up-and-out', 'up-and-in', 'down-and-out', 'down-and-in']:
+            raise ValueError("barrier_type must be 'up-and-out', 'up-and-in', 'down-and-out' or 'down-and-in'")
+
+    def payoff_from_path(self, path):
+        if self.barrier_type.startswith('up'):
+            hit = path.maximum >= self.barrier
+        else:
+            hit = path.minimum <= self.barrier
+        alive = hit if self.barrier_type.endswith('in') else ~hit
+        return np.where(alive, self._vanilla_payoff(path.terminal), 0) * self.quantity
+
+
+class AsianOption(PathDependentOption):
+    """Arithmetic average-price option over the time-step fixings"""
+    path_statistics = frozenset(['average'])
+
+    def _validate_inputs(self):
+        super()._validate_inputs()
+        if self.strike is None:
+            raise ValueError("Strike is required")
+
+    def payoff_from_path(self, path):
+        return self._vanilla_payoff(path.average) * self.quantity
+
+
+class LookbackOption(PathDependentOption):
+    """
+    Lookback option. Without a strike it is floating-strike (call pays
+    S_T - min, put pays max - S_T); with a strike it is fixed-strike
+    (call pays max - K, put pays K - min, floored at zero).
+    """
+    path_statistics = frozenset(['maximum', 'minimum'])
+
+    def payoff_from_path(self, path):
+        if self.strike is None:
+            if self.option_type == 'call':
+                payoff = path.terminal - path.minimum
+            else:
+                payoff = path.maximum - path.terminal
+        elif self.option_type == 'call':
+            payoff = np.maximum(path.maximum - self.strike, 0)
+        else:
+            payoff = np.maximum(self.strike - path.minimum, 0)
+        return payoff * self.quantity
+
+# Leg type codes used by PortfolioBook.kind
+LEG_CALL = 0
+LEG_PUT = 1
+LEG_FORWARD = 2
+LEG_DEBT = 3
+
+# Number of spot points evaluated per broadcast block in PortfolioBook.payoff,
+# keeps the (points x option legs) intermediate bounded for large books
+PAYOFF_BLOCK_SIZE = 4096
+
+# Elements of the (contracts x dates x points) price array evaluated per block in
+# PortfolioBook.value_surface; small blocks keep the Black-Scholes intermediates in cache
+SURFACE_BLOCK_SIZE = 2**16
+
+# Books with more option legs than this are evaluated through their exact
+# piecewise-linear representation (O(points log strikes)) instead of broadcasting
+PIECEWISE_MIN_OPTION_LEGS = 32
+
+
+class _Column:
+    """Exposes the live slice of a PortfolioBook backing array"""
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, book, owner=None):
+        if book is None:
+            return self
+        return book._data[self.name][:book._size]
+
+
+class PortfolioBook:
+    """
+    Columnar store of portfolio legs.
+
+    Every leg is a row across NumPy arrays (type code, strike, quantity,
+    spot, maturity, rfr, volatility, face value, underlying identifier) so
+    the whole book can be evaluated in one broadcast. Option, Forward and
+    Debt remain the per-leg views handed out by indexing and iteration.
+    """
+    kind = _Column()
+    strike = _Column()
+    quantity = _Column()
+    spot = _Column()
+    maturity = _Column()
+    rfr = _Column()
+    volatility = _Column()
+    face_value = _Column()
+    underlying = _Column()
+
+    _DTYPES = {
+        'kind': np.int8,
+        'strike': np.float64,
+        'quantity': np.float64,
+        'spot': np.float64,
+        'maturity': np.float64,
+        'rfr': np.float64,
+        'volatility': np.float64,
+        'face_value': np.float64,
+        'underlying': np.dtype(f'U{MAX_UNDERLYING_LENGTH}'),
+    }
+
+    def __init__(self, assets=None, capacity: int = 16):
+        self._size = 0
+        self._data = {name: np.empty(max(capacity, 1), dtype=dtype)
+                      for name, dtype in self._DTYPES.items()}
+        if assets is not None:
+            self.extend(assets)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("PortfolioBook index out of range")
+
+        kind = self.kind[index]
+        if kind == LEG_DEBT:
+            return Debt(face_value=float(self.face_value[index]))
+        if kind == LEG_FORWARD:
+            return Forward(strike=float(self.strike[index]),
+                           quantity=float(self.quantity[index]),
+                           underlying=str(self.underlying[index]))
+        return Option(
+            'call' if kind == LEG_CALL else 'put',
+            strike=float(self.strike[index]),
+            spot=float(self.spot[index]),
+            maturity=float(self.maturity[index]),
+            rfr=float(self.rfr[index]),
+            volatility=float(self.volatility[index]),
+            quantity=float(self.quantity[index]),
+            underlying=str(self.underlying[index])
+        )
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        capacity = len(self._data['kind'])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, column in self._data.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._data[name] = grown
+
+    def add_legs(
+        self,
+        kind,
+        strike=np.nan,
+        quantity=1.0,
+        spot=np.nan,
+        maturity=np.nan,
+        rfr=np.nan,
+        volatility=np.nan,
+        face_value=np.nan,
+        underlying=DEFAULT_UNDERLYING
+    ):
+        """Append many legs at once from (broadcastable) column arrays"""
+        kind = np.atleast_1d(np.asarray(kind, dtype=np.int8))
+        n = len(kind)
+        _validate_underlying(underlying)
+        values = {
+            'kind': kind,
+            'strike': strike,
+            'quantity': quantity,
+            'spot': spot,
+            'maturity': maturity,
+            'rfr': rfr,
+            'volatility': volatility,
+            'face_value': face_value,
+            'underlying': underlying,
+        }
+        self._reserve(n)
+        start, stop = self._size, self._size + n
+        for name, value in values.items():
+            self._data[name][start:stop] = np.broadcast_to(value, n)
+        self._size = stop
+
+    def append(self, asset):
+        if isinstance(asset, Option):
+            self.add_legs(
+                LEG_CALL if asset.option_type == 'call' else LEG_PUT,
+                strike=asset.strike,
+                quantity=asset.quantity,
+                spot=asset.spot,
+                maturity=asset.maturity,
+                rfr=asset.rfr,
+                volatility=asset.volatility,
+                underlying=asset.underlying
+            )
+        elif isinstance(asset, Forward):
+            self.add_legs(LEG_FORWARD, strike=asset.strike, quantity=asset.quantity,
+                          underlying=asset.underlying)
+        elif isinstance(asset, Debt):
+            self.add_legs(LEG_DEBT, strike=asset.strike, face_value=asset.face_value)
+        else:
+            raise TypeError(f"Unsupported asset type: {type(asset).__name__}")
+
+    def extend(self, assets):
+        if isinstance(assets, PortfolioBook):
+            # Column-wise copy, without building a per-leg object
+            self._reserve(len(assets))
+            for name in self._DTYPES:
+                self._data[name][self._size:self._size + len(assets)] = getattr(assets, name)
+            self._size += len(assets)
+            return
+        for asset in assets:
+            self.append(asset)
+
+    def remove(self, index: int):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("PortfolioBook index out of range")
+        for column in self._data.values():
+            column[index:self._size - 1] = column[index + 1:self._size]
+        self._size -= 1
+
+    def clear(self):
+        self._size = 0
+
+    def fingerprint(self) -> str:
+        """Content hash of the legs; equal books give equal fingerprints regardless of capacity"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.int64(self._size).tobytes())
+        for name in self._DTYPES:
+            digest.update(np.ascontiguousarray(getattr(self, name)).tobytes())
+        return digest.hexdigest()
+
+    def select(self, mask) -> 'PortfolioBook':
+        """New book holding only the legs where mask (boolean or index array) selects"""
+        index = np.arange(self._size)[mask]
+        subset = PortfolioBook(capacity=len(index))
+        for name in self._DTYPES:
+            subset._data[name][:len(index)] = getattr(self, name)[index]
+        subset._size = len(index)
+        return subset
+
+    def underlyings(self) -> np.ndarray:
+        """Sorted distinct underlying identifiers of the option and forward legs"""
+        return np.unique(self.underlying[self.kind != LEG_DEBT])
+
+    def require_single_underlying(self):
+        """Raise ValueError if the option and forward legs span more than one underlying"""
+        underlyings = self.underlyings()
+        if len(underlyings) > 1:
+            raise ValueError(f"Book spans several underlyings ({', '.join(underlyings)}); "
+                             "select one or use the multi-asset simulation")
+
+    def underlying_codes(self, underlyings) -> np.ndarray:
+        """Index of each leg's underlying within the underlyings sequence, -1 where absent"""
+        names = np.asarray(underlyings, dtype=str)
+        if len(names) == 0:
+            return np.full(self._size, -1, dtype=np.intp)
+        order = np.argsort(names)
+        position = np.minimum(np.searchsorted(names[order], self.underlying), len(names) - 1)
+        found = names[order][position] == self.underlying
+        return np.where(found, order[position], -1)
+
+    def set_market(self, spot=None, maturity=None, rfr=None, volatility=None):
+        """Overwrite the market parameters carried by every option leg"""
+        is_option = self.kind <= LEG_PUT
+        for name, value in (('spot', spot), ('maturity', maturity),
+                            ('rfr', rfr), ('volatility', volatility)):
+            if value is not None:
+                getattr(self, name)[is_option] = value
+
+    def payoff(self, spot_prices):
+        """Total payoff of the book at each of the given spot prices of its one underlying"""
+        spot_prices = np.asarray(spot_prices, dtype=np.float64)
+        kind = self.kind
+        is_option = kind <= LEG_PUT
+        if is_option.sum() > PIECEWISE_MIN_OPTION_LEGS:
+            from payoff import PiecewiseLinearPayoff
+            return PiecewiseLinearPayoff.from_book(self)(spot_prices)
+
+        self.require_single_underlying()
+
+        # Forwards and debt are linear in spot, so they reduce to two scalars
+        flat = spot_prices.ravel()
+        is_forward = kind == LEG_FORWARD
+        forward_qty = self.quantity[is_forward].sum()
+        forward_strike = (self.quantity[is_forward] * self.strike[is_forward]).sum()
+        debt = self.face_value[kind == LEG_DEBT].sum()
+        total = flat * forward_qty - forward_strike + debt
+
+        # Options: max(sign * (S - K), 0) with sign +1 for calls and -1 for puts
+        if is_option.any():
+            strike = self.strike[is_option]
+            quantity = self.quantity[is_option]
+            sign = np.where(kind[is_option] == LEG_CALL, 1.0, -1.0)
+            for start in range(0, len(flat), PAYOFF_BLOCK_SIZE):
+                block = flat[start:start + PAYOFF_BLOCK_SIZE]
+                intrinsic = np.maximum(sign * (block[:, None] - strike), 0)
+                total[start:start + PAYOFF_BLOCK_SIZE] += intrinsic @ quantity
+
+        return total.reshape(spot_prices.shape)
+
+    def initial_cost(self, spot: float, rfr: float, maturity: float) -> float:
+        """Present value of the book; forwards and debt use the given market parameters"""
+        kind = self.kind
+        quantity = self.quantity
+
+        is_option = kind <= LEG_PUT
+        option_prices = black_scholes(
+            kind[is_option],
+            self.strike[is_option],
+            self.spot[is_option],
+            self.maturity[is_option],
+            self.rfr[is_option],
+            self.volatility[is_option],
+            greeks=False
+        )['price']
+        cost = option_prices @ quantity[is_option]
+
+        # Forward value: (S e^{rT} - K) e^{-rT} = S - K e^{-rT}
+        is_forward = kind == LEG_FORWARD
+        discount = np.exp(-rfr * maturity)
+        cost += ((spot - self.strike[is_forward] * discount) * quantity[is_forward]).sum()
+        cost += self.face_value[kind == LEG_DEBT].sum() * discount
+        return float(cost)
+
+    def value_surface(self, spot_prices, elapsed, rfr: float, maturity: float) -> np.ndarray:
+        """
+        Book value at each spot, elapsed[i] years from now; shape (len(elapsed), len(spot_prices)).
+
+        Options use their own market parameters over the remaining maturity;
+        forwards and debt are discounted at rfr as in initial_cost.
+        """
+        spot_prices = np.asarray(spot_prices, dtype=np.float64).ravel()
+        elapsed = np.atleast_1d(np.asarray(elapsed, dtype=np.float64))
+        kind = self.kind
+
+        # Forwards and debt: q S - q K e^{-r tau} and F e^{-r tau}, one discount per date
+        discount = np.exp(-rfr * np.maximum(maturity - elapsed, 0))
+        is_forward = kind == LEG_FORWARD
+        forward_qty = self.quantity[is_forward].sum()
+        forward_strike = (self.quantity[is_forward] * self.strike[is_forward]).sum()
+        debt = self.face_value[kind == LEG_DEBT].sum()
+        total = forward_qty * spot_prices + ((debt - forward_strike) * discount)[:, None]
+
+        is_option = kind <= LEG_PUT
+        if not is_option.any():
+            return total
+        # Net the quantities of identical contracts
+        contracts = np.column_stack([kind[is_option], self.strike[is_option], self.maturity[is_option],
+                                     self.rfr[is_option], self.volatility[is_option]])
+        contracts, inverse = np.unique(contracts, axis=0, return_inverse=True)
+        quantity = np.bincount(inverse.ravel(), weights=self.quantity[is_option], minlength=len(contracts))
+        held = quantity != 0
+        contracts, quantity = contracts[held], quantity[held]
+        tau = np.maximum(contracts[:, 2, None] - elapsed, 0)[:, :, None]
+
+        per_block = max(SURFACE_BLOCK_SIZE // max(len(elapsed) * len(spot_prices), 1), 1)
+        for start in range(0, len(contracts), per_block):
+            block = contracts[start:start + per_block, :, None, None]
+            price = black_scholes(block[:, 0], block[:, 1], spot_prices, tau[start:start + per_block],
+                                  block[:, 3], block[:, 4], greeks=False)['price']
+            total += np.tensordot(quantity[start:start + per_block], price, axes=1)
+        return total
+
+    def option_greeks(self) -> dict:
+        """Per-leg Black-Scholes price and Greeks for the option legs, scaled by quantity"""
+        is_option = self.kind <= LEG_PUT
+        result = black_scholes(
+            self.kind[is_option],
+            self.strike[is_option],
+            self.spot[is_option],
+            self.maturity[is_option],
+            self.rfr[is_option],
+            self.volatility[is_option]
+        )
+        quantity = self.quantity[is_option]
+        return {name: values * quantity for name, values in result.items()}
+
+    def calibrate_volatility(self, premiums) -> dict:
+        """
+        Set each option leg's volatility to the one implied by its premium.
+
+        premiums holds the market price per contract for every row (entries
+        on forward and debt rows are ignored). Legs whose quote cannot be
+        inverted keep their current volatility. Returns the implied_volatility
+        result for all rows, with NaN / False on non-option rows.
+        """
+        premiums = np.broadcast_to(np.asarray(premiums, dtype=np.float64), (len(self),))
+        is_option = self.kind <= LEG_PUT
+        solved = implied_volatility(
+            self.kind[is_option],
+            premiums[is_option],
+            self.strike[is_option],
+            self.spot[is_option],
+            self.maturity[is_option],
+            self.rfr[is_option]
+        )
+        self.volatility[np.flatnonzero(is_option)[solved['converged']]] = \
+            solved['volatility'][solved['converged']]
+
+        result = {
+            'volatility': np.full(len(self), np.nan),
+            'converged': np.zeros(len(self), dtype=bool),
+            'iterations': np.zeros(len(self), dtype=np.int64)
+        }
+        for name, values in solved.items():
+            result[name][is_option] = values
+        return result
+
+def as_book(portfolio) -> PortfolioBook:
+    """Accept either a PortfolioBook or a plain list of assets"""
+    if isinstance(portfolio, PortfolioBook):
+        return portfolio
+    return PortfolioBook(portfolio)
+
+
+def simulate_terminal_prices(
+    spot: float,
+    expected_drift: float,
+    volatility: float,
+    maturity: float,
+    num_simulations: int = 10000,
+    seed=None
+):
+    """
+    GBM terminal prices as drawn by simulate_portfolio_pnl for the same seed.
+
+    Returns (terminal_prices, entropy); passing both back into
+    simulate_portfolio_pnl lets many portfolios share one set of draws.
+    """
+    # Record the entropy actually used so unseeded runs can still be reproduced
+    seed_sequence = np.random.SeedSequence(seed)
+    rng = np.random.default_rng(seed_sequence)
+    with stage('draw_normals', paths=num_simulations):
+        epsilon = rng.standard_normal(num_simulations)
+        exponent = ((expected_drift - 0.5 * volatility**2) * maturity + 
+                    volatility * epsilon * np.sqrt(maturity))
+        terminal_prices = spot * np.exp(exponent)
+    return terminal_prices, seed_sequence.entropy
+
+
 def simulate_portfolio_pnl(
-    portfolio: list,
+    portfolio,
     spot: float,
     expected_drift: float,
     volatility: float,
     maturity: float,
     rfr: float,
-    num_simulations: int = 10000
+    num_simulations: int = 10000,
+    seed=None,
+    bins: int = None,
+    terminal_prices=None
 ) -> dict:
-    # Calculate initial cost - pass parameters to price() methods
-    initial_cost = 0
-    for asset in portfolio:
-        if hasattr(asset, 'price'):
-            if type(asset).__name__ == 'Option':
-                initial_cost += asset.price()  # Options have all params
-            elif type(asset).__name__ == 'Forward':
-                initial_cost += asset.price(spot=spot, rfr=rfr, maturity=maturity)
-            elif type(asset).__name__ == 'Debt':
-                initial_cost += asset.price(rfr=rfr, maturity=maturity)
-    
-    epsilon = np.random.standard_normal(num_simulations)
-    exponent = ((expected_drift - 0.5 * volatility**2) * maturity + 
-                volatility * epsilon * np.sqrt(maturity))
-    terminal_prices = spot * np.exp(exponent)
+    book = as_book(portfolio)
+    with stage('initial_cost'):
+        initial_cost = book.initial_cost(spot=spot, rfr=rfr, maturity=maturity)
     
-    terminal_values = np.zeros(num_simulations)
-    for asset in portfolio:
-        terminal_values += asset.payoff(terminal_prices)
+    # Precomputed draws (see simulate_terminal_prices) are reused as given
+    if terminal_prices is None:
+        terminal_prices, seed = simulate_terminal_prices(spot, expected_drift, volatility, maturity,
+                                                         num_simulations, seed)
+    num_simulations = len(terminal_prices)
     
-    future_cost = initial_cost * np.exp(rfr * maturity)
-    pnl = terminal_values - future_cost
+    with stage('payoff', paths=num_simulations):
+        terminal_values = book.payoff(terminal_prices)
+        
+        future_cost = initial_cost * np.exp(rfr * maturity)
+        pnl = terminal_values - future_cost
     
-    from scipy.stats import skew, kurtosis
+    with stage('statistics', paths=num_simulations):
+        summary = summarize_pnl(pnl, initial_cost, bins)
     
     return {
         'pnl_samples': pnl,
         'terminal_prices': terminal_prices,
         'initial_cost': initial_cost,
-        'mean': np.mean(pnl),
-        'std': np.std(pnl),
-        'skew': skew(pnl),
-        'kurtosis': kurtosis(pnl),
-        'min': np.min(pnl),
-        'max': np.max(pnl),
-        'percentile_5': np.percentile(pnl, 5),
-        'percentile_95': np.percentile(pnl, 95)
-    }
\ No newline at end of file
+        'seed': seed,
+        'num_simulations': num_simulations,
+        **summary
+    }
+
+
+def summarize_pnl(pnl, initial_cost: float, bins: int = None) -> dict:
+    """Summary statistics and histogram of PnL samples, as in simulate_portfolio_pnl results"""
+    # Moments in one pass, without loading scipy.stats
+    moments = RunningMoments()
+    moments.update(pnl)
+    # One partition of the samples serves every percentile
+    q5, q25, q75, q95 = np.percentile(pnl, [5, 25, 75, 95])
+    
+    # Pre-binned counts so charts need not ship the samples
+    if bins is None:
+        edges = freedman_diaconis_edges(q25, q75, moments.min, moments.max, len(pnl))
+    else:
+        edges = np.histogram_bin_edges(pnl, bins=bins)
+    counts, edges = np.histogram(pnl, bins=edges)
+    
+    return {
+        'mean': moments.mean,
+        'std': moments.std,
+        'skew': moments.skew,
+        'kurtosis': moments.kurtosis,
+        'min': moments.min,
+        'max': moments.max,
+        'percentile_5': q5,
+        'percentile_95': q95,
+        'prob_profit': np.mean(pnl > 0),
+        'prob_loss': np.mean(pnl < 0),
+        'prob_total_loss': np.mean(pnl <= -initial_cost),
+        'histogram': {'edges': edges, 'counts': counts}
+    }